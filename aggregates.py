@@ -0,0 +1,96 @@
+import os
+
+from database import iter_revenue_groups, from_minor
+
+try:
+    import numpy as np
+except ImportError:  # opsiyonel; yoksa rollup'lar saf Python ile hesaplanır
+    np = None
+
+# Gelir rollup'ları. En ince tanecik (user_id, currency, day) tek GROUP BY
+# sorgusuyla DB'de hesaplanır (database.iter_revenue_groups); kullanıcı, gün
+# veya para birimi bazındaki daha kaba toplamlar bu gruplardan, tabloyu tekrar
+# taramadan türetilir. Tutarlar küçük birimde (int) toplanır; para birimi her
+# zaman anahtarın parçasıdır, farklı para birimleri birbirine eklenmez.
+#
+# Büyük raporlama pencerelerinde (milyonlarca fatura -> yüz binlerce grup)
+# NumPy kuruluysa gruplar sütun dizilerine alınır ve türetilmiş toplamlar
+# sort + reduceat ile vektörel hesaplanır. engine: "python", "numpy" veya "auto".
+
+DIMENSIONS = ("user_id", "currency", "day")
+ROLLUP_ENGINE = os.environ.get("ROLLUP_ENGINE", "auto")
+# auto modunda bu kadar gruptan sonra NumPy yolu kullanılır
+NUMPY_MIN_GROUPS = int(os.environ.get("ROLLUP_NUMPY_MIN_GROUPS", 20000))
+
+
+class RevenueRollup:
+    def __init__(self, columns, engine):
+        # columns: {"user_id", "currency", "day", "count", "amount_minor"} -> list / ndarray
+        self.columns = columns
+        self.engine = engine
+
+    @classmethod
+    def load(cls, date_from=None, date_to=None, engine=None):
+        engine = engine or ROLLUP_ENGINE
+        if engine == "numpy" and np is None:
+            raise RuntimeError("numpy is not installed")
+        names = DIMENSIONS + ("count", "amount_minor")
+        columns = {name: [] for name in names}
+        for rows in iter_revenue_groups(date_from, date_to):
+            for name, values in zip(names, zip(*rows)):
+                columns[name].extend(values)
+        if engine == "auto":
+            engine = "numpy" if np is not None and len(columns["count"]) >= NUMPY_MIN_GROUPS else "python"
+        if engine == "numpy":
+            # currency / day sabit genişlikli unicode dizisi olur; np.unique C'de sıralar
+            columns = {
+                name: np.array(values, dtype=np.int64 if name in ("user_id", "count", "amount_minor") else None)
+                for name, values in columns.items()
+            }
+        return cls(columns, engine)
+
+    def __len__(self):
+        return len(self.columns["count"])
+
+    def totals(self, *dims):
+        """{anahtar tuple'ı: (adet, amount_minor)}; dims DIMENSIONS'ın alt kümesi, currency içermeli."""
+        if "currency" not in dims:
+            raise ValueError("totals must be grouped by currency")
+        unknown = set(dims) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"unknown dimension: {', '.join(sorted(unknown))}")
+        if self.engine == "numpy":
+            return self._totals_numpy(dims)
+        totals = {}
+        keys = zip(*(self.columns[d] for d in dims))
+        for key, count, amount in zip(keys, self.columns["count"], self.columns["amount_minor"]):
+            total = totals.get(key)
+            totals[key] = (total[0] + count, total[1] + amount) if total else (count, amount)
+        return totals
+
+    def _totals_numpy(self, dims):
+        if not len(self):
+            return {}
+        # Her boyut 0..n-1 koduna çevrilir, kodlar tek int64 anahtarda birleştirilir
+        uniques, codes = zip(*(np.unique(self.columns[d], return_inverse=True) for d in dims))
+        key = np.ravel_multi_index(codes, tuple(len(u) for u in uniques))
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        starts = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+        counts = np.add.reduceat(self.columns["count"][order], starts)
+        amounts = np.add.reduceat(self.columns["amount_minor"][order], starts)
+        group_codes = np.unravel_index(key[starts], tuple(len(u) for u in uniques))
+        keys = zip(*(u[c].tolist() for u, c in zip(uniques, group_codes)))
+        return dict(zip(keys, zip(counts.tolist(), amounts.tolist())))
+
+    def rows(self, *dims):
+        """totals() sonucunu JSON'a uygun satırlara çevirir; tutar ana birimde."""
+        dims = dims or DIMENSIONS
+        return [
+            {**dict(zip(dims, key)), "count": count, "amount": from_minor(amount)}
+            for key, (count, amount) in sorted(self.totals(*dims).items())
+        ]
+
+
+def revenue_rollup(date_from=None, date_to=None, engine=None):
+    return RevenueRollup.load(date_from, date_to, engine)
@@ -1,28 +1,53 @@
-from flask import Flask, request, jsonify, session, render_template, redirect
+from flask import Flask, Request, Response, g, request, jsonify, session, render_template, redirect
 
-from sqlite3 import IntegrityError
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlite3 import IntegrityError, OperationalError
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
-import os
-from database import is_admin
+import os, csv, io, json, tempfile, uuid
+from urllib.parse import urlencode
+from database import is_admin, DB_PATH, close_pools
+from jobs import JobQueue, QueueFull
+from metrics import metrics_from_env
+from ratelimit import limits_from_env
+from passwords import PasswordHasher, HashingBusy
+from render_cache import StaticPages, FragmentCache
+from events import EventBus, TooManySubscribers
 
 
 from database import (
     init_db, get_db, close_db,
-    create_service, get_all_services,
-    create_reservation, get_reservations_by_user, get_reservation_by_id,
+    create_service, get_service_catalog, update_service,
+    create_reservation, get_reservation_by_id,
     delete_reservation, update_reservation_status,
-    create_complaint, get_complaints_by_user,
+    create_complaint,
     get_complaint_by_id, update_complaint_status,
-    create_invoice, get_invoices_by_user,
-    update_invoice_status, import_invoices_from_csv,
-    get_user_total_from_invoices
+    create_invoice,
+    update_invoice_status, import_invoices_from_stream,
+    get_user_invoice_totals, get_job, get_dashboard_stats,
+    InvalidCursor, get_users_page, get_reservations_page,
+    get_invoices_page, get_complaints_page, search_complaints, InvalidSearch,
+    EXPORTS, export_columns, iter_export_rows,
+    InvalidBooking, BookingConflict,
+    get_identity, prime_identity, set_user_role, get_user_detail,
+    update_password_hash, get_data_versions, get_guest_bootstrap,
+    InvalidAmount, SERVICE_COLUMNS, DEFAULT_CURRENCY,
+    REPORTS, REPORT_GRAINS, REPORT_PERIODS, get_report, get_report_status, reset_reports
 )
 
+class SpoolingRequest(Request):
+    # Upload'lar UPLOAD_SPOOL_THRESHOLD'a kadar RAM'de, üstünde geçici dosyada tutulur
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=app.config["UPLOAD_SPOOL_THRESHOLD"])
+
+
 app = Flask(__name__)
+app.request_class = SpoolingRequest
 app.config.update(
     SECRET_KEY=os.environ.get("SECRET_KEY", "dev-secret-change-me"),
     SESSION_COOKIE_HTTPONLY=True,
+    UPLOAD_SPOOL_THRESHOLD=int(os.environ.get("UPLOAD_SPOOL_THRESHOLD", 1024 * 1024)),
+    KEEP_UPLOADED_FILES=os.environ.get("KEEP_UPLOADED_FILES") == "1",
+    RENDER_CACHE_ENABLED=os.environ.get("RENDER_CACHE_ENABLED", "1") == "1",
 )
 
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "uploads")
@@ -30,11 +55,124 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
 
+# --- Sayfalama yardımcıları ---
+def page_args():
+    return request.args.get("cursor"), request.args.get("limit", type=int)
+
+def filter_args():
+    return {
+        "status": request.args.get("status") or None,
+        "date_from": request.args.get("from") or None,
+        "date_to": request.args.get("to") or None,
+    }
+
+def next_page_url(next_cursor):
+    if not next_cursor:
+        return None
+    args = request.args.to_dict()
+    args["cursor"] = next_cursor
+    return f"{request.path}?{urlencode(args)}"
+
+def paged_json(rows, next_cursor):
+    # Gövde eskisi gibi liste; sonraki sayfa header'da bildirilir
+    resp = jsonify(rows)
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+        resp.headers["Link"] = f'<{next_page_url(next_cursor)}>; rel="next"'
+    return resp
+
+@app.errorhandler(InvalidCursor)
+def invalid_cursor(e):
+    return jsonify({"error": str(e)}), 400
+
+@app.errorhandler(InvalidSearch)
+def invalid_search(e):
+    return jsonify({"error": str(e)}), 400
+
+@app.errorhandler(InvalidAmount)
+def invalid_amount(e):
+    return jsonify({"error": str(e)}), 400
+
+
+# --- Oturumdaki kullanıcı (request boyunca g'de, process içinde identity cache'te) ---
+def current_user():
+    if "user" not in g:
+        uid = session.get("user_id")
+        g.user = get_identity(uid) if uid else None
+    return g.user
+
+
 # --- DB bağlantısını kapatma ---
 @app.teardown_appcontext
 def teardown_db(exception):
     close_db()
 
+# Arka plan işleri (CSV import vb.). Pre-fork sunucuda JOB_AUTOSTART=0: kuyruk
+# her worker'da fork'tan sonra başlar, periyodik job'ları kilidi tutan worker ekler
+jobs = JobQueue(
+    app,
+    max_workers=int(os.environ.get("JOB_WORKERS", 2)),
+    max_queue=int(os.environ.get("JOB_MAX_QUEUE", 100)),
+    autostart=os.environ.get("JOB_AUTOSTART", "1") == "1",
+    leader_lock=os.path.join(os.path.dirname(DB_PATH), "jobs.lock")
+    if os.environ.get("JOB_LEADER_LOCK") == "1" else None,
+)
+# Dashboard sayaçlarının gerçek değerlerden sapıp sapmadığını periyodik kontrol et
+jobs.every(int(os.environ.get("STATS_RECONCILE_SECONDS", 3600)), "reconcile_stats")
+# Rapor rollup'larına henüz işlenmemiş satırlar varsa (migration / rebuild sonrası) işle
+jobs.every(int(os.environ.get("REPORT_BACKFILL_SECONDS", 600)), "backfill_reports")
+
+# Opsiyonel ölçüm: METRICS_ENABLED=1 ise /metrics açılır
+metrics = metrics_from_env(app)
+
+# Reverse proxy arkasında gerçek istemci IP'si (hız sınırları IP başına);
+# TRUSTED_PROXIES = X-Forwarded-For'u ekleyen proxy sayısı
+if int(os.environ.get("TRUSTED_PROXIES", 0)):
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.environ["TRUSTED_PROXIES"]))
+
+# Hız sınırları (RATE_LIMIT_*) ve aşırı yükte önceliğe göre istek reddi (ADMISSION_*)
+limiter, admission = limits_from_env(app)
+
+# Parola hash'leme ayrı process'lerde; PASSWORD_HASH_WORKERS=0 ise request thread'inde
+hasher = PasswordHasher(
+    workers=int(os.environ.get("PASSWORD_HASH_WORKERS", 2)),
+    max_pending=int(os.environ.get("PASSWORD_HASH_QUEUE", 32)),
+)
+
+# Request'ten bağımsız sayfalar önceden render edilip sıkıştırılmış tutulur;
+# admin sayfalarının veri blokları data_versions ile anahtarlanıp cache'lenir
+STATIC_PAGES = ("home.html", "login.html", "register.html", "logout.html", "services.html",
+                "reservations.html", "complaints.html", "invoices.html")
+static_pages = StaticPages()
+fragments = FragmentCache()
+with app.app_context():
+    static_pages.warm(STATIC_PAGES)
+
+# Durum değişikliği bildirimleri (/events, SSE)
+events = EventBus(
+    max_subscribers=int(os.environ.get("EVENTS_MAX_SUBSCRIBERS", 1000)),
+    max_per_user=int(os.environ.get("EVENTS_MAX_PER_USER", 5)),
+)
+events.init_app(app)
+
+
+def warm_up():
+    """Pre-fork sunucuda master'da, worker'lar fork'lanmadan önce bir kez çalışır:
+    tüm şablonlar derlenir ve servis kataloğu cache'lenir, worker'lar hazır devralır."""
+    with app.app_context():
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        try:
+            get_service_catalog(active_only=True)
+            get_service_catalog(active_only=False)
+        except OperationalError:
+            pass  # init_db henüz çalıştırılmadı
+    close_pools()  # açık SQLite bağlantısı fork'tan sonra worker'larda kullanılamaz
+
+@app.errorhandler(HashingBusy)
+def hashing_busy(e):
+    return jsonify({"error": "server busy, try again"}), 429, {"Retry-After": "1"}
+
 
 # --- Health & Home ---
 @app.route("/")
@@ -44,7 +182,7 @@ def root():
 
 @app.route("/home")
 def home_page():
-    return render_template("home.html")
+    return static_pages.response("home.html")
 
 
 
@@ -75,15 +213,14 @@ def add_user(name, email):
 
 @app.route("/list-users")
 def list_users():
-    db = get_db()
-    users = db.execute("SELECT * FROM users").fetchall()
-    return {"users": [dict(u) for u in users]}
+    users, next_cursor = get_users_page(*page_args(), role=request.args.get("role"), order_by="id")
+    return {"users": users, "next_cursor": next_cursor}
 
 
 @app.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "GET":
-        return render_template("register.html")
+        return static_pages.response("register.html")
 
     # POST (form veya JSON)
     data = request.form if request.form else request.get_json(silent=True) or {}
@@ -94,7 +231,7 @@ def register():
     if not name or not email or not password:
         return jsonify({"error": "name, email, password required"}), 400
 
-    pw_hash = generate_password_hash(password)
+    pw_hash = hasher.hash(password)
 
     db = get_db()
     try:
@@ -105,6 +242,7 @@ def register():
             )
         user_id = cur.lastrowid
         session["user_id"] = user_id
+        prime_identity({"id": user_id, "name": name, "email": email, "role": "user"})
         return jsonify({"id": user_id, "name": name, "email": email}), 201
     except IntegrityError:
         return jsonify({"error": "email already exists"}), 409
@@ -113,7 +251,7 @@ def register():
 @app.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "GET":
-        return render_template("login.html")
+        return static_pages.response("login.html")
 
     data = request.form if request.form else request.get_json(silent=True) or {}
     email = data.get("email", "").strip().lower()
@@ -128,10 +266,18 @@ def login():
         (email,)
     ).fetchone()
 
-    if not row or not row["password_hash"] or not check_password_hash(row["password_hash"], password):
+    if not row or not row["password_hash"] or not hasher.verify(row["password_hash"], password):
         return jsonify({"error": "invalid credentials"}), 401
 
+    # Hash eski parametrelerle üretildiyse güncel yöntemle yeniden hash'le
+    if hasher.needs_rehash(row["password_hash"]):
+        try:
+            update_password_hash(row["id"], hasher.hash(password))
+        except HashingBusy:
+            pass  # bir sonraki login'de tekrar denenir
+
     session["user_id"] = row["id"]
+    prime_identity(row)
 
     # Eğer form üzerinden geliyorsa → yönlendirme yap
     if request.form:
@@ -150,30 +296,29 @@ def login():
 
 @app.route("/me", methods=["GET"])
 def me():
-    uid = session.get("user_id")
-    if not uid:
+    user = current_user()
+    if not user:
         return jsonify({"error": "not authenticated"}), 401
 
-    db = get_db()
-    row = db.execute(
-        "SELECT id, name, email FROM users WHERE id = ?", (uid,)
-    ).fetchone()
-
-    return jsonify({"user": dict(row)})
+    return jsonify({"user": {"id": user["id"], "name": user["name"], "email": user["email"]}})
 
 
 @app.route("/logout", methods=["GET", "POST"])
 def logout():
     session.clear()
-    return render_template("logout.html")
+    return static_pages.response("logout.html")
 
 
 
 # --- SERVICES ---
 @app.route("/services", methods=["GET"])
 def list_services():
-    services = get_all_services(active_only=True)
-    return jsonify(services), 200
+    # Önceden hazırlanmış JSON; tarayıcı ETag ile doğrular, değişmediyse 304 döner
+    _, body, etag = get_service_catalog(active_only=True)
+    resp = Response(body, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
 
 
 @app.route("/services", methods=["POST"])
@@ -189,7 +334,7 @@ def add_service():
     service_id = create_service(name, description, price)
 
     db = get_db()
-    row = db.execute("SELECT * FROM services WHERE id=?", (service_id,)).fetchone()
+    row = db.execute(f"SELECT {SERVICE_COLUMNS} FROM services WHERE id=?", (service_id,)).fetchone()
 
     return jsonify({
         "message": "service created",
@@ -205,8 +350,7 @@ def list_reservations():
     if not uid:
         return jsonify({"error": "not authenticated"}), 401
 
-    reservations = get_reservations_by_user(uid)
-    return jsonify(reservations), 200
+    return paged_json(*get_reservations_page(uid, *page_args(), **filter_args())), 200
 
 
 @app.route("/reservations", methods=["POST"])
@@ -224,7 +368,12 @@ def add_reservation():
     if not service_id or not start_time:
         return jsonify({"error": "service_id and start_time required"}), 400
 
-    res_id = create_reservation(uid, service_id, start_time, end_time, note)
+    try:
+        res_id = create_reservation(uid, service_id, start_time, end_time or None, note)
+    except InvalidBooking as e:
+        return jsonify({"error": str(e)}), 400
+    except BookingConflict as e:
+        return jsonify({"error": str(e)}), 409
     return jsonify({"message": "reservation created", "id": res_id}), 201
 
 
@@ -251,8 +400,7 @@ def list_complaints():
     if not uid:
         return jsonify({"error": "not authenticated"}), 401
 
-    complaints = get_complaints_by_user(uid)
-    return jsonify(complaints), 200
+    return paged_json(*get_complaints_page(uid, *page_args(), **filter_args())), 200
 
 
 @app.route("/complaints", methods=["POST"])
@@ -280,8 +428,11 @@ def invoices():
         return jsonify({"error": "not authenticated"}), 401
 
     if request.method == "GET":
-        invoices = get_invoices_by_user(uid)
-        return jsonify(invoices), 200
+        filters = filter_args()
+        filters.pop("status")
+        return paged_json(*get_invoices_page(
+            uid, *page_args(), paid=request.args.get("paid", type=int), **filters
+        )), 200
 
     if request.method == "POST":
         data = request.get_json(silent=True) or {}
@@ -295,7 +446,7 @@ def invoices():
             user_id=uid,
             total_amount=total_amount,
             issued_at=issued_at,
-            currency=data.get("currency", "TRY"),
+            currency=data.get("currency", DEFAULT_CURRENCY),
             paid=data.get("paid", 0),
             source="manual"
         )
@@ -328,14 +479,34 @@ def upload_invoices():
     if file.filename == "":
         return jsonify({"error": "empty filename"}), 400
 
-    filename = secure_filename(file.filename)
-    file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-    file.save(file_path)
-
-    # CSV import işlemini database.py hallediyor
-    import_invoices_from_csv(file_path, user_id=uid)
-
-    return jsonify({"message": "invoices imported from CSV"}), 201
+    # async=1: dosya benzersiz isimle kaydedilir, import arka planda yapılır
+    if request.values.get("async") == "1":
+        filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+        file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
+        file.save(file_path)
+        try:
+            job_id = jobs.submit("import_invoices", {
+                "file_path": file_path,
+                "user_id": uid,
+                "start_row": request.form.get("start_row", 0, type=int),
+            }, user_id=uid)
+        except QueueFull:
+            os.remove(file_path)
+            return jsonify({"error": "job queue is full, try again later"}), 503
+        return jsonify({"message": "import queued", "job_id": job_id}), 202, {"Location": f"/jobs/{job_id}"}
+
+    # CSV doğrudan upload stream'inden okunur, önce diske kaydedilmez
+    # start_row: yarıda kalan bir import'un checkpoint'inden devam etmek için
+    start_row = request.form.get("start_row", 0, type=int)
+    stats = import_invoices_from_stream(file.stream, user_id=uid, start_row=start_row)
+
+    # Arşiv istenirse benzersiz isimle sakla (aynı isimli upload'lar ezilmesin)
+    if app.config["KEEP_UPLOADED_FILES"]:
+        file.stream.seek(0)
+        filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+        file.save(os.path.join(app.config["UPLOAD_FOLDER"], filename))
+
+    return jsonify({"message": "invoices imported from CSV", **stats}), 201
 
 @app.route("/my-total")
 def my_total():
@@ -343,28 +514,115 @@ def my_total():
     if not uid:
         return jsonify({"error": "not authenticated"}), 401
 
-    total = get_user_total_from_invoices(uid)
-    return jsonify({"total_spent": total})
+    # total_spent varsayılan para birimindeki toplam; diğerleri totals içinde
+    totals = get_user_invoice_totals(uid)
+    return jsonify({"total_spent": totals.get(DEFAULT_CURRENCY, 0), "currency": DEFAULT_CURRENCY,
+                    "totals": totals})
+
+# --- BOOTSTRAP ---
+BOOTSTRAP_INCLUDE = ("user", "services", "reservations", "invoices", "complaints")
+
+@app.route("/api/bootstrap")
+def api_bootstrap():
+    # Misafir sayfasının ilk yüklemede istediği her şey tek yanıtta:
+    # ?include=services,reservations (varsayılan: hepsi)
+    user = current_user()
+    if not user:
+        return jsonify({"error": "not authenticated"}), 401
+    include = request.args.get("include")
+    include = include.split(",") if include else BOOTSTRAP_INCLUDE
+    unknown = set(include) - set(BOOTSTRAP_INCLUDE)
+    if unknown:
+        return jsonify({"error": f"unknown section: {', '.join(sorted(unknown))}"}), 400
+
+    # Kullanıcı ve katalog process içi cache'ten, listeler tek sorguda
+    data = get_guest_bootstrap(user["id"], include, request.args.get("limit", type=int))
+    if "user" in include:
+        data["user"] = {"id": user["id"], "name": user["name"], "email": user["email"]}
+    if "services" in include:
+        data["services"] = get_service_catalog(active_only=True)[0]
+    return jsonify(data), 200
+
+# --- EVENTS ---
+@app.route("/events")
+def event_stream():
+    # Kullanıcının şikayet/rezervasyon/fatura durum değişiklikleri (text/event-stream)
+    uid = session.get("user_id")
+    if not uid:
+        return jsonify({"error": "not authenticated"}), 401
+    try:
+        sub = events.subscribe(uid)
+    except TooManySubscribers:
+        return jsonify({"error": "too many event streams"}), 503, {"Retry-After": "30"}
+
+    resp = Response(events.stream(sub), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    resp.call_on_close(sub.close)  # gövde hiç okunmadan kapanırsa da abonelik bırakılsın
+    return resp
+
+# --- JOBS ---
+@app.route("/jobs/<int:job_id>")
+def job_status(job_id):
+    uid = session.get("user_id")
+    if not uid:
+        return jsonify({"error": "not authenticated"}), 401
+
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"error": "job not found"}), 404
+    if job["user_id"] != uid and not is_admin(uid):
+        return jsonify({"error": "not authorized"}), 403
+
+    job.pop("payload")
+    job.pop("result")
+    return jsonify(job), 200
+
+@app.route("/jobs/<int:job_id>/result")
+def job_result(job_id):
+    uid = session.get("user_id")
+    if not uid:
+        return jsonify({"error": "not authenticated"}), 401
+
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"error": "job not found"}), 404
+    if job["user_id"] != uid and not is_admin(uid):
+        return jsonify({"error": "not authorized"}), 403
+
+    if job["status"] == "failed":
+        return jsonify({"status": job["status"], "error": job["error"]}), 500
+    if job["status"] != "done":
+        return jsonify({"status": job["status"]}), 202, {"Retry-After": "1"}
+    return jsonify({"status": job["status"], "result": job["result"]}), 200
+
+@app.route("/jobs/metrics")
+def job_metrics():
+    uid = session.get("user_id")
+    if not uid or not is_admin(uid):
+        return jsonify({"error": "not authorized"}), 403
+
+    return jsonify(jobs.metrics()), 200
 
 @app.route("/logout-test")
 def logout_test_page():
-    return render_template("logout.html")
+    return static_pages.response("logout.html")
 
 @app.route("/services-page")
 def services_page():
-    return render_template("services.html")
+    return static_pages.response("services.html")
 
 @app.route("/reservations-page")
 def reservations_page():
-    return render_template("reservations.html")
+    return static_pages.response("reservations.html")
 
 @app.route("/complaints-page")
 def complaints_page():
-    return render_template("complaints.html")
+    return static_pages.response("complaints.html")
 
 @app.route("/invoices-page")
 def invoices_page():
-    return render_template("invoices.html")
+    return static_pages.response("invoices.html")
 
 """@app.route("/my-total")
 def my_total():
@@ -384,18 +642,22 @@ def dashboard():
     if not is_admin(uid):
         return jsonify({"error": "not authorized"}), 403
 
-    db = get_db()
-    stats = {}
-    stats["total_users"] = db.execute("SELECT COUNT(*) as c FROM users").fetchone()["c"]
-    stats["total_reservations"] = db.execute("SELECT COUNT(*) as c FROM reservations").fetchone()["c"]
-    stats["total_income"] = db.execute("SELECT SUM(total_amount) as s FROM invoices").fetchone()["s"] or 0
-    stats["open_complaints"] = db.execute("SELECT COUNT(*) as c FROM complaints WHERE status='open'").fetchone()["c"]
+    # Parçalar ilgili tabloların sürümü değişmedikçe yeniden sorgulanıp render edilmez
+    versions = get_data_versions()
+
+    # Sayaçlar trigger'larla güncel tutulan stats tablosundan okunur
+    stats_html = fragments.render("dashboard_stats.html", (versions["stats"],),
+                                  lambda: {"stats": get_dashboard_stats()})
 
-    # Kullanıcı listesi
-    rows = db.execute("SELECT id, name, email FROM users ORDER BY name ASC").fetchall()
-    users = [dict(r) for r in rows]
+    # Kullanıcı listesi (sayfalı)
+    def load_users():
+        users, next_cursor = get_users_page(*page_args())
+        return {"users": users, "next_url": next_page_url(next_cursor)}
 
-    return render_template("dashboard.html", stats=stats, users=users)
+    users_html = fragments.render("dashboard_users.html",
+                                  (versions["users"], request.query_string), load_users)
+
+    return render_template("dashboard.html", stats_html=stats_html, users_html=users_html)
 
 
 
@@ -407,9 +669,12 @@ def admin_users():
     if not is_admin(uid):
         return jsonify({"error": "not authorized"}), 403
 
-    db = get_db()
-    rows = db.execute("SELECT id, name, email FROM users ORDER BY name ASC").fetchall()
-    return render_template("admin_users.html", users=[dict(r) for r in rows])
+    def load():
+        users, next_cursor = get_users_page(*page_args(), role=request.args.get("role"))
+        return {"users": users, "next_url": next_page_url(next_cursor)}
+
+    return fragments.render("admin_users.html",
+                            (get_data_versions()["users"], request.query_string), load)
 
 @app.route("/admin/user/<int:user_id>")
 def admin_user_detail(user_id):
@@ -419,33 +684,33 @@ def admin_user_detail(user_id):
     if not is_admin(uid):
         return jsonify({"error": "not authorized"}), 403
 
-    db = get_db()
-    user = db.execute("SELECT id, name, email FROM users WHERE id=?", (user_id,)).fetchone()
-    if not user:
+    # Kullanıcı ve tüm ilişkili kayıtlar tek sorguda; sayfa, içerdiği tabloların
+    # sürümü değişmedikçe cache'ten döner
+    versions = get_data_versions()
+    html = fragments.render(
+        "admin_user_detail.html",
+        (user_id, versions["users"], versions["services"], versions["reservations"],
+         versions["invoices"], versions["complaints"]),
+        lambda: get_user_detail(user_id),
+    )
+    if html is None:
         return "User not found", 404
 
-    reservations = db.execute("""
-        SELECT r.id, s.name as service_name, r.start_time, r.end_time, r.status
-        FROM reservations r
-        JOIN services s ON r.service_id = s.id
-        WHERE r.user_id=?
-    """, (user_id,)).fetchall()
+    return html
 
-    invoices = db.execute("""
-        SELECT id, total_amount, currency, issued_at, paid, source
-        FROM invoices WHERE user_id=?
-    """, (user_id,)).fetchall()
 
-    complaints = db.execute("""
-        SELECT id, title, text, status, created_at
-        FROM complaints WHERE user_id=?
-    """, (user_id,)).fetchall()
+@app.route("/admin/user/<int:user_id>/role", methods=["POST"])
+def admin_update_role(user_id):
+    uid = session.get("user_id")
+    if not uid or not is_admin(uid):
+        return jsonify({"error": "not authorized"}), 403
+
+    role = request.form.get("role") or (request.get_json(silent=True) or {}).get("role")
+    if role not in ["user", "admin"]:
+        return jsonify({"error": "invalid role"}), 400
 
-    return render_template("admin_user_detail.html",
-                           user=dict(user),
-                           reservations=[dict(r) for r in reservations],
-                           invoices=[dict(i) for i in invoices],
-                           complaints=[dict(c) for c in complaints])
+    set_user_role(user_id, role)
+    return redirect(request.referrer or f"/admin/user/{user_id}")
 
 
 # --- ADMIN: Complaints yönetimi ---
@@ -455,14 +720,22 @@ def admin_complaints():
     if not uid or not is_admin(uid):
         return jsonify({"error": "not authorized"}), 403
 
-    db = get_db()
-    rows = db.execute("""
-        SELECT c.id, u.name as user_name, c.title, c.text, c.status, c.created_at
-        FROM complaints c
-        JOIN users u ON c.user_id = u.id
-        ORDER BY c.created_at DESC
-    """).fetchall()
-    return render_template("admin_complaints.html", complaints=[dict(r) for r in rows])
+    query = request.args.get("q", "").strip()
+    if query:
+        complaints, next_cursor = search_complaints(query, *page_args(), **filter_args())
+    else:
+        complaints, next_cursor = get_complaints_page(None, *page_args(), **filter_args())
+    return render_template("admin_complaints.html", complaints=complaints, query=query,
+                           next_url=next_page_url(next_cursor))
+
+@app.route("/admin/complaints/search")
+def admin_search_complaints():
+    uid = session.get("user_id")
+    if not uid or not is_admin(uid):
+        return jsonify({"error": "not authorized"}), 403
+
+    # En alakalı önce; title_html / snippet_html eşleşmeleri <mark> ile işaretli
+    return paged_json(*search_complaints(request.args.get("q", ""), *page_args(), **filter_args())), 200
 
 @app.route("/admin/complaint/<int:cid>/status", methods=["POST"])
 def admin_update_complaint(cid):
@@ -474,9 +747,9 @@ def admin_update_complaint(cid):
     if new_status not in ["open", "in_progress", "resolved"]:
         return jsonify({"error": "invalid status"}), 400
 
-    db = get_db()
-    db.execute("UPDATE complaints SET status=? WHERE id=?", (new_status, cid))
-    db.commit()
+    owner = update_complaint_status(cid, new_status)
+    if owner:
+        events.publish(owner, "complaint", id=cid, status=new_status)
     return redirect("/admin/complaints")
 
 @app.route("/admin/reservation/<int:rid>/status", methods=["POST"])
@@ -489,9 +762,9 @@ def admin_update_reservation(rid):
     if new_status not in ["pending", "approved", "cancelled"]:
         return jsonify({"error": "invalid status"}), 400
 
-    db = get_db()
-    db.execute("UPDATE reservations SET status=? WHERE id=?", (new_status, rid))
-    db.commit()
+    owner = update_reservation_status(rid, new_status)
+    if owner:
+        events.publish(owner, "reservation", id=rid, status=new_status)
     return redirect(request.referrer or "/dashboard")
 
 
@@ -502,13 +775,94 @@ def admin_update_invoice(invoice_id):
         return jsonify({"error": "not authorized"}), 403
 
     paid = int(request.form.get("paid", 0))
-    db = get_db()
-    db.execute("UPDATE invoices SET paid=? WHERE id=?", (paid, invoice_id))
-    db.commit()
+    owner = update_invoice_status(invoice_id, paid)
+    if owner:
+        events.publish(owner, "invoice", id=invoice_id, paid=paid)
 
     # geri ilgili user detail sayfasına dön
     return redirect(request.referrer or "/dashboard")
 
+# --- ADMIN: Export ---
+@app.route("/admin/export/<kind>")
+def admin_export(kind):
+    uid = session.get("user_id")
+    if not uid or not is_admin(uid):
+        return jsonify({"error": "not authorized"}), 403
+    if kind not in EXPORTS:
+        return jsonify({"error": "unknown export"}), 404
+
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    columns = export_columns(kind)
+    batches = iter_export_rows(kind, request.args.get("from"), request.args.get("to"))
+
+    def generate_ndjson():
+        for rows in batches:
+            yield "".join(json.dumps(dict(zip(columns, r)), ensure_ascii=False) + "\n" for r in rows)
+
+    def generate_csv():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(columns)
+        for rows in batches:
+            writer.writerows(rows)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()
+
+    if fmt == "csv":
+        return Response(generate_csv(), mimetype="text/csv",
+                        headers={"Content-Disposition": f"attachment; filename={kind}.csv"})
+    return Response(generate_ndjson(), mimetype="application/x-ndjson",
+                    headers={"Content-Disposition": f"attachment; filename={kind}.ndjson"})
+
+
+# --- ADMIN: Reports ---
+@app.route("/admin/reports")
+def admin_reports():
+    uid = session.get("user_id")
+    if not uid or not is_admin(uid):
+        return jsonify({"error": "not authorized"}), 403
+    return jsonify({"reports": list(REPORTS), "grains": [*REPORT_GRAINS, *REPORT_PERIODS],
+                    "status": get_report_status()})
+
+
+@app.route("/admin/reports/<kind>")
+def admin_report(kind):
+    uid = session.get("user_id")
+    if not uid or not is_admin(uid):
+        return jsonify({"error": "not authorized"}), 403
+    if kind not in REPORTS:
+        return jsonify({"error": "unknown report"}), 404
+
+    grain = request.args.get("grain", "day")
+    if grain not in REPORT_GRAINS and grain not in REPORT_PERIODS:
+        return jsonify({"error": "grain must be one of hour, day, week, month"}), 400
+
+    rows, truncated = get_report(kind, grain, request.args.get("from"), request.args.get("to"),
+                                 request.args.get("service_id", type=int))
+    return jsonify({"report": kind, "grain": grain, "rows": rows, "truncated": truncated})
+
+
+@app.route("/admin/reports/rebuild", methods=["POST"])
+def admin_rebuild_reports():
+    uid = session.get("user_id")
+    if not uid or not is_admin(uid):
+        return jsonify({"error": "not authorized"}), 403
+
+    reset_reports()
+    try:
+        job_id = jobs.submit("backfill_reports", {}, user_id=uid)
+    except QueueFull:
+        # Rollup'lar boş kaldı; periyodik backfill turu dolduracak
+        return jsonify({"error": "job queue is full, reports will be rebuilt later"}), 503
+    return jsonify({"message": "rebuild queued", "job_id": job_id}), 202, {"Location": f"/jobs/{job_id}"}
+
+
 # --- ADMIN: Services management ---
 @app.route("/admin/services", methods=["GET"])
 def admin_services():
@@ -517,7 +871,7 @@ def admin_services():
         return jsonify({"error": "not authorized"}), 403
 
     db = get_db()
-    rows = db.execute("SELECT id, name, description, price FROM services").fetchall()
+    rows = db.execute(f"SELECT {SERVICE_COLUMNS} FROM services").fetchall()
     return render_template("admin_services.html", services=[dict(r) for r in rows])
 
 
@@ -530,16 +884,13 @@ def admin_add_service():
     name = request.form.get("name")
     description = request.form.get("description")
     price = request.form.get("price")
+    capacity = request.form.get("capacity", 0, type=int)
+    slot_minutes = request.form.get("slot_minutes", 0, type=int)
 
     if not name or not price:
         return "Name and price required", 400
 
-    db = get_db()
-    db.execute(
-        "INSERT INTO services (name, description, price) VALUES (?, ?, ?)",
-        (name, description, price),
-    )
-    db.commit()
+    create_service(name, description, price, capacity=capacity, slot_minutes=slot_minutes)
     return redirect("/admin/services")
 
 
@@ -551,13 +902,11 @@ def admin_update_service(sid):
 
     description = request.form.get("description")
     price = request.form.get("price")
+    capacity = request.form.get("capacity", type=int)
+    slot_minutes = request.form.get("slot_minutes", type=int)
 
-    db = get_db()
-    db.execute(
-        "UPDATE services SET description=?, price=? WHERE id=?",
-        (description, price, sid),
-    )
-    db.commit()
+    update_service(sid, description=description, price=price or None,
+                   capacity=capacity, slot_minutes=slot_minutes)
     return redirect("/admin/services")
 
 
@@ -0,0 +1,289 @@
+import asyncio, math, os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qsl, urlencode
+
+from itsdangerous import BadSignature
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_cookie, parse_etags
+
+from app import app as flask_app, hasher, jobs, events
+from events import TooManySubscribers
+from database import (
+    InvalidCursor, DEFAULT_CURRENCY, warm_pools, close_pools,
+    get_service_catalog, get_identity, get_reservations_page, get_complaints_page,
+    get_invoices_page, get_user_invoice_totals,
+)
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:  # sadece diğer route'ları Flask'a aktarmak için gerekli
+    WSGIMiddleware = None
+
+# Misafir JSON API'sinin ASGI sürümü; odalardaki tabletler gibi çok sayıda
+# keep-alive bağlantıyla periyodik sorgu yapan istemciler için.
+#
+#     uvicorn asgi:app --host 0.0.0.0 --port 8001
+#
+# GET /services, /reservations, /complaints, /invoices, /my-total, /me ve
+# /health event loop'ta karşılanır: bağlantı başına thread tutulmaz, boştaki
+# bağlantı sadece bir coroutine'dir. Sorgular database.py'deki aynı
+# fonksiyonlarla, sınırlı bir thread havuzunda (DBExecutor) app context içinde
+# çalışır (sqlite3 bloklayan bir API); havuzun önünde ASYNC_MAX_PENDING'den
+# fazla iş birikirse yeni istekler beklemek yerine 503 alır.
+#
+# /events (SSE) de burada akar: boştaki abone event loop'ta bekleyen bir
+# coroutine'dir, thread tutmaz; binlerce tablet bağlantısı için EVENTS_MAX_SUBSCRIBERS
+# yükseltilebilir. gunicorn worker'larındaki publish'lerin buraya ulaşması için iki
+# tarafta aynı EVENTS_RELAY_DIR verilir (bkz. events.start_relay) ve proxy /events'i
+# bu sürece yönlendirir. Açık akışlar uvicorn'un kapanışını bekletmesin diye
+# --timeout-graceful-shutdown verilmeli; kopan EventSource kendiliğinden yeniden bağlanır.
+#
+# Oturum Flask'ın imzalı session cookie'sidir (aynı SECRET_KEY ile doğrulanır).
+# Login/logout dahil diğer tüm route'lar a2wsgi ile Flask uygulamasına
+# aktarılır (ASYNC_WSGI_THREADS thread'de), yani bu süreç tek başına da
+# servis edebilir.
+
+ASYNC_DB_THREADS = int(os.environ.get("ASYNC_DB_THREADS", os.environ.get("DB_POOL_SIZE", 8)))
+ASYNC_MAX_PENDING = int(os.environ.get("ASYNC_MAX_PENDING", 1000))
+ASYNC_WSGI_THREADS = int(os.environ.get("ASYNC_WSGI_THREADS", 16))
+
+
+class Overloaded(Exception):
+    pass
+
+
+class DBExecutor:
+    """database.py fonksiyonlarını event loop'u bloklamadan, app context içinde çalıştırır."""
+
+    def __init__(self, app, threads=8, max_pending=1000):
+        self.app = app
+        self.threads = threads
+        self.max_pending = max_pending
+        self.pending = 0  # sadece event loop thread'inde değişir
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="async-db")
+
+    async def run(self, fn, *args, **kwargs):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, partial(self._call, fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def _call(self, fn, *args, **kwargs):
+        # teardown_appcontext bağlantıyı havuza geri verir
+        with self.app.app_context():
+            return fn(*args, **kwargs)
+
+    async def start(self):
+        await asyncio.get_running_loop().run_in_executor(self._executor, warm_pools, self.threads)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        close_pools()
+
+
+db = DBExecutor(flask_app, threads=ASYNC_DB_THREADS, max_pending=ASYNC_MAX_PENDING)
+wsgi = WSGIMiddleware(flask_app, workers=ASYNC_WSGI_THREADS) if WSGIMiddleware else None
+# Flask'taki hız sınırları (ratelimit.py) burada da aynı anahtarlarla uygulanır
+limiter = flask_app.extensions.get("ratelimit")
+
+
+# --- Request / oturum ---
+class Request:
+    def __init__(self, scope):
+        self.path = scope["path"]
+        self.args = MultiDict(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+        self.headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+
+
+_session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+
+def session_user_id(request):
+    # Flask'ın SecureCookieSessionInterface.open_session'ı ile aynı doğrulama
+    cookie = parse_cookie(request.headers.get("cookie", "")).get(flask_app.config["SESSION_COOKIE_NAME"])
+    if not cookie:
+        return None
+    try:
+        data = _session_serializer.loads(
+            cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return None
+    return data.get("user_id")
+
+
+def json_body(data):
+    # jsonify ile aynı çıktı (sort_keys, kompakt, sonda satır sonu)
+    return (flask_app.json.dumps(data, separators=(",", ":")) + "\n").encode()
+
+def page_args(request):
+    return request.args.get("cursor"), request.args.get("limit", type=int)
+
+def filter_args(request):
+    return {
+        "status": request.args.get("status") or None,
+        "date_from": request.args.get("from") or None,
+        "date_to": request.args.get("to") or None,
+    }
+
+def paged(request, rows, next_cursor):
+    headers = []
+    if next_cursor:
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        headers = [("X-Next-Cursor", next_cursor), ("Link", f'<{request.path}?{urlencode(args)}>; rel="next"')]
+    return 200, json_body(rows), headers
+
+
+# --- Route'lar (hepsi GET; handler (status, body, headers) döndürür, stream=True
+# ise cevabı kendisi gönderir) ---
+ROUTES = {}
+
+def route(path, auth=True, stream=False):
+    # Flask'taki endpoint adı: route'a özel hız sınırları aynı isimle eşleşsin
+    endpoint = flask_app.url_map.bind("localhost").match(path, method="GET")[0]
+
+    def register(fn):
+        ROUTES[path] = (fn, auth, endpoint, stream)
+        return fn
+    return register
+
+
+@route("/health", auth=False)
+async def health(request, uid):
+    return 200, b"OK", [("Content-Type", "text/html; charset=utf-8")]
+
+
+@route("/services", auth=False)
+async def list_services(request, uid):
+    _, body, etag = await db.run(get_service_catalog, active_only=True)
+    headers = [("ETag", f'"{etag}"'), ("Cache-Control", "no-cache")]
+    if parse_etags(request.headers.get("if-none-match")).contains(etag):
+        return 304, b"", headers
+    return 200, body, headers
+
+
+@route("/me")
+async def me(request, uid):
+    user = await db.run(get_identity, uid)
+    if not user:
+        return 401, json_body({"error": "not authenticated"}), []
+    return 200, json_body({"user": {"id": user["id"], "name": user["name"], "email": user["email"]}}), []
+
+
+@route("/reservations")
+async def list_reservations(request, uid):
+    return paged(request, *await db.run(get_reservations_page, uid, *page_args(request), **filter_args(request)))
+
+
+@route("/complaints")
+async def list_complaints(request, uid):
+    return paged(request, *await db.run(get_complaints_page, uid, *page_args(request), **filter_args(request)))
+
+
+@route("/invoices")
+async def list_invoices(request, uid):
+    filters = filter_args(request)
+    filters.pop("status")
+    return paged(request, *await db.run(get_invoices_page, uid, *page_args(request),
+                                        paid=request.args.get("paid", type=int), **filters))
+
+
+@route("/my-total")
+async def my_total(request, uid):
+    totals = await db.run(get_user_invoice_totals, uid)
+    return 200, json_body({"total_spent": totals.get(DEFAULT_CURRENCY, 0), "currency": DEFAULT_CURRENCY,
+                           "totals": totals}), []
+
+
+@route("/events", stream=True)
+async def event_stream(request, uid, receive, send):
+    try:
+        sub = events.subscribe(uid)
+    except TooManySubscribers:
+        return await send_response(send, 503, json_body({"error": "too many event streams"}),
+                                   [("Retry-After", "30")])
+
+    async def watch_disconnect():
+        # uvicorn kopan istemciye send'de hata vermez; abonelik burada kapanır
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        sub.close()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    stream = events.astream(sub)
+    try:
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8"),
+                                (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]})
+        async for chunk in stream:
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        watcher.cancel()
+        await stream.aclose()
+
+
+# --- ASGI giriş noktası ---
+async def send_response(send, status, body, headers):
+    names = {name.lower() for name, _ in headers}
+    if "content-type" not in names:
+        headers = [("Content-Type", "application/json"), *headers]
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-length", str(len(body)).encode()),
+                            *((name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers)]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if os.environ.get("EVENTS_RELAY_DIR"):
+                events.start_relay(os.environ["EVENTS_RELAY_DIR"])
+            await db.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            events.close_all()
+            db.shutdown()
+            jobs.shutdown(wait=False)
+            hasher.shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return  # websocket yok; sunucu bağlantıyı kapatır
+    entry = ROUTES.get(scope["path"]) if scope["method"] == "GET" else None
+    if entry is None:
+        if wsgi is None:
+            return await send_response(send, 404, json_body({"error": "not found"}), [])
+        return await wsgi(scope, receive, send)
+
+    handler, auth, endpoint, stream = entry
+    request = Request(scope)
+    uid = session_user_id(request)
+    if limiter is not None:
+        retry_after = limiter.check((scope.get("client") or ("",))[0], uid, "GET", endpoint)
+        if retry_after is not None:
+            return await send_response(send, 429, json_body({"error": "too many requests"}),
+                                       [("Retry-After", str(math.ceil(retry_after)))])
+    if auth and not uid:
+        return await send_response(send, 401, json_body({"error": "not authenticated"}), [])
+    if stream:
+        return await handler(request, uid, receive, send)
+    try:
+        status, body, headers = await handler(request, uid)
+    except InvalidCursor as e:
+        status, body, headers = 400, json_body({"error": str(e)}), []
+    except Overloaded:
+        status, body, headers = 503, json_body({"error": "server busy, try again"}), [("Retry-After", "1")]
+    await send_response(send, status, body, headers)
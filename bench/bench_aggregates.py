@@ -0,0 +1,101 @@
+"""Tam sayı tutar migration'ı ve gelir rollup'ları, milyonlarca fatura üzerinde.
+
+Önce faturalar eski şemayla (REAL total_amount, migration 4) yazılır; migration 5
+süresi ve VACUUM sonrası tablo / index boyutları karşılaştırılır. Sonra (kullanıcı,
+para birimi, gün) rollup'ı: indekssiz ham satırları Python'da toplamak (eski
+durum) vs idx_invoices_day üzerinden tek GROUP BY geçişi, ve bu gruplardan
+türetilen kaba toplamlar için saf Python vs NumPy.
+
+    python bench/bench_aggregates.py [fatura_sayısı] [kullanıcı_sayısı]
+"""
+import os, random, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask
+import aggregates, database
+
+CURRENCIES = ("TRY", "TRY", "TRY", "EUR", "USD")
+
+
+def seed(db, invoices, users):
+    rnd = random.Random(7)
+    db.executemany("INSERT INTO users (name, email) VALUES (?, ?)",
+                   ((f"Guest {i}", f"guest{i}@example.com") for i in range(users)))
+    batch = 200_000
+    for start in range(0, invoices, batch):
+        db.executemany(
+            "INSERT INTO invoices (user_id, total_amount, currency, issued_at) VALUES (?, ?, ?, ?)",
+            ((rnd.randint(1, users), rnd.randint(100, 500_000) / 100, rnd.choice(CURRENCIES),
+              f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} {rnd.randint(0, 23):02d}:00:00")
+             for _ in range(min(batch, invoices - start))))
+        db.commit()
+
+
+def sizes_mb(db):
+    db.execute("VACUUM")
+    rows = db.execute("""SELECT name, SUM(pgsize) FROM dbstat
+                         WHERE name = 'invoices' OR name LIKE 'idx_invoices_%' GROUP BY name""")
+    return {name: size / 1e6 for name, size in rows}
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def python_rollup(date_from, date_to):
+    # baseline: tarih indeksi yokken ham faturaları okuyup Python'da gruplamak
+    totals = {}
+    db = database.get_db()
+    cur = db.execute("SELECT user_id, currency, date(issued_at), amount_minor FROM invoices NOT INDEXED "
+                     "WHERE date(issued_at) BETWEEN ? AND ?", (date_from, date_to))
+    cur.row_factory = None
+    for user_id, currency, day, amount in cur:
+        key = (user_id, currency, day)
+        count, total = totals.get(key, (0, 0))
+        totals[key] = (count + 1, total + amount)
+    return totals
+
+
+def main():
+    invoices = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    with Flask(__name__).app_context():
+        migrations = database.MIGRATIONS
+        database.MIGRATIONS = migrations[:4]
+        database.init_db()
+        db = database.get_db()
+        seed(db, invoices, users)
+        before = sizes_mb(db)
+        database.MIGRATIONS = migrations
+        _, migrate_s = timed(database.migrate, db)
+        after = sizes_mb(db)
+        print(f"{invoices:,} invoices, {users:,} users, migration 5: {migrate_s:.1f}s")
+        for name in sorted(set(before) | set(after)):
+            print(f"  {name:<26} {before.get(name, 0):>7.1f} MB -> {after.get(name, 0):>7.1f} MB")
+        print()
+
+        print(f"{'window':<8} {'groups':>9} {'python rows':>12} "
+              f"{'load py':>9} {'derive py':>10} {'load numpy':>11} {'derive numpy':>13}")
+        engines = ("python", "numpy") if aggregates.np is not None else ("python",)
+        for label, window in (("1 month", ("2025-09-01", "2025-09-30")),
+                              ("1 year", ("2025-01-01", "2025-12-31"))):
+            baseline, baseline_s = timed(python_rollup, *window)
+            timings, derived = [], {}
+            for engine in engines:
+                rollup, load_s = timed(aggregates.revenue_rollup, *window, engine)
+                assert rollup.totals(*aggregates.DIMENSIONS) == baseline
+                started = time.perf_counter()
+                derived[engine] = [rollup.totals(*dims) for dims in
+                                   (("currency",), ("currency", "day"), ("user_id", "currency"))]
+                timings += [load_s, time.perf_counter() - started]
+            assert all(d == derived["python"] for d in derived.values())
+            cols = "".join(f"{t * 1000:>9,.0f}ms" for t in timings) if timings else ""
+            print(f"{label:<8} {len(rollup):>9,} {baseline_s * 1000:>10,.0f}ms {cols}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Çok sayıda keep-alive bağlantı: asgi.py (uvicorn) vs thread'li Flask sunucuları.
+
+Odalardaki tabletleri taklit eder: her bağlantı ayrı bir misafir oturumuyla
+açılır ve --interval saniyede bir (rastgele kaydırmalı) misafir GET
+endpoint'lerinden birini sorgular. Bağlantı sayısı (--connections) artırılarak
+her hedef ayrı process olarak aynı veritabanıyla başlatılır; tamamlanan istek
+hızı, p50/p99 ve hata (zaman aşımı / kopan bağlantı / 5xx) ile kurulamayan
+bağlantı sayısı yazılır.
+Oturum cookie'leri giriş yapmadan, uygulamanın SECRET_KEY'i ile imzalanır.
+
+İstemci aynı makinede çalışır; tek çekirdekte istemci ve sunucu aynı CPU'yu
+paylaşır, sonuçlar mutlak kapasite değil karşılaştırma içindir.
+
+    python bench/seed_data.py --scale 0.1 --reset
+    python bench/bench_async.py [--db yol] [--connections 100,500,1000,2000] [--interval 1]
+                                [--targets uvicorn,gunicorn,debug] [--duration 20]
+"""
+import argparse, asyncio, os, random, signal, subprocess, sys, tempfile, time, urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import database
+
+PATHS = ("/me", "/services", "/reservations?limit=20", "/complaints?limit=20", "/invoices?limit=20", "/my-total")
+PORT = 8000
+TARGETS = {
+    "uvicorn": [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(PORT), "--log-level", "warning",
+                "--no-access-log", "--timeout-keep-alive", "30"],
+    # gunicorn.conf.py varsayılanları (gthread, worker başına WEB_THREADS thread)
+    "gunicorn": ["gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+    "debug": [sys.executable, "-c", f"import app; app.app.run(port={PORT}, threaded=True)"],
+}
+TIMEOUT = 10.0
+
+
+def session_cookies(db_path, count):
+    database.DB_PATH = db_path
+    # Hız sınırları / yük reddi (ratelimit.py) ölçülen request'leri 429 / 503'e çevirmesin;
+    # sunucular da bu ortamla başlatılır
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+    from app import app
+    serializer = app.session_interface.get_signing_serializer(app)
+    with app.app_context():
+        ids = [r[0] for r in database.get_db().execute(
+            "SELECT id FROM users WHERE role != 'admin' ORDER BY id LIMIT ?", (count,))]
+    name = app.config["SESSION_COOKIE_NAME"]
+    return [f"{name}={serializer.dumps({'user_id': uid})}" for uid in ids]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.connect_errors = 0
+        self.measuring = False
+
+
+async def read_response(reader):
+    """(status, keep_alive) döndürür."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    length, keep_alive = 0, True
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name == b"content-length":
+            length = int(value)
+        elif name == b"connection" and value.strip().lower() == b"close":
+            keep_alive = False
+    await reader.readexactly(length)
+    return int(status_line.split()[1]), keep_alive
+
+
+async def client(cookie, stats, interval, stop_at, rnd):
+    writer = None
+    try:
+        await asyncio.sleep(rnd.random() * interval)  # bağlantılar aynı anda gelmesin
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            if writer is None:
+                # Sunucu keep-alive desteklemiyorsa (geliştirme sunucusu) her istekte yeniden bağlanılır
+                try:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", PORT), TIMEOUT)
+                except (OSError, asyncio.TimeoutError):
+                    stats.connect_errors += 1
+                    return
+            writer.write(f"GET {rnd.choice(PATHS)} HTTP/1.1\r\nHost: bench\r\nCookie: {cookie}\r\n\r\n".encode())
+            try:
+                status, keep_alive = await asyncio.wait_for(read_response(reader), TIMEOUT)
+            except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                if stats.measuring:
+                    stats.errors += 1
+                return
+            if stats.measuring:
+                if status >= 500:
+                    stats.errors += 1
+                else:
+                    stats.latencies.append(time.perf_counter() - started)
+            if not keep_alive:
+                writer.close()
+                writer = None
+            await asyncio.sleep(interval * rnd.uniform(0.5, 1.5))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def drive(cookies, connections, interval, warmup, duration, seed):
+    stats = Stats()
+    rnd = random.Random(seed)
+    stop_at = time.monotonic() + warmup + duration
+    tasks = [asyncio.create_task(client(cookies[i % len(cookies)], stats, interval, stop_at,
+                                        random.Random(rnd.random())))
+             for i in range(connections)]
+    await asyncio.sleep(warmup)
+    stats.measuring = True
+    started = time.perf_counter()
+    await asyncio.gather(*tasks)
+    return stats, time.perf_counter() - started
+
+
+def wait_ready(proc, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{PORT}/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server did not become ready in {timeout}s")
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))] * 1000 if sorted_values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=database.DB_PATH, help="seed_data.py ile doldurulmuş veritabanı")
+    parser.add_argument("--targets", default="uvicorn,gunicorn,debug")
+    parser.add_argument("--connections", default="100,500,1000,2000")
+    parser.add_argument("--interval", type=float, default=1.0, help="bağlantı başına sorgu aralığı (sn)")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    args.db = os.path.abspath(args.db)
+    levels = [int(n) for n in args.connections.split(",")]
+    cookies = session_cookies(args.db, max(levels))
+    env = dict(os.environ, DB_PATH=args.db, WEB_BIND=f"127.0.0.1:{PORT}", WEB_WORKERS="1")
+
+    print(f"{args.db}, poll every {args.interval:g}s per connection, {args.duration:.0f}s per run, "
+          f"{os.cpu_count()} CPU core(s)")
+    print(f"{'target':<10} {'conns':>6} {'offered':>8} {'done/s':>8} {'p50':>9} {'p99':>9} {'errors':>7} {'refused':>8}")
+    for target in args.targets.split(","):
+        for connections in levels:
+            log = tempfile.NamedTemporaryFile(prefix=f"{target}-", suffix=".log", delete=False)
+            proc = subprocess.Popen(TARGETS[target], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+                                    start_new_session=True)
+            try:
+                wait_ready(proc)
+                stats, elapsed = asyncio.run(drive(cookies, connections, args.interval, args.warmup,
+                                                   args.duration, args.seed))
+            finally:
+                os.killpg(proc.pid, signal.SIGTERM)
+                try:
+                    proc.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    os.killpg(proc.pid, signal.SIGKILL)
+            latencies = sorted(stats.latencies)
+            print(f"{target:<10} {connections:>6,} {connections / args.interval:>8,.0f} "
+                  f"{len(latencies) / elapsed:>8,.1f} {percentile(latencies, .5):>7.1f}ms "
+                  f"{percentile(latencies, .99):>7.1f}ms {stats.errors:>7,} {stats.connect_errors:>8,}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
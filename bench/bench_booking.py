@@ -0,0 +1,84 @@
+"""Tek bir slota çok sayıda thread'den eşzamanlı rezervasyon: overbooking kontrolü.
+
+Ardından kapasitesi 1 olan ikinci bir servise aynı saat farklı ISO yazımlarıyla
+("20250907T1000", "2025-W36-7T10:00" ...) rezervasyon yapılır: sadece ilki
+kabul edilmeli ve her rezervasyonun bir reservation_slots satırı olmalı.
+
+    python bench/bench_booking.py [deneme_sayısı] [thread_sayısı] [kapasite]
+"""
+import os, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import database
+
+SLOT = "2025-09-07T10:00"
+# fromisoformat'ın kabul ettiği, SQLite strftime'ın okuyamadığı yazımlar (aynı an)
+SLOT_SPELLINGS = ("20250907T1000", "2025-W36-7T10:00", "2025-09-07 10:00:00", "2025-09-07T10")
+
+
+def main():
+    attempts = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    capacity = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    database.POOL = database.ConnectionPool(size=threads)
+    # Hız sınırları / yük reddi (ratelimit.py) ölçülen request'leri 429 / 503'e çevirmesin
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+    from app import app
+
+    with app.app_context():
+        database.init_db()
+        db = database.get_db()
+        db.executemany("INSERT INTO users (name, email) VALUES (?, ?)",
+                       ((f"Guest {i}", f"guest{i}@example.com") for i in range(threads)))
+        db.commit()
+        spa = database.create_service("Spa", "", 100, capacity=capacity, slot_minutes=60)
+        sauna = database.create_service("Sauna", "", 100, capacity=1, slot_minutes=60)
+
+    def book_as(service_id, start_time):
+        with app.app_context():
+            try:
+                database.create_reservation(1, service_id, start_time)
+                return "ok"
+            except database.BookingConflict:
+                return "full"
+
+    def book(i):
+        with app.app_context():
+            try:
+                database.create_reservation(i % threads + 1, spa, SLOT)
+                return "ok"
+            except database.BookingConflict:
+                return "full"
+
+    t = time.perf_counter()
+    with ThreadPoolExecutor(threads) as ex:
+        results = list(ex.map(book, range(attempts)))
+    elapsed = time.perf_counter() - t
+
+    spellings = [book_as(sauna, spelling) for spelling in SLOT_SPELLINGS]
+
+    with app.app_context():
+        db = database.get_db()
+        slots = db.execute("SELECT COUNT(*) FROM reservation_slots").fetchone()[0]
+        booked = db.execute("SELECT COUNT(*) FROM reservations WHERE service_id=?", (spa,)).fetchone()[0]
+        invoices = db.execute("SELECT COUNT(*) FROM invoices WHERE source='reservation'").fetchone()[0]
+        booked_sauna = db.execute("SELECT COUNT(*) FROM reservations WHERE service_id=?", (sauna,)).fetchone()[0]
+
+    print(f"attempts={attempts} threads={threads} capacity={capacity}")
+    print(f"accepted={results.count('ok')} rejected={results.count('full')} "
+          f"booked={booked} invoices={invoices} slots={slots}")
+    print(f"capacity=1, same slot spelled differently: "
+          f"{', '.join(f'{s}={r}' for s, r in zip(SLOT_SPELLINGS, spellings))}")
+    print(f"{attempts / elapsed:,.0f} booking attempts/s")
+    ok = (booked == capacity and invoices == booked + booked_sauna and slots == booked + booked_sauna
+          and spellings == ["ok"] + ["full"] * (len(SLOT_SPELLINGS) - 1))
+    print("OK: no overbooking, every reservation has its invoice" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Çok sayıda boşta bekleyen SSE abonesinin maliyeti ve publish gecikmesi.
+
+Her abone EventBus.stream()'i kendi thread'inde tüketir (threaded WSGI
+sunucusundaki gibi). Boştayken CPU kullanımı, abone başına bellek ve
+publish -> teslim gecikmesi yazılır.
+
+    python bench/bench_events.py [abone_sayısı] [publish_sayısı]
+"""
+import os, resource, sys, threading, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from events import EventBus
+
+
+def main():
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    publishes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    bus = EventBus(max_subscribers=subscribers, max_per_user=1)
+    latencies = []
+    threading.stack_size(256 * 1024)
+
+    def consume(user_id):
+        stream = bus.stream(bus.subscribe(user_id), heartbeat=15.0)
+        for chunk in stream:
+            if chunk.startswith("id:"):
+                sent = float(chunk.split("data: ", 1)[1].split('"t": ', 1)[1].rstrip("}\n"))
+                latencies.append(time.perf_counter() - sent)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    threads = [threading.Thread(target=consume, args=(i,), daemon=True) for i in range(subscribers)]
+    for t in threads:
+        t.start()
+    while bus.metrics()["subscribers"] < subscribers:
+        time.sleep(0.01)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    cpu = time.process_time()
+    time.sleep(2)
+    idle_cpu = (time.process_time() - cpu) / 2
+
+    for i in range(publishes):
+        bus.publish(i % subscribers, "complaint", id=i, t=time.perf_counter())
+        time.sleep(0.001)
+    time.sleep(0.5)
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * .99)] * 1000 if latencies else 0
+    print(f"{subscribers:,} idle subscribers: "
+          f"~{(rss_after - rss_before) / subscribers:,.1f} KiB RSS each, idle CPU {idle_cpu * 100:.2f}%")
+    print(f"{len(latencies)}/{publishes} delivered, publish->deliver p50={p50:.2f}ms p99={p99:.2f}ms")
+    print(bus.metrics())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""/admin/export/invoices akış hızı ve tepe bellek kullanımı.
+
+    python bench/bench_export.py [fatura_sayısı]
+"""
+import os, random, resource, sqlite3, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import database
+
+
+def seed(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO users (name, email, role) VALUES ('admin', 'admin@example.com', 'admin')")
+    rnd = random.Random(1)
+    batch = 100_000
+    for start in range(0, rows, batch):
+        conn.executemany(
+            "INSERT INTO invoices (user_id, amount_minor, issued_at) VALUES (1, ?, ?)",
+            ((rnd.randint(1000, 50000), f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}")
+             for _ in range(min(batch, rows - start))))
+        conn.commit()
+    conn.close()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    # Hız sınırları / yük reddi (ratelimit.py) ölçülen request'leri 429 / 503'e çevirmesin
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+    from app import app
+
+    c = app.test_client()
+    c.get("/init-db")
+    seed(database.DB_PATH, rows)
+    with c.session_transaction() as s:
+        s["user_id"] = 1
+
+    for fmt in ("ndjson", "csv"):
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        t = time.perf_counter()
+        resp = c.get(f"/admin/export/invoices?format={fmt}", buffered=False)
+        size = lines = 0
+        for chunk in resp.response:
+            size += len(chunk)
+            lines += chunk.count(b"\n") if isinstance(chunk, bytes) else chunk.count("\n")
+        resp.close()
+        elapsed = time.perf_counter() - t
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"{fmt:<7} {lines:,} lines  {size / 1e6:,.0f} MB  {lines / elapsed:,.0f} rows/s  "
+              f"peak RSS {rss_after / 1024:,.0f} MiB (+{(rss_after - rss_before) / 1024:,.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""CSV fatura import benchmark'ı: eski satır-satır yol vs batch'li yol.
+
+    python bench/bench_import.py [satır_sayısı]
+"""
+import csv, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask
+import database
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["total_amount", "currency", "issued_at", "paid"])
+        for i in range(rows):
+            w.writerow([f"{100 + i % 500}.50", "TRY", "2025-09-07", i % 2])
+
+
+def legacy_import(file_path, user_id):
+    # baseline: her satır için ayrı execute, sonda tek commit
+    db = database.get_db()
+    with open(file_path, newline="", encoding="utf-8") as csvfile:
+        for row in csv.DictReader(csvfile):
+            db.execute(
+                """INSERT INTO invoices (user_id, amount_minor, currency, issued_at, paid, source)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (user_id, round(float(row.get("total_amount", 0)) * 100), row.get("currency", "TRY"),
+                 row.get("issued_at"), int(row.get("paid", 0)), "csv"),
+            )
+    db.commit()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    tmp = tempfile.mkdtemp()
+    database.DB_PATH = os.path.join(tmp, "bench.db")
+    csv_path = os.path.join(tmp, "invoices.csv")
+    write_csv(csv_path, rows)
+
+    with Flask(__name__).app_context():
+        database.init_db()
+        db = database.get_db()
+        db.execute("INSERT INTO users (name, email) VALUES ('bench', 'bench@example.com')")
+        db.commit()
+
+        t = time.perf_counter()
+        legacy_import(csv_path, 1)
+        legacy = time.perf_counter() - t
+
+        t = time.perf_counter()
+        stats = database.import_invoices_from_csv(csv_path, user_id=1)
+        batched = time.perf_counter() - t
+
+    print(f"rows={rows}")
+    print(f"legacy   {legacy:.2f}s  {rows / legacy:,.0f} rows/s")
+    print(f"batched  {batched:.2f}s  {rows / batched:,.0f} rows/s  "
+          f"(rejected={stats['rejected']}, checkpoint={stats['checkpoint']})")
+
+
+if __name__ == "__main__":
+    main()
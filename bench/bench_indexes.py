@@ -0,0 +1,90 @@
+"""İndeks migration'ı öncesi/sonrası sorgu gecikmeleri.
+
+    python bench/bench_indexes.py [satır_sayısı]
+
+users = satır/20, reservations = invoices = satır, complaints = satır/5.
+"""
+import os, random, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask
+import database
+
+QUERIES = {
+    "reservations_by_user": lambda uid: database.get_reservations_by_user(uid),
+    "invoices_by_user": lambda uid: database.get_invoices_by_user(uid),
+    "complaints_by_user": lambda uid: database.get_complaints_by_user(uid),
+    "user_total": lambda uid: database.get_user_total_from_invoices(uid),
+    "open_complaints": lambda uid: database.get_db().execute(
+        "SELECT COUNT(*) FROM complaints WHERE status='open'").fetchone(),
+    "admin_complaints_page": lambda uid: database.get_db().execute(
+        """SELECT c.id, u.name, c.title, c.status, c.created_at
+           FROM complaints c JOIN users u ON c.user_id = u.id
+           ORDER BY c.created_at DESC LIMIT 50""").fetchall(),
+}
+
+
+def seed(db, rows):
+    users = max(rows // 20, 1)
+    rnd = random.Random(42)
+    db.executemany("INSERT INTO users (name, email) VALUES (?, ?)",
+                   ((f"Guest {i}", f"guest{i}@example.com") for i in range(users)))
+    db.executemany("INSERT INTO services (name, price_minor) VALUES (?, ?)",
+                   ((f"Service {i}", (50 + i) * 100) for i in range(20)))
+    db.executemany(
+        "INSERT INTO reservations (user_id, service_id, start_time, created_at) VALUES (?, ?, ?, ?)",
+        ((rnd.randint(1, users), rnd.randint(1, 20), "2025-09-07 10:00",
+          f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}") for _ in range(rows)))
+    db.executemany(
+        "INSERT INTO invoices (user_id, amount_minor, issued_at) VALUES (?, ?, ?)",
+        ((rnd.randint(1, users), rnd.randint(1000, 50000), f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}")
+         for _ in range(rows)))
+    db.executemany(
+        "INSERT INTO complaints (user_id, title, text, status, created_at) VALUES (?, ?, ?, ?, ?)",
+        ((rnd.randint(1, users), "AC", "AC is noisy", rnd.choice(["open", "resolved", "resolved"]),
+          f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}") for _ in range(rows // 5)))
+    db.commit()
+    return users
+
+
+def measure(users, repeat=50):
+    rnd = random.Random(7)
+    out = {}
+    for name, fn in QUERIES.items():
+        t = time.perf_counter()
+        for _ in range(repeat):
+            fn(rnd.randint(1, users))
+        out[name] = (time.perf_counter() - t) / repeat * 1000
+    return out
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    with Flask(__name__).app_context():
+        database.init_db()
+        db = database.get_db()
+        # Migration'ların oluşturduğu indeksleri kaldır, veri yüklendikten sonra aynı
+        # tanımlarla yeniden oluştur (şemanın geri kalanı güncel sürümde kalır)
+        indexes = db.execute("SELECT name, sql FROM sqlite_master WHERE type='index' AND name LIKE 'idx_%'").fetchall()
+        for name, _ in indexes:
+            db.execute(f"DROP INDEX {name}")
+        users = seed(db, rows)
+
+        before = measure(users)
+        t = time.perf_counter()
+        for _, sql in indexes:
+            db.execute(sql)
+        db.commit()
+        migrate_s = time.perf_counter() - t
+        after = measure(users)
+
+    print(f"rows={rows} users={users} create indexes={migrate_s:.1f}s")
+    print(f"{'query':<24}{'before ms':>12}{'after ms':>12}")
+    for name in QUERIES:
+        print(f"{name:<24}{before[name]:>12.2f}{after[name]:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Eşzamanlı login yükü altında login ve hafif bir endpoint'in gecikmesi.
+
+Hash'leme önce request thread'inde (PASSWORD_HASH_WORKERS=0 davranışı),
+sonra process havuzunda yapılır; her iki durumda login p50/p99, 429 sayısı
+ve aynı anda çağrılan /services'in p50/p99 değeri yazılır.
+
+    python bench/bench_login.py [login_sayısı] [thread_sayısı] [havuz_worker]
+"""
+import os, statistics, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import database
+from passwords import PasswordHasher
+
+
+def pct(samples, p):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+
+def run(app, logins, threads):
+    login_times, other_times, statuses = [], [], []
+    done = threading.Event()
+
+    def login(i):
+        c = app.test_client()
+        t = time.perf_counter()
+        resp = c.post("/login", json={"email": f"guest{i % threads}@example.com", "password": "pw"})
+        login_times.append(time.perf_counter() - t)
+        statuses.append(resp.status_code)
+
+    def browse():
+        c = app.test_client()
+        while not done.is_set():
+            t = time.perf_counter()
+            c.get("/services")
+            other_times.append(time.perf_counter() - t)
+
+    browser = threading.Thread(target=browse)
+    browser.start()
+    t = time.perf_counter()
+    with ThreadPoolExecutor(threads) as ex:
+        list(ex.map(login, range(logins)))
+    elapsed = time.perf_counter() - t
+    done.set()
+    browser.join()
+    return elapsed, login_times, other_times, statuses
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 2
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    database.POOL = database.ConnectionPool(size=threads + 2)
+    # Hız sınırları / yük reddi (ratelimit.py) ölçülen request'leri 429 / 503'e çevirmesin
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+    import app as app_module
+    app = app_module.app
+
+    with app.app_context():
+        database.init_db()
+        pw_hash = PasswordHasher(workers=0).hash("pw")
+        db = database.get_db()
+        db.executemany("INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)",
+                       ((f"Guest {i}", f"guest{i}@example.com", pw_hash) for i in range(threads)))
+        db.commit()
+
+    for label, hasher in (("inline", PasswordHasher(workers=0)),
+                          (f"pool({workers})", PasswordHasher(workers=workers, max_pending=threads))):
+        app_module.hasher = hasher
+        elapsed, login_times, other_times, statuses = run(app, logins, threads)
+        hasher.shutdown()
+        print(f"{label:<9} {logins / elapsed:,.1f} logins/s  "
+              f"login p50={pct(login_times, .5):,.0f}ms p99={pct(login_times, .99):,.0f}ms  "
+              f"429={statuses.count(429)}  "
+              f"/services p50={pct(other_times, .5):,.1f}ms p99={pct(other_times, .99):,.1f}ms "
+              f"(n={len(other_times)}, mean={statistics.fmean(other_times or [0]) * 1000:,.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
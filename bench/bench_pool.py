@@ -0,0 +1,53 @@
+"""Bağlantı havuzu vs her request'te yeni bağlantı (/me benzeri küçük sorgu).
+
+    python bench/bench_pool.py [request_sayısı] [thread_sayısı]
+"""
+import os, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask
+import database
+
+app = Flask(__name__)
+
+
+def fake_request(_):
+    # get_db/close_db çiftini gerçek request'teki gibi app context'e bağla
+    with app.app_context():
+        database.get_db().execute("SELECT id, name, email FROM users WHERE id = 1").fetchone()
+        database.close_db()
+
+
+def run(pool, requests, threads):
+    database.POOL = pool
+    t = time.perf_counter()
+    with ThreadPoolExecutor(threads) as ex:
+        list(ex.map(fake_request, range(requests)))
+    elapsed = time.perf_counter() - t
+    pool.close_all()
+    return elapsed
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    with app.app_context():
+        database.init_db()
+        database.get_db().execute("INSERT INTO users (name, email) VALUES ('bench', 'bench@example.com')")
+        database.get_db().commit()
+        database.close_db()
+
+    for label, pool in (("connect-per-request", database.ConnectionPool(size=0)),
+                        ("pooled", database.ConnectionPool(size=threads))):
+        elapsed = run(pool, requests, threads)
+        stats = pool.stats()
+        print(f"{label:<20} {requests / elapsed:>10,.0f} req/s  "
+              f"{elapsed / requests * 1e6:>7.1f} us/req  "
+              f"created={stats['created']} wait_ms_avg={stats['wait_ms_avg']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Hız sınırı kontrolünün maliyeti ve aşırı yükte önceliğe göre istek reddi.
+
+1) RateLimiter.check maliyeti (ratelimit.py): bellek içi depo ve SQLite
+   deposu (gunicorn.conf.py'deki gibi /dev/shm'de), tek process ve --procs
+   process aynı dosyayı paylaşırken; saniyedeki kontrol ve kontrol başına µs.
+2) Aşırı yük: gunicorn (1 worker) ADMISSION_ENABLED=0 ve 1 ile başlatılır
+   (RATE_LIMIT_ENABLED=0, sadece yük reddi ölçülür). --flood thread yönetici
+   oturumuyla export / rapor / kullanıcı listesi ister; bir prob thread'i
+   misafir olarak /health, /home, /services ve /reservations'ı --probe-ms'de
+   bir sorgular. Probun p50/p99'u ile flood isteklerinin hızı ve 503 sayısı
+   yazılır; reddin amacı flood'u durdurmak değil probu hızlı tutmaktır.
+Oturum cookie'leri bench_async.py'deki gibi SECRET_KEY ile imzalanır.
+
+    python bench/seed_data.py --scale 0.1 --reset
+    python bench/bench_ratelimit.py [--db yol] [--procs 4] [--flood 16] [--duration 20]
+"""
+import argparse, http.client, multiprocessing, os, signal, subprocess, sys, tempfile, threading, time
+from collections import Counter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import database
+from ratelimit import MemoryBucketStore, SQLiteBucketStore, RateLimiter, DEFAULT_ROUTE_LIMITS, parse_route_limits
+from bench_async import wait_ready, percentile
+
+PORT = 8000
+CHECKS = 50_000
+# (method, endpoint, giriş yapmış mı): misafir okumaları ağırlıklı, arada login ve yazma
+MIX = [("GET", "me", True)] * 6 + [("GET", "services", False)] * 2 + [("POST", "login", False),
+                                                                     ("POST", "create_reservation", True)]
+FLOOD_PATHS = ("/admin/export/invoices?format=csv", "/admin/export/reservations",
+               "/admin/reports/revenue?grain=hour", "/admin/users", "/admin/complaints?status=open")
+PROBE_PATHS = ("/health", "/home", "/services", "/reservations?limit=20")
+
+
+# --- 1) check() maliyeti ---
+def make_limiter(store):
+    return RateLimiter(store=store, ip=(60, 60), user=(30, 30), writes=(20, 20),
+                       routes=parse_route_limits(DEFAULT_ROUTE_LIMITS))
+
+
+def run_checks(store, count, offset=0):
+    limiter = make_limiter(store)
+    started = time.perf_counter()
+    for i in range(offset, offset + count):
+        method, endpoint, logged_in = MIX[i % len(MIX)]
+        limiter.check(f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}", i % 5000 if logged_in else None,
+                      method, endpoint)
+    return time.perf_counter() - started
+
+
+def _proc_checks(args):
+    path, count, offset = args
+    return run_checks(SQLiteBucketStore(path), count, offset)
+
+
+def bench_checks(procs):
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    path = os.path.join(directory, f"bench-ratelimit-{os.getpid()}.db")
+    print(f"{'store':<28} {'checks/s':>10} {'us/check':>9}")
+    try:
+        rows = [("memory", CHECKS, run_checks(MemoryBucketStore(), CHECKS)),
+                ("sqlite, 1 process", CHECKS, run_checks(SQLiteBucketStore(path), CHECKS))]
+        with multiprocessing.get_context("fork").Pool(procs) as pool:
+            started = time.perf_counter()
+            pool.map(_proc_checks, [(path, CHECKS, n * CHECKS) for n in range(procs)])
+            rows.append((f"sqlite, {procs} processes", CHECKS * procs, time.perf_counter() - started))
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    for label, count, elapsed in rows:
+        print(f"{label:<28} {count / elapsed:>10,.0f} {elapsed / count * 1e6:>9.1f}", flush=True)
+
+
+# --- 2) Aşırı yükte istek reddi ---
+def session_cookie(app, role_sql):
+    serializer = app.session_interface.get_signing_serializer(app)
+    with app.app_context():
+        uid = database.get_db().execute(f"SELECT id FROM users WHERE {role_sql} ORDER BY id LIMIT 1").fetchone()[0]
+    return f"{app.config['SESSION_COOKIE_NAME']}={serializer.dumps({'user_id': uid})}"
+
+
+class Client:
+    def __init__(self, cookie):
+        self.cookie = cookie
+        self.conn = None
+
+    def get(self, path):
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=60)
+            self.conn.request("GET", path, headers={"Cookie": self.cookie})
+            resp = self.conn.getresponse()
+            resp.read()
+            if resp.getheader("Connection", "").lower() == "close":
+                self.close()
+            return resp.status
+        except (http.client.HTTPException, OSError):
+            self.close()
+            return 0
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def overload(env, admin_cookie, guest_cookie, args):
+    measuring, stop = threading.Event(), threading.Event()
+    flood_status, probe_status, probe_latencies = Counter(), Counter(), []
+
+    def flood(index):
+        client = Client(admin_cookie)
+        i = index
+        while not stop.is_set():
+            status = client.get(FLOOD_PATHS[i % len(FLOOD_PATHS)])
+            if measuring.is_set():
+                flood_status[status] += 1
+            i += 1
+        client.close()
+
+    def probe():
+        client = Client(guest_cookie)
+        i = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            status = client.get(PROBE_PATHS[i % len(PROBE_PATHS)])
+            if measuring.is_set():
+                probe_status[status] += 1
+                probe_latencies.append(time.perf_counter() - started)
+            i += 1
+            time.sleep(args.probe_ms / 1000)
+        client.close()
+
+    log = tempfile.NamedTemporaryFile(prefix="gunicorn-", suffix=".log", delete=False)
+    proc = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", "app:app"], cwd=ROOT, env=env,
+                            stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    try:
+        wait_ready(proc)
+        threads = [threading.Thread(target=flood, args=(n,), daemon=True) for n in range(args.flood)]
+        threads.append(threading.Thread(target=probe, daemon=True))
+        for t in threads:
+            t.start()
+        time.sleep(args.warmup)
+        measuring.set()
+        time.sleep(args.duration)
+        measuring.clear()
+        stop.set()
+        for t in threads:
+            t.join(timeout=60)
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+    return flood_status, probe_status, sorted(probe_latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=database.DB_PATH, help="seed_data.py ile doldurulmuş veritabanı")
+    parser.add_argument("--procs", type=int, default=4, help="SQLite deposunu paylaşan process sayısı")
+    parser.add_argument("--flood", type=int, default=16, help="yönetici flood thread sayısı")
+    parser.add_argument("--probe-ms", type=float, default=50, help="prob sorguları arası bekleme")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--skip-overload", action="store_true", help="sadece check() maliyetini ölç")
+    args = parser.parse_args()
+    args.db = os.path.abspath(args.db)
+
+    print(f"{os.cpu_count()} CPU core(s)\n")
+    bench_checks(args.procs)
+    if args.skip_overload:
+        return
+
+    database.DB_PATH = args.db
+    from app import app
+    admin_cookie = session_cookie(app, "role = 'admin'")
+    guest_cookie = session_cookie(app, "role != 'admin'")
+    env = dict(os.environ, DB_PATH=args.db, WEB_BIND=f"127.0.0.1:{PORT}", WEB_WORKERS="1",
+               RATE_LIMIT_ENABLED="0")
+    print(f"\n{args.db}, {args.flood} flood threads, probe every {args.probe_ms:g}ms, {args.duration:.0f}s per run")
+    print(f"{'admission':<10} {'probe p50':>10} {'probe p99':>10} {'probe !2xx':>11} "
+          f"{'flood/s':>8} {'flood 503':>10} {'flood err':>10}")
+    for enabled in ("0", "1"):
+        flood_status, probe_status, latencies = overload(dict(env, ADMISSION_ENABLED=enabled),
+                                                         admin_cookie, guest_cookie, args)
+        probe_bad = sum(n for status, n in probe_status.items() if not 200 <= status < 400)
+        flood_errors = sum(n for status, n in flood_status.items() if status == 0 or status >= 500 and status != 503)
+        print(f"{'on' if enabled == '1' else 'off':<10} {percentile(latencies, .5):>8.1f}ms "
+              f"{percentile(latencies, .99):>8.1f}ms {probe_bad:>11,} "
+              f"{sum(n for s, n in flood_status.items() if s != 503) / args.duration:>8,.1f} "
+              f"{flood_status[503]:>10,} {flood_errors:>10,}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
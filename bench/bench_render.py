@@ -0,0 +1,80 @@
+"""Statik sayfalar ve admin sayfaları için render cache kapalı/açık requests/sec.
+
+    python bench/bench_render.py [istek_sayısı] [kullanıcı_sayısı]
+"""
+import os, random, sqlite3, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import database
+from werkzeug.test import EnvironBuilder
+
+URLS = ("/home", "/services-page", "/invoices-page", "/dashboard", "/admin/users", "/admin/user/2")
+
+
+def seed(path, users):
+    conn = sqlite3.connect(path)
+    rnd = random.Random(1)
+    conn.execute("INSERT INTO users (name, email, role) VALUES ('admin', 'admin@example.com', 'admin')")
+    conn.executemany("INSERT INTO users (name, email) VALUES (?, ?)",
+                     ((f"Guest {i}", f"guest{i}@example.com") for i in range(users)))
+    conn.execute("INSERT INTO services (name, description, price_minor) VALUES ('Spa', '', 10000)")
+    conn.executemany("INSERT INTO reservations (user_id, service_id, start_time) VALUES (2, 1, ?)",
+                     ((f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T10:00",) for _ in range(50)))
+    conn.executemany("INSERT INTO invoices (user_id, amount_minor, issued_at) VALUES (2, ?, '2025-09-07')",
+                     ((rnd.randint(1000, 50000),) for _ in range(50)))
+    conn.executemany("INSERT INTO complaints (user_id, title, text) VALUES (2, ?, 'text')",
+                     ((f"Complaint {i}",) for i in range(20)))
+    conn.commit()
+    conn.close()
+
+
+def run(app, environ, requests):
+    def start_response(status, headers, exc_info=None):
+        pass
+    t = time.perf_counter()
+    for _ in range(requests):
+        for chunk in app(dict(environ), start_response):
+            pass
+    return requests / (time.perf_counter() - t)
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    # Hız sınırları / yük reddi (ratelimit.py) ölçülen request'leri 429 / 503'e çevirmesin
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+    from app import app
+
+    c = app.test_client()
+    c.get("/init-db")
+    seed(database.DB_PATH, users)
+    with c.session_transaction() as s:
+        s["user_id"] = 1
+    cookie = f"session={c.get_cookie('session').value}"
+
+    # Test client yerine doğrudan WSGI çağrısı; ölçülen şey uygulamanın kendi maliyeti
+    results = {}
+    for enabled in (False, True):
+        app.config["RENDER_CACHE_ENABLED"] = enabled
+        for url in URLS:
+            environ = EnvironBuilder(path=url, headers={"Accept-Encoding": "gzip", "Cookie": cookie}).get_environ()
+            resp = c.get(url, headers={"Accept-Encoding": "gzip"})
+            results[url, enabled] = run(app, environ, requests)
+            if enabled and resp.headers.get("ETag"):
+                environ["HTTP_IF_NONE_MATCH"] = resp.headers["ETag"]
+                results[url, "304"] = run(app, environ, requests)
+            results[url, "bytes", enabled] = len(resp.data)
+
+    print(f"{'url':<16} {'cache off':>12} {'cache on':>12} {'304':>12}   bytes off/on")
+    for url in URLS:
+        off, on = results[url, False], results[url, True]
+        revalidate = f"{results[url, '304']:>10,.0f}/s" if (url, "304") in results else f"{'-':>12}"
+        print(f"{url:<16} {off:>10,.0f}/s {on:>10,.0f}/s {revalidate}   "
+              f"{results[url, 'bytes', False]:,}/{results[url, 'bytes', True]:,}  x{on / off:.1f}")
+
+
+if __name__ == "__main__":
+    main()
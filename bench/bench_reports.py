@@ -0,0 +1,121 @@
+"""Rapor rollup'ları: backfill hızı, yazma maliyeti ve rapor gecikmesi.
+
+Faturalar, rezervasyonlar ve şikayetler rollup'lar kapalıyken (done_id=0)
+yüklenir, sonra backfill_reports ile işlenir. Aynı raporlar ham tablolar
+üzerinde ad-hoc GROUP BY ile ve rollup tablolarından (get_report) ölçülür.
+Son olarak rollup trigger'ları varken / yokken fatura yazma hızı karşılaştırılır.
+
+    python bench/bench_reports.py [satır_sayısı]
+"""
+import os, random, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask
+import database
+
+ADHOC = {
+    "revenue": (
+        "SELECT date(issued_at), COALESCE(service_id, 0), currency, COUNT(*), SUM(amount_minor) FROM invoices "
+        "WHERE issued_at >= '2025-09-01' AND issued_at < '2025-10-01' GROUP BY 1, 2, 3",
+        ("revenue", "day", "2025-09-01", "2025-09-30"),
+    ),
+    "reservations": (
+        "SELECT strftime('%Y-W%W', start_time), service_id, status, COUNT(*) FROM reservations GROUP BY 1, 2, 3",
+        ("reservations", "week"),
+    ),
+    "complaints": (
+        "SELECT strftime('%Y-%m', resolved_at), COUNT(*), "
+        "AVG(strftime('%s', resolved_at) - strftime('%s', created_at)) / 3600 "
+        "FROM complaints WHERE resolved_at IS NOT NULL GROUP BY 1",
+        ("complaints", "month"),
+    ),
+}
+
+
+def rnd_time(rnd):
+    return (f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} "
+            f"{rnd.randint(0, 23):02d}:{rnd.choice(('00', '30')):s}:00")
+
+
+def seed(db, rows, rnd):
+    db.execute("INSERT INTO users (name, email) VALUES ('Guest', 'guest@example.com')")
+    db.executemany("INSERT INTO services (name, price_minor, capacity) VALUES (?, ?, ?)",
+                   ((f"Service {i}", 1000 * (i + 1), i % 3) for i in range(20)))
+    batch = 200_000
+    for start in range(0, rows, batch):
+        n = min(batch, rows - start)
+        db.executemany(
+            "INSERT INTO invoices (user_id, amount_minor, currency, issued_at, service_id) VALUES (1, ?, ?, ?, ?)",
+            ((rnd.randint(100, 50_000), rnd.choice(("TRY", "TRY", "EUR")), rnd_time(rnd),
+              rnd.choice((None, rnd.randint(1, 20)))) for _ in range(n)))
+        db.executemany(
+            "INSERT INTO reservations (user_id, service_id, start_time, status) VALUES (1, ?, ?, ?)",
+            ((rnd.randint(1, 20), rnd_time(rnd).replace(" ", "T")[:16],
+              rnd.choice(("pending", "approved", "approved", "cancelled"))) for _ in range(n)))
+        db.executemany(
+            "INSERT INTO complaints (user_id, title, text, status, created_at, resolved_at) "
+            "VALUES (1, 'AC', 'noisy', ?1, ?2, datetime(?2, '+' || ?3 || ' hours'))",
+            ((status, rnd_time(rnd), rnd.randint(1, 72) if status == "resolved" else None)
+             for status in (rnd.choice(("open", "resolved", "resolved")) for _ in range(n // 5))))
+        db.commit()
+
+
+def best_ms(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def insert_rate(db, rows, rnd):
+    started = time.perf_counter()
+    db.executemany(
+        "INSERT INTO invoices (user_id, amount_minor, currency, issued_at, service_id) VALUES (1, ?, 'TRY', ?, ?)",
+        ((rnd.randint(100, 50_000), rnd_time(rnd), rnd.randint(1, 20)) for _ in range(rows)))
+    db.commit()
+    return rows / (time.perf_counter() - started)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    rnd = random.Random(11)
+
+    with Flask(__name__).app_context():
+        database.init_db()
+        db = database.get_db()
+        db.execute("UPDATE report_state SET done_id = 0")  # trigger'lar kapalıyken yükle
+        db.commit()
+        seed(db, rows, rnd)
+
+        started = time.perf_counter()
+        database.backfill_reports()
+        backfill_s = time.perf_counter() - started
+        total = sum(db.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in database.REPORT_SOURCES)
+        print(f"{rows:,} invoices / reservations, {rows // 5:,} complaints")
+        print(f"backfill: {backfill_s:.1f}s ({total / backfill_s:,.0f} source rows/s)\n")
+
+        print(f"{'report':<14} {'ad-hoc scan':>12} {'rollup':>9}")
+        for name, (sql, args) in ADHOC.items():
+            adhoc = best_ms(lambda: db.execute(sql).fetchall(), repeat=3)
+            rollup = best_ms(lambda: database.get_report(*args))
+            print(f"{name:<14} {adhoc:>10,.1f}ms {rollup:>7,.2f}ms  x{adhoc / rollup:,.0f}")
+
+        with_triggers = insert_rate(db, 100_000, rnd)
+        triggers = db.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+                              "AND name LIKE 'trg_report_invoices_%'").fetchall()
+        for name, _ in triggers:
+            db.execute(f"DROP TRIGGER {name}")
+        without = insert_rate(db, 100_000, rnd)
+        for _, sql in triggers:
+            db.execute(sql)
+        db.commit()
+        print(f"\ninvoice inserts: {without:,.0f} rows/s without rollup triggers, "
+              f"{with_triggers:,.0f} rows/s with ({(1 - with_triggers / without) * 100:.0f}% slower)")
+
+
+if __name__ == "__main__":
+    main()
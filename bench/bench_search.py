@@ -0,0 +1,114 @@
+"""Şikayet araması: FTS5 (complaints_fts) vs LIKE '%kelime%' taraması.
+
+Şikayetler FTS indeksi olmadan (migration 6) yüklenir; migration 7'nin
+mevcut satırları indeksleme süresi ve indeks boyutu yazılır. Sonra farklı
+seçicilikte kelimeler için ilk sayfa (50 satır) süresi: LIKE ile yeni -> eski
+liste (eski admin filtresi gibi, sıralamasız), LIKE ile tüm eşleşmeleri bulmak
+(sıralama için gereken) ve search_complaints (bm25 sıralı). Son olarak
+create_complaint yazma hızı, FTS trigger'ı varken / yokken.
+
+    python bench/bench_search.py [şikayet_sayısı]
+"""
+import os, random, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask
+import database
+
+TOPICS = ("AC", "noise", "wifi", "shower", "towel", "breakfast", "elevator", "parking",
+          "smell", "minibar", "pool", "heating", "key card", "balcony", "gürültü")
+QUERIES = ("elevator", "ac", "wifi slow", "wif*", "gurultu", "nonexistent")
+LIKE_PAGE = ("SELECT id FROM complaints WHERE title LIKE ?1 OR text LIKE ?1 "
+             "ORDER BY created_at DESC, id DESC LIMIT 50")
+LIKE_ALL = "SELECT COUNT(*) FROM complaints WHERE title LIKE ?1 OR text LIKE ?1"
+
+
+def vocabulary(rnd, size=5000):
+    letters = "abcdefghijklmnoprstuvyz"
+    return ["".join(rnd.choice(letters) for _ in range(rnd.randint(3, 9))) for _ in range(size)]
+
+
+def seed(db, rows, rnd):
+    words = vocabulary(rnd)
+    weights = [1 / (i + 1) for i in range(len(words))]  # Zipf benzeri dağılım
+    db.execute("INSERT INTO users (name, email) VALUES ('Guest', 'guest@example.com')")
+    batch = 100_000
+    for start in range(0, rows, batch):
+        data = []
+        for _ in range(min(batch, rows - start)):
+            topic = rnd.choices(TOPICS, weights=range(len(TOPICS), 0, -1))[0]
+            body = rnd.choices(words, weights=weights, k=rnd.randint(8, 30))
+            body.insert(rnd.randrange(len(body)), topic if rnd.random() < .7 else "slow")
+            data.append((f"{topic} problem", " ".join(body),
+                         f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 12:00:00"))
+        db.executemany("INSERT INTO complaints (user_id, title, text, created_at) VALUES (1, ?, ?, ?)", data)
+        db.commit()
+
+
+def best_ms(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def like_pattern(query):
+    return f"%{query.split()[0].rstrip('*')}%"
+
+
+def insert_rate(rows):
+    started = time.perf_counter()
+    for i in range(rows):
+        database.create_complaint(1, "wifi problem", f"wifi drops every evening in room {i}")
+    return rows / (time.perf_counter() - started)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+    rnd = random.Random(5)
+
+    with Flask(__name__).app_context():
+        migrations = database.MIGRATIONS
+        database.MIGRATIONS = migrations[:6]
+        database.init_db()
+        db = database.get_db()
+        seed(db, rows, rnd)
+        database.MIGRATIONS = migrations
+        started = time.perf_counter()
+        database.migrate(db)
+        index_s = time.perf_counter() - started
+        sizes = dict(db.execute("SELECT CASE WHEN name LIKE 'complaints_fts%' THEN 'fts' ELSE name END, "
+                                "SUM(pgsize) FROM dbstat WHERE name LIKE 'complaints%' GROUP BY 1"))
+        print(f"{rows:,} complaints: indexed in {index_s:.1f}s, "
+              f"table {sizes['complaints'] / 1e6:.0f} MB, FTS index {sizes['fts'] / 1e6:.0f} MB\n")
+
+        print(f"{'query':<12} {'LIKE hits':>10} {'FTS hits':>9} {'LIKE page':>10} {'LIKE all':>10} {'FTS ranked':>11}")
+        for query in QUERIES:
+            pattern = like_pattern(query)
+            like_hits = db.execute(LIKE_ALL, (pattern,)).fetchone()[0]
+            fts_hits = db.execute("SELECT COUNT(*) FROM complaints_fts WHERE complaints_fts MATCH ?",
+                                  (database.fts_query(query),)).fetchone()[0]
+            like_page = best_ms(lambda: db.execute(LIKE_PAGE, (pattern,)).fetchall())
+            like_all = best_ms(lambda: db.execute(LIKE_ALL, (pattern,)).fetchone())
+            fts = best_ms(lambda: database.search_complaints(query, limit=50))
+            print(f"{query:<12} {like_hits:>10,} {fts_hits:>9,} {like_page:>8,.1f}ms {like_all:>8,.1f}ms {fts:>9,.1f}ms")
+
+        with_fts = insert_rate(2000)
+        triggers = db.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+                              "AND name LIKE 'trg_complaints_fts_%'").fetchall()
+        for name, _ in triggers:
+            db.execute(f"DROP TRIGGER {name}")
+        db.commit()
+        without = insert_rate(2000)
+        for _, sql in triggers:
+            db.execute(sql)
+        db.commit()
+        print(f"\ncreate_complaint: {without:,.0f}/s without FTS trigger, {with_fts:,.0f}/s with")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Geliştirme sunucusu (python app.py) vs gunicorn (gunicorn.conf.py) throughput'u.
+
+Her hedef ayrı bir process olarak aynı veritabanıyla (DB_PATH) başlatılır,
+/health cevap verince bench/loadtest.py --url ile yük verilir; toplam rps,
+p50/p95/p99 ve hata sayısı tablo olarak yazılır. gunicorn farklı worker
+sayılarıyla (--workers) denenir; worker başına thread WEB_THREADS ile
+(varsayılan gunicorn.conf.py'deki) ayarlanır. Worker'lar process olduğu için
+GIL'e takılmaz, çekirdek sayısına kadar ölçeklenmesi beklenir (os.cpu_count()
+tabloda yazılır; tek çekirdekte worker eklemek kazanç getirmez).
+
+    python bench/seed_data.py --scale 0.1 --reset
+    python bench/bench_server.py [--db yol] [--workers 1,2,4] [--threads 16] [--duration 30]
+"""
+import argparse, json, os, signal, subprocess, sys, tempfile, time, urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import database
+
+DEBUG_PORT = 5002  # app.py'deki app.run
+GUNICORN_PORT = 8000
+
+
+def wait_ready(url, proc, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url + "/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready in {timeout}s")
+
+
+def run_target(label, cmd, url, env, args):
+    log = tempfile.NamedTemporaryFile(prefix="server-", suffix=".log", delete=False)
+    # Ayrı process grubu: parola hash process'leri de (dinleme soketini miras alırlar) kapatılsın
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+                            start_new_session=True)
+    out = os.path.join(tempfile.gettempdir(), f"bench-server-{os.getpid()}.json")
+    try:
+        started = time.perf_counter()
+        wait_ready(url, proc)
+        ready_s = time.perf_counter() - started
+        subprocess.run([sys.executable, os.path.join(ROOT, "bench", "loadtest.py"), "--db", args.db,
+                        "--url", url, "--threads", str(args.threads), "--duration", str(args.duration),
+                        "--warmup", str(args.warmup), "--out", out],
+                       env=env, check=True, stderr=subprocess.DEVNULL)
+        with open(out, encoding="utf-8") as f:
+            total = json.load(f)["total"]
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        try:
+            proc.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+        if os.path.exists(out):
+            os.remove(out)
+    print(f"{label:<22} {ready_s:>6.1f}s {total['rps']:>8,.1f} {total['p50_ms']:>7.1f}ms "
+          f"{total['p95_ms']:>7.1f}ms {total['p99_ms']:>7.1f}ms {total['errors']:>6}  (log: {log.name})",
+          flush=True)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=database.DB_PATH, help="seed_data.py ile doldurulmuş veritabanı")
+    parser.add_argument("--workers", default="1,2,4", help="denenecek gunicorn worker sayıları")
+    parser.add_argument("--threads", type=int, default=16, help="yük testi thread sayısı")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--skip-debug", action="store_true", help="geliştirme sunucusunu ölçme")
+    args = parser.parse_args()
+    args.db = os.path.abspath(args.db)
+    env = dict(os.environ, DB_PATH=args.db)
+    # Kapasite ölçülüyor: hız sınırları / yük reddi kapalı (açılırsa loadtest.py sanal kullanıcıları
+    # X-Forwarded-For ile ayrı IP'lerden gönderir)
+    for name, value in (("RATE_LIMIT_ENABLED", "0"), ("ADMISSION_ENABLED", "0"), ("TRUSTED_PROXIES", "1")):
+        env.setdefault(name, value)
+
+    print(f"{args.db}, {args.threads} client threads, {args.duration:.0f}s per target, "
+          f"{os.cpu_count()} CPU core(s)")
+    print(f"{'target':<22} {'ready':>7} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>6}")
+    if not args.skip_debug:
+        run_target("app.run (debug)", [sys.executable, "app.py"], f"http://127.0.0.1:{DEBUG_PORT}", env, args)
+    for workers in map(int, args.workers.split(",")):
+        run_target(f"gunicorn -w {workers}", ["gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+                   f"http://127.0.0.1:{GUNICORN_PORT}",
+                   dict(env, WEB_BIND=f"127.0.0.1:{GUNICORN_PORT}", WEB_WORKERS=str(workers)), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Tek satırlık yazma helper'larının eşzamanlı throughput'u: her yazma kendi
+commit'i ile (mevcut yol) ve group commit writer ile (WRITE_BATCHING=1).
+
+    python bench/bench_writes.py [yazma_sayısı] [thread_sayısı]
+
+synchronous=NORMAL (varsayılan) ve FULL için ayrı ayrı ölçer; WAL'da NORMAL
+commit'te fsync yapmaz, FULL her commit'te yapar.
+"""
+import os, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import database
+
+
+def run(app, writes, threads):
+    latencies = []
+
+    def write(i):
+        with app.app_context():
+            t = time.perf_counter()
+            database.create_complaint(i % 100 + 1, f"Kiosk {i}", "bulk intake")
+            latencies.append(time.perf_counter() - t)
+
+    t = time.perf_counter()
+    with ThreadPoolExecutor(threads) as ex:
+        list(ex.map(write, range(writes)))
+    elapsed = time.perf_counter() - t
+    latencies.sort()
+    return writes / elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * .99)] * 1000
+
+
+def main():
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    database.POOL = database.ConnectionPool(size=threads)
+    # Hız sınırları / yük reddi (ratelimit.py) ölçülen request'leri 429 / 503'e çevirmesin
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+    from app import app
+
+    for sync in ("NORMAL", "FULL"):
+        database.DB_PRAGMAS["synchronous"] = sync
+        for label, writer in (("per-write commit", None), ("group commit", database.GroupCommitWriter())):
+            database.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+            database.POOL.close_all()
+            with app.app_context():
+                database.init_db()
+                db = database.get_db()
+                db.executemany("INSERT INTO users (name, email) VALUES (?, ?)",
+                               ((f"Guest {i}", f"guest{i}@example.com") for i in range(100)))
+                db.commit()
+            database.WRITER = writer
+            rate, p50, p99 = run(app, writes, threads)
+            extra = ""
+            if writer is not None:
+                m = writer.metrics()
+                extra = f"  batches={m['batches']} avg batch={m['batch_size_avg']} max={m['batch_max']}"
+                writer.stop()
+            database.WRITER = None
+            print(f"synchronous={sync:<6} {label:<16} {rate:>8,.0f} writes/s  "
+                  f"p50={p50:.2f}ms p99={p99:.2f}ms{extra}")
+
+
+if __name__ == "__main__":
+    main()
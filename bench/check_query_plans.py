@@ -0,0 +1,139 @@
+"""app.py ve database.py'nin çalıştırdığı her sorgu için EXPLAIN QUERY PLAN kontrolü.
+
+Tüm route'lar test client ile (misafir + admin) gezilir, çalışan SQL'ler
+sqlite trace callback ile toplanır ve her biri EXPLAIN edilir. Büyük
+tablolardan birinde indekssiz SCAN görülürse ya da bir endpoint
+STATEMENT_BUDGET'taki SQL ifadesi sayısını aşarsa çıkış kodu 1 olur.
+
+    python bench/check_query_plans.py [--replica]
+
+--replica: okumalar, aynı DB dosyasını salt-okunur açan bir EnginePool'a
+(replica yerine geçen dosya) yönlendirilir; replica'ya giden bir yazma hata verir.
+"""
+import io, os, re, sqlite3, sys, tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import aggregates, database
+
+# Zamanla büyüyen tablolar; bunlarda tam tablo taraması kabul edilmez
+LARGE_TABLES = {"reservations", "invoices", "complaints"}
+
+STATEMENTS = []
+
+
+def traced_connect(connect=database._connect):
+    def wrapper(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(STATEMENTS.append)
+        return conn
+    return wrapper
+
+
+# Endpoint başına izin verilen en fazla SQL ifadesi (identity ve fragment cache sıcakken)
+STATEMENT_BUDGET = {
+    "/me": 0,
+    "/dashboard": 1,
+    "/admin/users": 1,
+    "/admin/user/1": 1,
+    "/admin/complaints": 1,
+    "/admin/services": 1,
+    "/api/bootstrap": 1,
+    "/admin/reports/revenue?grain=week": 1,
+    "/admin/reports/reservations": 1,
+    "/admin/complaints/search?q=ac": 1,
+}
+STATEMENT_COUNTS = {}
+
+
+def measure(client, url):
+    before = len(STATEMENTS)
+    resp = client.get(url)
+    # 429 / 503 hiç sorgu çalıştırmadan bütçeye uyardı
+    assert resp.status_code == 200, f"{url}: {resp.status_code}"
+    # "-- " ile başlayanlar trigger / sanal tablo (FTS5, R*Tree) iç ifadeleri; ayrı tur değil
+    STATEMENT_COUNTS[url] = sum(not sql.startswith("-- ") for sql in STATEMENTS[before:])
+
+
+def drive(app):
+    c = app.test_client()
+    c.get("/init-db")
+    STATEMENTS.clear()  # migration ifadeleri eski şemaya göre; EXPLAIN edilemez
+    c.post("/register", json={"name": "Guest", "email": "guest@example.com", "password": "pw"})
+    c.post("/services", json={"name": "Spa", "description": "", "price": 100})
+    c.post("/reservations", json={"service_id": 1, "start_time": "2025-09-07T10:00"})
+    c.post("/complaints", json={"title": "AC", "text": "AC is broken"})
+    c.post("/invoices", json={"total_amount": 50, "issued_at": "2025-09-07"})
+    c.put("/invoices/1/status", json={"paid": 1})
+    c.post("/upload_invoices", data={"file": (io.BytesIO(b"total_amount,currency,issued_at,paid\n1,TRY,2025-09-07,0\n"), "i.csv")},
+           content_type="multipart/form-data")
+    for url in ("/me", "/services", "/reservations", "/complaints", "/invoices", "/my-total", "/list-users"):
+        c.get(url)
+    c.delete("/reservations/1")
+
+    admin = app.test_client()
+    admin.post("/register", json={"name": "Admin", "email": "admin@example.com", "password": "pw"})
+    with app.app_context():
+        database.set_user_role(2, "admin")
+    admin_urls = ("/dashboard", "/admin/users", "/admin/user/1", "/admin/complaints", "/admin/services",
+                  "/admin/reports/revenue?grain=week", "/admin/reports/reservations",
+                  "/admin/complaints/search?q=ac")
+    for url in admin_urls:
+        admin.get(url)  # identity ve fragment cache'leri ısıt
+    for url in admin_urls:
+        measure(admin, url)
+    c.get("/me")  # rol değişikliği identity damgasını yeniledi, tekrar ısıt
+    measure(c, "/me")
+    c.get("/services")  # katalog cache'i ısıt
+    measure(c, "/api/bootstrap")
+    admin.post("/admin/complaint/1/status", data={"status": "resolved"})
+    admin.post("/admin/reservation/1/status", data={"status": "approved"})
+    admin.post("/admin/invoice/1/status", data={"paid": 1})
+    admin.post("/admin/services/add", data={"name": "Transfer", "price": "20"})
+    admin.post("/admin/services/1/update", data={"description": "x", "price": "120"})
+    admin.post("/login", json={"email": "admin@example.com", "password": "pw"})
+    with app.app_context():
+        aggregates.revenue_rollup("2025-09-01", "2025-09-30").totals("currency", "day")
+        database.reset_reports()
+        database.backfill_reports()
+
+
+def main():
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "plans.db")
+    database._connect = traced_connect()
+    if "--replica" in sys.argv:
+        database.READ_POOLS = [database.EnginePool(lambda: database._connect(database.DB_PATH, readonly=True))]
+    # Hız sınırları / yük reddi (ratelimit.py) ölçülen request'leri 429 / 503'e çevirmesin
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+    from app import app
+    drive(app)
+
+    conn = sqlite3.connect(database.DB_PATH)
+    seen, failures = set(), []
+    for sql in STATEMENTS:
+        sql = " ".join(sql.split())
+        if not re.match(r"(SELECT|UPDATE|DELETE)\b", sql, re.I) or sql in seen:
+            continue
+        seen.add(sql)
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        bad = [p for p in plan
+               if re.match(r"SCAN (\w+)$", p) and p.split()[1] in LARGE_TABLES]
+        print(("FAIL " if bad else "ok   ") + sql[:110])
+        for p in plan:
+            print("       " + p)
+        if bad:
+            failures.append(sql)
+
+    print(f"\n{len(seen)} queries checked, {len(failures)} full scans on large tables\n")
+    for url, budget in STATEMENT_BUDGET.items():
+        count = STATEMENT_COUNTS.get(url)
+        over = count is None or count > budget
+        print(f"{'FAIL' if over else 'ok  '} {url}: {count} statements (budget {budget})")
+        if over:
+            failures.append(url)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
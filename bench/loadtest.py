@@ -0,0 +1,450 @@
+"""app.py'deki route'lar için çok thread'li yük testi.
+
+Her thread bir sanal kullanıcıdır (misafir ya da yönetici), bench/seed_data.py
+hesaplarıyla giriş yapar ve ağırlıklı rastgele akışlar çalıştırır: gezinme,
+rezervasyon, şikayet, fatura / CSV upload, SSE, kayıt ve admin ekranları.
+Varsayılan hedef süreç içi Flask test client'ı; --url verilirse aynı DB'yi
+kullanan yerel bir WSGI sunucusuna HTTP (keep-alive) ile gidilir.
+
+Sonuç, route şablonu başına (ör. "GET /admin/user/<int:user_id>") istek
+sayısı, durum kodları, throughput ve p50/p95/p99 içeren JSON'dur (--out ya da
+stdout); özet tablo stderr'e yazılır. --compare önceki bir sonuçla p95'leri
+karşılaştırır, --max-regression'dan fazla yavaşlayan route varsa çıkış kodu 1.
+
+    python bench/seed_data.py --scale 0.1 --reset
+    python bench/loadtest.py [--threads 16] [--duration 60] [--url http://127.0.0.1:5002]
+                             [--out sonuc.json] [--compare onceki.json]
+
+Test client modunda /init-db ve POST /admin/reports/rebuild bilerek çağrılmaz
+(şemayı / rollup'ları sıfırlarlar); çağrılmayan route'lar "uncovered" altında listelenir.
+Kapasite ölçüldüğü için test client modunda hız sınırları ve yük reddi
+kapalıdır (ratelimit.py; RATE_LIMIT_ENABLED=1 ADMISSION_ENABLED=1 ile açılır).
+Her sanal kullanıcı ayrı bir IP'den gelir (test client'ta REMOTE_ADDR, HTTP'de
+X-Forwarded-For; sunucu TRUSTED_PROXIES=1 ile başlatılmalı), açıkken sınırlar
+gerçek trafikteki gibi uygulanır ve 429 / 503'ler durum kodlarında görünür.
+"""
+import argparse, http.client, io, json, os, platform, random, re, sqlite3, subprocess, sys, threading, time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from werkzeug.test import EnvironBuilder
+import database
+from seed_data import ADMIN_EMAIL, COMPLAINTS, SEED_PASSWORD
+
+PLACEHOLDER = re.compile(r"<(?:\w+:)?\w+>")
+# Bu kadar örneği olmayan route'lar karşılaştırmada yok sayılır
+MIN_SAMPLES = 20
+# p95 farkı bundan küçükse (ms) oran ne olursa olsun gürültü sayılır
+MIN_REGRESSION_MS = 1.0
+# Sonuçla birlikte kaydedilen ayarlar (karşılaştırılan koşuların aynı ayarda olduğunu görmek için)
+ENV_PREFIXES = ("DB_", "WEB_", "ASYNC_", "WRITE_", "PASSWORD_", "JOB_", "RENDER_", "EVENTS_", "METRICS_",
+                "ROLLUP_", "REPORT_", "RATE_", "ADMISSION_", "TRUSTED_")
+SEARCH_TERMS = ("wifi", "ac", "noise", "shower", "elev*", "gurultu", "towels room")
+STATIC_PAGES = ("/home", "/services-page", "/reservations-page", "/complaints-page", "/invoices-page",
+                "/login", "/register", "/logout-test")
+
+
+# --- İstemciler: ikisi de (durum, gövde) döndürür ---
+class TestClientSession:
+    def __init__(self, app, ip):
+        self.client = app.test_client()
+        self.client.environ_base["REMOTE_ADDR"] = ip
+
+    def send(self, method, path, stream=False, **kwargs):
+        resp = self.client.open(path, method=method, buffered=not stream, **kwargs)
+        if stream:
+            body = next(iter(resp.response), b"")  # ilk parça (SSE: "retry:" satırı)
+            resp.close()
+            return resp.status_code, body
+        return resp.status_code, resp.get_data()
+
+
+class HttpSession:
+    def __init__(self, base_url, ip):
+        url = urlsplit(base_url)
+        self.ip = ip
+        self.host, self.port = url.hostname, url.port or 80
+        self.conn = None
+        self.cookies = {}
+
+    def send(self, method, path, stream=False, **kwargs):
+        # Gövde ve Content-Type test client'takiyle aynı şekilde üretilir (json=, data= dosyalar dahil)
+        environ = EnvironBuilder(path=path, method=method, **kwargs).get_environ()
+        body = environ["wsgi.input"].read() or None
+        headers = {"Cookie": "; ".join(f"{k}={v}" for k, v in self.cookies.items()), "X-Forwarded-For": self.ip}
+        if environ.get("CONTENT_TYPE"):
+            headers["Content-Type"] = environ["CONTENT_TYPE"]
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            self.conn.request(method, path, body=body, headers=headers)
+            resp = self.conn.getresponse()
+            for cookie in resp.headers.get_all("Set-Cookie") or ():
+                name, _, value = cookie.split(";", 1)[0].partition("=")
+                if value and "max-age=0" not in cookie.lower():
+                    self.cookies[name] = value
+                else:
+                    self.cookies.pop(name, None)
+            if stream:
+                data = resp.read1(4096)
+                self.close()  # SSE bağlantısı yarıda bırakılır
+                return resp.status, data
+            return resp.status, resp.read()
+        except (http.client.HTTPException, OSError):
+            self.close()
+            return 0, b""
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# --- Sanal kullanıcı ---
+class VirtualUser:
+    def __init__(self, session, recorder, scale, rnd, admin=False):
+        self.session = session
+        self.recorder = recorder
+        self.scale = scale
+        self.rnd = rnd
+        self.admin = admin
+        self.reservations = []
+        self.signups = 0
+
+    def call(self, method, route, *args, query=None, stream=False, **kwargs):
+        parts = iter(args)
+        path = PLACEHOLDER.sub(lambda _: str(next(parts)), route)
+        if query:
+            path += "?" + urlencode(query)
+        started = time.perf_counter()
+        status, body = self.session.send(method, path, stream=stream, **kwargs)
+        self.recorder.record(f"{method} {route}", time.perf_counter() - started, status)
+        return status, body
+
+    def json(self, method, route, *args, **kwargs):
+        status, body = self.call(method, route, *args, **kwargs)
+        try:
+            return status, json.loads(body) if body else None
+        except ValueError:
+            return status, None
+
+    def login(self):
+        if self.admin:
+            email = ADMIN_EMAIL
+        else:
+            email = f"guest{self.rnd.randrange(self.scale['users'])}@example.com"
+        for _ in range(5):
+            status, _ = self.call("POST", "/login", json={"email": email, "password": SEED_PASSWORD})
+            if status != 429:  # hash havuzu dolu; kısa bekleyip tekrar dene
+                return status == 200
+            time.sleep(0.2)
+        return False
+
+    def pick_id(self, table):
+        return self.rnd.randint(1, max(1, self.scale[table]))
+
+    def future_slot(self):
+        t = datetime.now() + timedelta(days=self.rnd.randint(1, 60))
+        return t.replace(hour=self.rnd.randint(8, 20), minute=self.rnd.choice((0, 30))).strftime("%Y-%m-%dT%H:%M")
+
+    # misafir akışları
+    def browse(self):
+        for route in ("/me", "/api/bootstrap", "/services", "/reservations", "/invoices", "/complaints",
+                      "/my-total"):
+            self.call("GET", route)
+        self.call("GET", self.rnd.choice(STATIC_PAGES))
+        self.call("GET", "/health")
+
+    def book(self):
+        status, body = self.json("POST", "/reservations", json={
+            "service_id": self.pick_id("services"), "start_time": self.future_slot(), "note": "load test"})
+        if status == 201:
+            self.reservations.append(body["id"])
+        if self.reservations and self.rnd.random() < .5:
+            self.call("DELETE", "/reservations/<int:res_id>", self.reservations.pop())
+
+    def complain(self):
+        title, text = self.rnd.choice(COMPLAINTS)
+        self.call("POST", "/complaints", json={"title": title, "text": text})
+
+    def invoice(self):
+        status, body = self.json("POST", "/invoices", json={
+            "total_amount": self.rnd.randint(100, 50_000) / 100, "issued_at": datetime.now().strftime("%Y-%m-%d"),
+            "currency": self.rnd.choice(("TRY", "EUR"))})
+        if status == 201:
+            self.call("PUT", "/invoices/<int:invoice_id>/status", body["id"], json={"paid": 1})
+        self.call("GET", "/invoices", query={"paid": 0})
+
+    def upload(self):
+        rows = "".join(f"{self.rnd.randint(1, 900)},TRY,2025-09-{d:02d},{d % 2}\n" for d in range(1, 11))
+        csv = ("total_amount,currency,issued_at,paid\n" + rows).encode()
+        if self.rnd.random() < .5:
+            self.call("POST", "/upload_invoices", data={"file": (io.BytesIO(csv), "invoices.csv")})
+            return
+        status, body = self.json("POST", "/upload_invoices",
+                                 data={"file": (io.BytesIO(csv), "invoices.csv"), "async": "1"})
+        if status == 202:
+            for _ in range(20):
+                status, _ = self.call("GET", "/jobs/<int:job_id>/result", body["job_id"])
+                if status != 202:
+                    break
+                time.sleep(0.05)
+            self.call("GET", "/jobs/<int:job_id>", body["job_id"])
+
+    def events(self):
+        self.call("GET", "/events", stream=True)
+
+    def relogin(self):
+        self.call("POST", "/logout")
+        self.call("GET", "/")
+        self.login()
+
+    def signup(self):
+        self.signups += 1
+        tag = f"{threading.get_ident()}-{self.signups}-{self.rnd.randrange(10**9)}"
+        self.call("POST", "/register", json={"name": "Load Test", "email": f"lt-{tag}@example.com",
+                                             "password": SEED_PASSWORD})
+        self.call("GET", "/add-user/<name>/<email>", "LoadTest", f"lt-add-{tag}@example.com")
+        self.call("GET", "/list-users", query={"limit": 50})
+        self.login()  # register oturumu yeni hesaba geçirdi
+
+    # yönetici akışları
+    def admin_browse(self):
+        self.call("GET", "/dashboard")
+        self.call("GET", "/admin/users")
+        self.call("GET", "/admin/user/<int:user_id>", self.rnd.randint(2, self.scale["users"] + 1))
+        self.call("GET", "/admin/complaints", query={"status": self.rnd.choice(("open", "in_progress", ""))})
+        self.call("GET", "/admin/services")
+        self.call("GET", "/admin/reports")
+        self.call("GET", "/admin/reports/<kind>", self.rnd.choice(("revenue", "reservations", "complaints")),
+                  query={"grain": self.rnd.choice(("day", "week", "month"))})
+        self.call("GET", "/jobs/metrics")
+
+    def admin_search(self):
+        term = self.rnd.choice(SEARCH_TERMS)
+        self.call("GET", "/admin/complaints/search", query={"q": term, "limit": 20})
+        self.call("GET", "/admin/complaints", query={"q": term})
+
+    def admin_update(self):
+        self.call("POST", "/admin/complaint/<int:cid>/status", self.pick_id("complaints"),
+                  data={"status": self.rnd.choice(("open", "in_progress", "resolved"))})
+        self.call("POST", "/admin/reservation/<int:rid>/status", self.pick_id("reservations"),
+                  data={"status": self.rnd.choice(("pending", "approved", "cancelled"))})
+        self.call("POST", "/admin/invoice/<int:invoice_id>/status", self.pick_id("invoices"),
+                  data={"paid": self.rnd.randint(0, 1)})
+        # 1 yönetici; misafirlerin rolü değişmeden yeniden yazılır
+        self.call("POST", "/admin/user/<int:user_id>/role", self.rnd.randint(2, self.scale["users"] + 1),
+                  data={"role": "user"})
+
+    def admin_export(self):
+        day = (datetime.now() - timedelta(days=self.rnd.randint(30, 700))).strftime("%Y-%m-%d")
+        self.call("GET", "/admin/export/<kind>", self.rnd.choice(("invoices", "reservations", "complaints")),
+                  query={"from": day, "to": day, "format": self.rnd.choice(("ndjson", "csv"))})
+
+    def admin_services(self):
+        self.call("POST", "/admin/services/<int:sid>/update", self.pick_id("services"),
+                  data={"description": f"updated {self.rnd.randrange(1000)}"})
+        if self.rnd.random() < .05:
+            self.call("POST", "/admin/services/add",
+                      data={"name": f"Load test service {self.rnd.randrange(10**6)}", "price": "25"})
+
+
+GUEST_FLOWS = {"browse": 40, "book": 12, "complain": 8, "invoice": 8, "upload": 2, "events": 3,
+               "relogin": 4, "signup": 1}
+ADMIN_FLOWS = {"admin_browse": 40, "admin_search": 25, "admin_update": 20, "admin_export": 5,
+               "admin_services": 5, "relogin": 1}
+
+
+# --- Ölçüm ---
+class Recorder:
+    """Thread başına bir tane; sonuçlar koşu bitince birleştirilir."""
+
+    def __init__(self, record_from):
+        self.record_from = record_from
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, label, seconds, status):
+        if time.perf_counter() >= self.record_from:
+            self.latencies[label].append(seconds)
+            self.statuses[label][status] += 1
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000 if samples else 0.0
+
+
+def summarize(latencies, statuses, elapsed):
+    latencies = sorted(latencies)
+    errors = sum(n for code, n in statuses.items() if code == 0 or code >= 500)
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, .50), 3),
+        "p95_ms": round(percentile(latencies, .95), 3),
+        "p99_ms": round(percentile(latencies, .99), 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        "status": {str(code): n for code, n in sorted(statuses.items())},
+    }
+
+
+def db_scale(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        scale = {t: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {t}").fetchone()[0]
+                 for t in ("users", "services", "reservations", "invoices", "complaints")}
+        scale["users"] = conn.execute("SELECT COUNT(*) FROM users WHERE email LIKE 'guest%@example.com'").fetchone()[0]
+    finally:
+        conn.close()
+    if not scale["users"]:
+        sys.exit(f"{path} has no seeded guests; run bench/seed_data.py first")
+    return scale
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args, make_session, scale):
+    started = time.perf_counter()
+    record_from = started + args.warmup
+    deadline = record_from + args.duration
+    recorders = []
+
+    def worker(index):
+        rnd = random.Random(args.seed * 1000 + index)
+        recorder = Recorder(record_from)
+        recorders.append(recorder)
+        admin = index < round(args.threads * args.admin_ratio)
+        user = VirtualUser(make_session(f"10.0.{index // 250}.{index % 250 + 1}"), recorder, scale, rnd, admin=admin)
+        flows = ADMIN_FLOWS if admin else GUEST_FLOWS
+        names, weights = list(flows), list(flows.values())
+        user.login()
+        while time.perf_counter() < deadline:
+            getattr(user, rnd.choices(names, weights)[0])()
+            if args.think_ms:
+                time.sleep(rnd.uniform(0, 2 * args.think_ms) / 1000)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - record_from
+
+    latencies, statuses = defaultdict(list), defaultdict(Counter)
+    for recorder in recorders:
+        for label, samples in recorder.latencies.items():
+            latencies[label].extend(samples)
+            statuses[label].update(recorder.statuses[label])
+    everything = [s for samples in latencies.values() for s in samples]
+    total_status = sum(statuses.values(), Counter())
+    return elapsed, {
+        "total": summarize(everything, total_status, elapsed),
+        "endpoints": {label: summarize(latencies[label], statuses[label], elapsed) for label in sorted(latencies)},
+    }
+
+
+def compare(result, baseline, threshold):
+    regressions = []
+    print(f"\n{'endpoint':<46} {'p95 before':>11} {'p95 now':>9} {'change':>8}", file=sys.stderr)
+    for label, now in result["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(label)
+        if not before or min(now["count"], before["count"]) < MIN_SAMPLES:
+            continue
+        change = now["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        worse = change > threshold and now["p95_ms"] - before["p95_ms"] > MIN_REGRESSION_MS
+        if worse:
+            regressions.append(label)
+        print(f"{label:<46} {before['p95_ms']:>9.1f}ms {now['p95_ms']:>7.1f}ms {change * 100:>+7.0f}%"
+              f"{'  REGRESSION' if worse else ''}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=database.DB_PATH, help="seed_data.py ile doldurulmuş veritabanı")
+    parser.add_argument("--url", help="yerel WSGI sunucusu; verilmezse süreç içi test client")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=60, help="ölçülen süre (sn)")
+    parser.add_argument("--warmup", type=float, default=5, help="ölçülmeyen ısınma süresi (sn)")
+    parser.add_argument("--admin-ratio", type=float, default=0.2, help="yönetici thread oranı")
+    parser.add_argument("--think-ms", type=float, default=0, help="akışlar arası ortalama bekleme")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="JSON sonuç dosyası (verilmezse stdout)")
+    parser.add_argument("--compare", help="karşılaştırılacak önceki JSON sonucu")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="izin verilen p95 artışı (0.25 = %%25)")
+    args = parser.parse_args()
+
+    scale = db_scale(args.db)
+    uncovered = None
+    if args.url:
+        make_session = lambda ip: HttpSession(args.url, ip)
+    else:
+        database.DB_PATH = args.db
+        # Bekleme süresiz sanal kullanıcılar kullanıcı başı sınırlara takılır; 429'lar ölçümü bozar
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+        os.environ.setdefault("ADMISSION_ENABLED", "0")
+        import app as app_module
+        app = app_module.app
+        make_session = lambda ip: TestClientSession(app, ip)
+
+    elapsed, result = run(args, make_session, scale)
+
+    if not args.url:
+        # Hash process'leri kapanmazsa stdout'u açık tutar (ör. | jq bekler kalır)
+        app_module.hasher.shutdown()
+        app_module.jobs.shutdown()
+        hit = {label.split(" ", 1)[1] for label in result["endpoints"]}
+        uncovered = sorted({r.rule for r in app.url_map.iter_rules() if r.endpoint != "static"} - hit)
+    result = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "target": args.url or "flask-test-client",
+            "threads": args.threads, "admin_ratio": args.admin_ratio, "think_ms": args.think_ms,
+            "warmup_s": args.warmup, "duration_s": round(elapsed, 2), "seed": args.seed,
+            "db": os.path.abspath(args.db), "scale": scale,
+            "git": git_revision(), "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "env": {k: v for k, v in sorted(os.environ.items()) if k.startswith(ENV_PREFIXES)},
+        },
+        **result,
+        "uncovered": uncovered,
+    }
+
+    total = result["total"]
+    print(f"{'endpoint':<46} {'count':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5}", file=sys.stderr)
+    for label, s in [*result["endpoints"].items(), ("TOTAL", total)]:
+        print(f"{label:<46} {s['count']:>7,} {s['rps']:>8,.1f} {s['p50_ms']:>6.1f}ms {s['p95_ms']:>6.1f}ms "
+              f"{s['p99_ms']:>6.1f}ms {s['errors']:>5}", file=sys.stderr)
+    if uncovered:
+        print(f"not exercised: {', '.join(uncovered)}", file=sys.stderr)
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    code = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} endpoint(s) regressed more than {args.max_regression:.0%} at p95",
+                  file=sys.stderr)
+            code = 1
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Yük testi için gerçekçi ölçekte veri üretir (varsayılan: instance/app.db).
+
+100k kullanıcı, milyonlarca rezervasyon / fatura ve yüz binlerce şikayet
+toplu executemany ile yazılır. Sayaç, sürüm ve slot trigger'ları açık kalır;
+rapor rollup'ları (report_state.done_id=0 ile) ve FTS indeksi yükleme sırasında
+kapatılıp sonda backfill_reports / 'rebuild' ile tek seferde doldurulur.
+
+Tüm misafirler guest<i>@example.com, yönetici admin@example.com; parola
+hepsi için SEED_PASSWORD (loadtest.py bu hesaplarla giriş yapar).
+
+    python bench/seed_data.py [--db yol] [--scale 0.01] [--reset]
+"""
+import argparse, os, random, sys, time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask
+from werkzeug.security import generate_password_hash
+import database
+from passwords import PASSWORD_HASH_METHOD
+
+SEED_PASSWORD = "loadtest"
+ADMIN_EMAIL = "admin@example.com"
+DEFAULTS = {"users": 100_000, "services": 30, "reservations": 2_000_000,
+            "invoices": 2_000_000, "complaints": 300_000}
+BATCH = 50_000
+SERVICES = ("Spa", "Gym", "Airport transfer", "Laundry", "Room service", "Late checkout",
+            "Tennis court", "Massage", "Babysitting", "Bike rental")
+COMPLAINTS = (
+    ("AC not working", "The air conditioning in my room is not cooling at all"),
+    ("Noise", "Loud music from the next room until late at night"),
+    ("Wifi", "The wifi connection keeps dropping in the evening"),
+    ("Shower", "No hot water in the shower this morning"),
+    ("Housekeeping", "Towels were not replaced and the room was not cleaned"),
+    ("Breakfast", "Breakfast ran out of bread and coffee before 9"),
+    ("Elevator", "The elevator on the east wing has been out of order"),
+    ("Parking", "My parking spot was taken by another car"),
+    ("Gürültü", "Koridorda gece boyunca çok gürültü vardı"),
+    ("Klima", "Odadaki klima su damlatıyor"),
+)
+CURRENCIES = ("TRY", "TRY", "TRY", "EUR", "USD")
+HISTORY_DAYS = 730
+
+
+def timestamps(rnd, start):
+    # Son HISTORY_DAYS gün içinde, saat 07-22 arası yarım saat başları
+    while True:
+        yield start + timedelta(days=rnd.randrange(HISTORY_DAYS), hours=rnd.randint(7, 22),
+                                minutes=rnd.choice((0, 30)))
+
+
+def write_batches(db, label, sql, total, make_row):
+    started = time.perf_counter()
+    for offset in range(0, total, BATCH):
+        db.executemany(sql, map(make_row, range(offset, min(offset + BATCH, total))))
+        db.commit()
+        done = min(offset + BATCH, total)
+        print(f"\r  {label:<13} {done:>10,} / {total:,}", end="", flush=True)
+    print(f"  ({time.perf_counter() - started:.1f}s)")
+
+
+def seed(db, counts, rnd):
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=HISTORY_DAYS - 30)
+    when = timestamps(rnd, start)
+    pw_hash = generate_password_hash(SEED_PASSWORD, PASSWORD_HASH_METHOD)
+    users, services = counts["users"], counts["services"]
+
+    db.execute("INSERT INTO users (name, email, password_hash, role) VALUES ('Admin', ?, ?, 'admin')",
+               (ADMIN_EMAIL, pw_hash))
+    write_batches(db, "users", "INSERT INTO users (name, email, password_hash, room_no) VALUES (?, ?, ?, ?)",
+                  users, lambda i: (f"Guest {i}", f"guest{i}@example.com", pw_hash, str(100 + i % 900)))
+    # Bir kısmı kapasiteli (çakışma kontrolü yapılan) servisler
+    db.executemany(
+        "INSERT INTO services (name, description, price_minor, capacity, slot_minutes) VALUES (?, ?, ?, ?, ?)",
+        ((f"{SERVICES[i % len(SERVICES)]} {i // len(SERVICES) + 1}", "", rnd.randint(10, 300) * 100,
+          (0, 0, 4)[i % 3], (0, 0, 60)[i % 3]) for i in range(services)))
+    db.commit()
+
+    def reservation(_):
+        t = next(when)
+        return (rnd.randint(2, users + 1), rnd.randint(1, services), t.strftime("%Y-%m-%dT%H:%M"),
+                (t + timedelta(minutes=rnd.choice((30, 60, 90)))).strftime("%Y-%m-%dT%H:%M"),
+                rnd.choices(("approved", "pending", "cancelled"), (70, 20, 10))[0],
+                t.strftime("%Y-%m-%d %H:%M:%S"))
+    write_batches(db, "reservations",
+                  "INSERT INTO reservations (user_id, service_id, start_time, end_time, status, created_at) "
+                  "VALUES (?, ?, ?, ?, ?, ?)", counts["reservations"], reservation)
+
+    def invoice(_):
+        t = next(when)
+        return (rnd.randint(2, users + 1), rnd.randint(500, 500_000), rnd.choice(CURRENCIES),
+                t.strftime("%Y-%m-%d %H:%M:%S"), int(rnd.random() < .8),
+                rnd.choices(("system", "manual", "csv"), (80, 10, 10))[0],
+                rnd.choice((None, rnd.randint(1, services))))
+    write_batches(db, "invoices",
+                  "INSERT INTO invoices (user_id, amount_minor, currency, issued_at, paid, source, service_id) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)", counts["invoices"], invoice)
+
+    def complaint(_):
+        t = next(when)
+        title, text = rnd.choice(COMPLAINTS)
+        status = rnd.choices(("open", "in_progress", "resolved"), (20, 10, 70))[0]
+        resolved = (t + timedelta(hours=rnd.randint(1, 72))).strftime("%Y-%m-%d %H:%M:%S")
+        return (rnd.randint(2, users + 1), title, f"{text} (room {rnd.randint(100, 999)})", status,
+                t.strftime("%Y-%m-%d %H:%M:%S"), resolved if status == "resolved" else None)
+    write_batches(db, "complaints",
+                  "INSERT INTO complaints (user_id, title, text, status, created_at, resolved_at) "
+                  "VALUES (?, ?, ?, ?, ?, ?)", counts["complaints"], complaint)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=database.DB_PATH)
+    parser.add_argument("--scale", type=float, default=1.0, help="varsayılan satır sayılarının çarpanı")
+    parser.add_argument("--reset", action="store_true", help="mevcut veritabanını sil")
+    parser.add_argument("--seed", type=int, default=42)
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name}", type=int, help=f"varsayılan {default:,}")
+    args = parser.parse_args()
+    # Servis kataloğu ölçekten bağımsız; sadece hacim tabloları ölçeklenir
+    counts = {name: getattr(args, name) or (default if name == "services" else max(1, int(default * args.scale)))
+              for name, default in DEFAULTS.items()}
+
+    if args.reset:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    database.DB_PATH = args.db
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+
+    with Flask(__name__).app_context():
+        database.init_db()
+        db = database.get_db()
+        if db.execute("SELECT EXISTS (SELECT 1 FROM users)").fetchone()[0]:
+            sys.exit(f"{args.db} already has users; use --reset to start from an empty database")
+
+        print(f"seeding {args.db}: " + ", ".join(f"{n:,} {name}" for name, n in counts.items()))
+        started = time.perf_counter()
+        # Rollup trigger'ları yükleme boyunca devre dışı; FTS trigger'ları geçici olarak kaldırılır
+        db.execute("UPDATE report_state SET done_id = 0")
+        fts_triggers = db.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+                                  "AND name LIKE 'trg_complaints_fts_%'").fetchall()
+        for name, _ in fts_triggers:
+            db.execute(f"DROP TRIGGER {name}")
+        db.commit()
+        try:
+            seed(db, counts, random.Random(args.seed))
+        finally:
+            for _, sql in fts_triggers:
+                db.execute(sql)
+            db.commit()
+
+        step = time.perf_counter()
+        db.execute("INSERT INTO complaints_fts (complaints_fts) VALUES ('rebuild')")
+        db.execute("INSERT INTO complaints_fts (complaints_fts) VALUES ('optimize')")
+        db.commit()
+        print(f"  search index  ({time.perf_counter() - step:.1f}s)")
+        step = time.perf_counter()
+        database.backfill_reports()
+        print(f"  report rollups ({time.perf_counter() - step:.1f}s)")
+        drift = database.reconcile_stats()
+        print(f"done in {time.perf_counter() - started:.1f}s"
+              + (f", stats corrected: {sorted(drift)}" if drift else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,493 @@
-import os, sqlite3
+import os, io, re, csv, html, json, base64, binascii, calendar, hashlib, itertools, queue, sqlite3, threading, time
+from collections import deque
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from flask import g
+from urllib.parse import quote
 
-# DB yolu ve klasör
-DB_PATH = os.path.join(os.path.dirname(__file__), "instance", "app.db")
+try:
+    import sqlalchemy
+    from sqlalchemy.pool import QueuePool
+except ImportError:  # sadece DB_BACKEND=sqlalchemy için gerekli
+    sqlalchemy = None
+
+# DB yolu ve klasör (DB_PATH ile başka bir dosya verilebilir, ör. yük testi verisi)
+DB_PATH = os.environ.get("DB_PATH") or os.path.join(os.path.dirname(__file__), "instance", "app.db")
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)  # instance/ yoksa oluştur
 
-def _connect():
-    conn = sqlite3.connect(DB_PATH, timeout=10, check_same_thread=False)
+# Her bağlantıda bir kez çalıştırılan PRAGMA'lar (WAL ile synchronous=NORMAL güvenli)
+DB_PRAGMAS = {
+    "foreign_keys": "ON",
+    "journal_mode": "WAL",
+    "synchronous": os.environ.get("DB_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.environ.get("DB_CACHE_KB", 16000)) * -1,  # negatif = KiB
+    "mmap_size": int(os.environ.get("DB_MMAP_BYTES", 256 * 1024 * 1024)),
+    "temp_store": "MEMORY",
+}
+
+# Bağlantı başına hazırlanmış (prepared) ifade cache'i; sorgu metinleri sabit
+# olduğundan havuzdaki bağlantılar aynı ifadeleri tekrar derlemez
+STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE", 256))
+
+# Ayarlanırsa her SQL ifadesinden sonra hook(sql, saniye) çağrılır (metrics.py)
+SQL_HOOK = None
+
+class PooledConnection(sqlite3.Connection):
+    # Havuzdaki bağlantının hangi dosyaya ait olduğunu ve ne zamandır boşta olduğunu tutar
+    db_path = None
+    idle_since = 0.0
+
+    def execute(self, sql, *args):
+        if SQL_HOOK is None:
+            return super().execute(sql, *args)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            SQL_HOOK(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, *args):
+        if SQL_HOOK is None:
+            return super().executemany(sql, *args)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            SQL_HOOK(sql, time.perf_counter() - started)
+
+def _connect(path=None, readonly=False):
+    # readonly: replica bağlantısı; dosya mode=ro ile açılır, yanlışlıkla
+    # replica'ya yönlenen bir yazma sessizce geçmek yerine hata verir
+    path = path or DB_PATH
+    if readonly:
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True, timeout=10,
+                               check_same_thread=False, factory=PooledConnection,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+    else:
+        conn = sqlite3.connect(path, timeout=10, check_same_thread=False, factory=PooledConnection,
+                               cached_statements=STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON;")
-    conn.execute("PRAGMA journal_mode = WAL;")
+    for name, value in DB_PRAGMAS.items():
+        if readonly and name == "journal_mode":
+            continue  # WAL'a primary geçirir
+        conn.execute(f"PRAGMA {name} = {value};")
+    conn.db_path = path
     return conn
 
+
+class ConnectionPool:
+    """Thread-safe SQLite bağlantı havuzu; size=0 ise her request yeni bağlantı açar."""
+
+    def __init__(self, size=8, timeout=10.0, check_idle=30.0):
+        self.size = size
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._stats = {"acquired": 0, "created": 0, "discarded": 0, "waited": 0,
+                       "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+    def acquire(self):
+        started = time.perf_counter()
+        waited = False
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._create()
+                if conn is None:
+                    # Havuz dolu: boşa çıkan bir bağlantıyı kısa aralıklarla bekle
+                    waited = True
+                    remaining = self.timeout - (time.perf_counter() - started)
+                    if remaining <= 0:
+                        raise sqlite3.OperationalError("connection pool exhausted")
+                    try:
+                        conn = self._idle.get(timeout=min(remaining, 0.1))
+                    except queue.Empty:
+                        continue
+            if self._healthy(conn):
+                break
+            self._discard(conn)
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats["acquired"] += 1
+            self._stats["waited"] += waited
+            self._stats["wait_ms_total"] += wait_ms
+            self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+        return conn
+
+    def _create(self):
+        with self._lock:
+            if self.size and self._open >= self.size:
+                return None
+            self._open += 1
+            self._stats["created"] += 1
+        try:
+            return _connect()
+        except Exception:
+            with self._lock:
+                self._open -= 1
+            raise
+
+    def _healthy(self, conn):
+        if conn.db_path != DB_PATH:
+            return False
+        if conn.idle_since and time.monotonic() - conn.idle_since > self.check_idle:
+            try:
+                conn.execute("SELECT 1")
+            except sqlite3.Error:
+                return False
+        return True
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # commit edilmemiş iş bir sonraki request'e taşınmasın
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        if self.size == 0 or conn.db_path != DB_PATH:
+            self._discard(conn)
+            return
+        conn.idle_since = time.monotonic()
+        self._idle.put(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._open -= 1
+            self._stats["discarded"] += 1
+
+    def warm(self, count):
+        """count bağlantıyı (havuz boyutuna kadar) önceden açıp boşta bekletir."""
+        conns = []
+        try:
+            while len(conns) < count:
+                conn = self._create()
+                if conn is None:
+                    break
+                conns.append(conn)
+                conn.execute("SELECT 1 FROM sqlite_master LIMIT 1")  # şemayı yükle
+        finally:
+            for conn in conns:
+                self.release(conn)
+        return len(conns)
+
+    def close_all(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def stats(self):
+        with self._lock:
+            acquired = self._stats["acquired"] or 1
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": self._idle.qsize(),
+                **self._stats,
+                "wait_ms_avg": round(self._stats["wait_ms_total"] / acquired, 3),
+            }
+
+
+class EnginePool:
+    """ConnectionPool arayüzünde (acquire/release/stats/close_all) SQLAlchemy engine havuzu.
+
+    Bağlantılar engine'in QueuePool'undan alınır (overflow, timeout; pre_ping her
+    checkout'ta SELECT 1 çalıştırır, yerel dosyada gereksiz olduğu için kapalı);
+    helper'lara sqlite3 bağlantısının kendisi verilir, SQL'ler değişmez.
+    """
+
+    def __init__(self, connect, size=8, timeout=10.0, max_overflow=4, pre_ping=False):
+        if sqlalchemy is None:
+            raise RuntimeError("DB_BACKEND=sqlalchemy requires the SQLAlchemy package")
+        self.size = size
+        self.engine = sqlalchemy.create_engine(
+            "sqlite://", creator=connect, poolclass=QueuePool, pool_size=size,
+            max_overflow=max_overflow, pool_timeout=timeout, pool_pre_ping=pre_ping,
+        )
+        self._checked_out = {}
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            fairy = self.engine.raw_connection()
+        except sqlalchemy.exc.TimeoutError:
+            raise sqlite3.OperationalError("connection pool exhausted") from None
+        conn = fairy.dbapi_connection
+        with self._lock:
+            self._checked_out[id(conn)] = fairy
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            fairy = self._checked_out.pop(id(conn))
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            fairy.invalidate()
+        fairy.close()
+
+    def warm(self, count):
+        conns = []
+        try:
+            for _ in range(min(count, self.size)):
+                conns.append(self.acquire())
+                conns[-1].execute("SELECT 1 FROM sqlite_master LIMIT 1")
+        finally:
+            for conn in conns:
+                self.release(conn)
+        return len(conns)
+
+    def close_all(self):
+        self.engine.dispose()
+
+    def stats(self):
+        pool = self.engine.pool
+        return {"size": pool.size(), "open": pool.checkedin() + pool.checkedout(),
+                "idle": pool.checkedin(), "overflow": max(pool.overflow(), 0)}
+
+
+# --- STORAGE BACKEND ---
+# DB_BACKEND=sqlite (varsayılan): yukarıdaki ConnectionPool.
+# DB_BACKEND=sqlalchemy: primary bağlantılar EnginePool'dan; DB_REPLICA_PATHS
+# (virgülle ayrılmış dosya yolları) verilirse okuma helper'ları (get_read_db)
+# bu dosyalara salt-okunur açılan havuzlara round-robin dağıtılır. Yerel
+# denemede replica olarak primary dosyanın kendisi verilebilir.
+#
+# Sürüm damgalı cache'leri dolduran okumalar (katalog, identity) ve job'lar
+# replica gecikmesinden etkilenmesin diye primary'de kalır.
+DB_BACKEND = os.environ.get("DB_BACKEND", "sqlite")
+_pool_size = int(os.environ.get("DB_POOL_SIZE", 8))
+_pool_timeout = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+_pre_ping = os.environ.get("DB_POOL_PRE_PING") == "1"
+
+if DB_BACKEND == "sqlalchemy":
+    POOL = EnginePool(lambda: _connect(), size=_pool_size, timeout=_pool_timeout, pre_ping=_pre_ping)
+    READ_POOLS = [
+        EnginePool(lambda path=path: _connect(path, readonly=True),
+                   size=_pool_size, timeout=_pool_timeout, pre_ping=_pre_ping)
+        for path in filter(None, os.environ.get("DB_REPLICA_PATHS", "").split(","))
+    ]
+elif DB_BACKEND == "sqlite":
+    POOL = ConnectionPool(size=_pool_size, timeout=_pool_timeout)
+    READ_POOLS = []
+else:
+    raise RuntimeError(f"unknown DB_BACKEND: {DB_BACKEND}")
+_read_rr = itertools.count()
+
+def _read_pool():
+    return READ_POOLS[next(_read_rr) % len(READ_POOLS)] if READ_POOLS else POOL
+
+# Pre-fork sunucu (gunicorn.conf.py): master'da açılmış bağlantılar fork'tan önce
+# kapatılır (SQLite bağlantısı process'ler arasında paylaşılamaz), her worker
+# kendi havuzunu ilk request'ten önce doldurur.
+def warm_pools(count):
+    return sum(pool.warm(count) for pool in (POOL, *READ_POOLS))
+
+def close_pools():
+    for pool in (POOL, *READ_POOLS):
+        pool.close_all()
+
+# --- GROUP COMMIT ---
+# WRITE_BATCHING=1 iken tek ifadelik yazma helper'ları (execute_write) ifadeyi
+# ayrı bir writer thread'ine verir. Writer kuyrukta biriken yazmaları (en fazla
+# max_batch, ilk yazmadan sonra en fazla max_wait saniye bekleyerek) tek
+# transaction'da çalıştırır ve commit'ten sonra çağıranları uyandırır; böylece
+# yük altında her yazma için ayrı commit (ve synchronous=FULL'da fsync) yapılmaz.
+# Her ifade kendi SAVEPOINT'inde çalışır: biri hata verirse sadece o çağırana
+# exception döner, aynı batch'teki diğerleri commit edilir.
+class _Write:
+    __slots__ = ("sql", "params", "fetch", "result", "error", "done", "queued_at")
+
+    def __init__(self, sql, params, fetch):
+        self.sql = sql
+        self.params = params
+        self.fetch = fetch
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.queued_at = time.perf_counter()
+
+
+def _write_result(cur, fetch):
+    if fetch == "lastrowid":
+        return cur.lastrowid
+    if fetch == "rowcount":
+        return cur.rowcount
+    if fetch == "one":
+        return cur.fetchone()
+    return None
+
+
+class GroupCommitWriter:
+    def __init__(self, max_batch=128, max_wait=0.0):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "writes": 0, "errors": 0, "batch_max": 0}
+        self._batch_sizes = deque(maxlen=1000)
+        self._commit_ms = deque(maxlen=1000)
+        self._ack_ms = deque(maxlen=1000)
+
+    def submit(self, sql, params=(), fetch="lastrowid"):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+        item = _Write(sql, params, fetch)
+        self._queue.put(item)
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _run(self):
+        conn = _connect()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.perf_counter()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # batch'i bitirip sonra dur
+                    break
+                batch.append(item)
+            if conn.db_path != DB_PATH:  # test/bench'te DB_PATH değişmiş olabilir
+                conn.close()
+                conn = _connect()
+            self._commit(conn, batch)
+        conn.close()
+
+    def _commit(self, conn, batch):
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for w in batch:
+                conn.execute("SAVEPOINT w")
+                try:
+                    w.result = _write_result(conn.execute(w.sql, w.params), w.fetch)
+                except sqlite3.Error as e:
+                    conn.execute("ROLLBACK TO w")
+                    w.error = e
+                conn.execute("RELEASE w")
+            conn.commit()
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for w in batch:
+                w.error = w.error or e
+        finished = time.perf_counter()
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["writes"] += len(batch)
+            self._stats["errors"] += sum(w.error is not None for w in batch)
+            self._stats["batch_max"] = max(self._stats["batch_max"], len(batch))
+            self._batch_sizes.append(len(batch))
+            self._commit_ms.append((finished - started) * 1000)
+            self._ack_ms.extend((finished - w.queued_at) * 1000 for w in batch)
+        for w in batch:
+            w.done.set()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def metrics(self):
+        def pct(values, p):
+            values = sorted(values)
+            return round(values[min(len(values) - 1, int(len(values) * p))], 3) if values else 0
+        with self._lock:
+            return {
+                **self._stats,
+                "queue_depth": self._queue.qsize(),
+                "batch_size_avg": round(sum(self._batch_sizes) / len(self._batch_sizes), 2)
+                                  if self._batch_sizes else 0,
+                "commit_ms_p50": pct(self._commit_ms, .5),
+                "commit_ms_p99": pct(self._commit_ms, .99),
+                "ack_ms_p50": pct(self._ack_ms, .5),
+                "ack_ms_p99": pct(self._ack_ms, .99),
+            }
+
+
+WRITER = GroupCommitWriter(
+    max_batch=int(os.environ.get("WRITE_BATCH_MAX", 128)),
+    max_wait=float(os.environ.get("WRITE_BATCH_WAIT_MS", 0)) / 1000,
+) if os.environ.get("WRITE_BATCHING") == "1" else None
+
+def execute_write(sql, params=(), fetch="lastrowid"):
+    """Tek ifadelik yazma + commit. fetch: "lastrowid", "rowcount", "one" (RETURNING) ya da None."""
+    if WRITER is not None:
+        return WRITER.submit(sql, params, fetch)
+    db = get_db()
+    result = _write_result(db.execute(sql, params), fetch)
+    db.commit()
+    return result
+
+# --- VERSION STAMPS ---
+# Process içi cache'lerin geçersiz kılınması için instance/ altında küçük damga
+# dosyaları. bump_stamp dosyayı atomik olarak yeniler (yeni inode), read_stamp
+# sadece stat() yapar; böylece aynı DB'yi kullanan diğer worker process'leri de
+# değişikliği bir sonraki okumada görür.
+def _stamp_path(name):
+    return os.path.join(os.path.dirname(DB_PATH), f"{name}.version")
+
+def bump_stamp(name):
+    path = _stamp_path(name)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, "w") as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp, path)
+
+def read_stamp(name):
+    try:
+        st = os.stat(_stamp_path(name))
+    except FileNotFoundError:
+        bump_stamp(name)
+        st = os.stat(_stamp_path(name))
+    return (DB_PATH, st.st_ino, st.st_mtime_ns)
+
 def get_db():
     if "db" not in g:
-        g.db = _connect()
+        g.db = POOL.acquire()
     return g.db
 
+def get_read_db():
+    """Sadece okuyan sorgular için bağlantı. Replica yoksa ya da bu request'te
+    primary zaten kullanıldıysa (kendi yazdığını görsün) primary döner."""
+    if not READ_POOLS or "db" in g:
+        return get_db()
+    if "read_db" not in g:
+        g.read_pool = _read_pool()
+        g.read_db = g.read_pool.acquire()
+    return g.read_db
+
 def close_db(e=None):
     db = g.pop("db", None)
     if db is not None:
-        db.close()
+        POOL.release(db)
+    read_db = g.pop("read_db", None)
+    if read_db is not None:
+        g.pop("read_pool").release(read_db)
 
 def init_db():
     db = get_db()
@@ -76,35 +543,394 @@ def init_db():
       source TEXT NOT NULL DEFAULT 'system',
       FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
     );
+
+    CREATE TABLE IF NOT EXISTS jobs (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      name TEXT NOT NULL,
+      user_id INTEGER,
+      payload TEXT NOT NULL DEFAULT '{}',
+      status TEXT NOT NULL DEFAULT 'queued',
+      attempts INTEGER NOT NULL DEFAULT 0,
+      result TEXT,
+      error TEXT,
+      created_at TEXT NOT NULL DEFAULT (datetime('now')),
+      started_at TEXT,
+      finished_at TEXT
+    );
     """)
     db.commit()
+    migrate(db)
+
+
+# --- MIGRATIONS ---
+# Şema değişiklikleri sırayla uygulanır; uygulanan son sürüm PRAGMA user_version'da tutulur.
+# Yeni migration eklerken listenin sonuna ekleyin, mevcutları değiştirmeyin.
+
+# Rapor rollup'ları (migration 6). Her fact, kaynak tablodaki bir satırın bir
+# rollup tablosuna nasıl yansıdığını tanımlar: zaman ifadesi saat / gün kovasına
+# yuvarlanır, anahtarlarla gruplanır, değerler toplanır. Trigger'lar ve toplu
+# backfill aynı tanımdan üretilir. Migration 6 bunlardan üretildiği için bir
+# değişiklik yeni migration gerektirir. {r} satır önekidir (NEW. / OLD. / boş).
+REPORT_GRAINS = {"hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d"}
+REPORT_FACTS = (
+    # (rollup tablosu, kaynak tablo, zaman ifadesi, {anahtar: ifade}, {değer: ifade})
+    ("report_revenue", "invoices", "{r}issued_at",
+     {"service_id": "COALESCE({r}service_id, 0)", "currency": "{r}currency"},
+     {"invoices": "1", "amount_minor": "{r}amount_minor"}),
+    ("report_reservations", "reservations", "{r}start_time",
+     {"service_id": "{r}service_id", "status": "{r}status"},
+     {"reservations": "1",
+      "minutes": "MAX(0, COALESCE((strftime('%s', {r}end_time) - strftime('%s', {r}start_time)) / 60, 60))"}),
+    ("report_complaints", "complaints", "{r}created_at", {}, {"opened": "1"}),
+    ("report_complaints", "complaints", "{r}resolved_at", {},
+     {"resolved": "1", "resolution_seconds": "strftime('%s', {r}resolved_at) - strftime('%s', {r}created_at)"}),
+)
+REPORT_SOURCES = ("invoices", "reservations", "complaints")
+
+def _report_upsert(fact, grain, row=None, sign=""):
+    """fact'i grain rollup'ına ekleyen INSERT ... ON CONFLICT.
+
+    row="NEW." / "OLD.": trigger içinde tek satır (sign="-" çıkarır).
+    row=None: kaynak tablonun (?1, ?2] id aralığı için GROUP BY'lı toplu ekleme (backfill).
+    """
+    table, source, time_expr, keys, values = fact
+    sub = lambda expr: expr.replace("{r}", row or "")
+    bucket = f"strftime('{REPORT_GRAINS[grain]}', {sub(time_expr)})"
+    if row:
+        exprs = [f"{sign}({sub(e)})" for e in values.values()]
+        tail = f"WHERE {bucket} IS NOT NULL"
+    else:
+        exprs = [f"SUM({sub(e)})" for e in values.values()]
+        tail = (f"FROM {source} WHERE id > ?1 AND id <= ?2 AND {bucket} IS NOT NULL "
+                f"GROUP BY {', '.join(str(i) for i in range(2, len(keys) + 3))}")
+    columns = ", ".join(("grain", "bucket", *keys, *values))
+    selects = ", ".join((f"'{grain}'", bucket, *map(sub, keys.values()), *exprs))
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in values)
+    return f"INSERT INTO {table} ({columns}) SELECT {selects} {tail} ON CONFLICT DO UPDATE SET {updates};"
+
+def _report_triggers(source):
+    # Trigger'lar sadece backfill'in geçtiği satırları (id <= done_id) işler
+    facts = [f for f in REPORT_FACTS if f[1] == source]
+    exprs = " ".join(" ".join((f[2], *f[3].values(), *f[4].values())) for f in facts)
+    watched = ", ".join(sorted(set(re.findall(r"\{r\}(\w+)", exprs))))
+    guard = f"(SELECT done_id FROM report_state WHERE source = '{source}')"
+    apply = lambda row, sign="": "\n      ".join(
+        _report_upsert(f, grain, row, sign) for f in facts for grain in REPORT_GRAINS)
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS trg_report_{source}_ins AFTER INSERT ON {source}
+    WHEN NEW.id <= {guard} BEGIN
+      {apply("NEW.")}
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_report_{source}_del AFTER DELETE ON {source}
+    WHEN OLD.id <= {guard} BEGIN
+      {apply("OLD.", "-")}
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_report_{source}_upd AFTER UPDATE OF {watched} ON {source}
+    WHEN OLD.id <= {guard} BEGIN
+      {apply("OLD.", "-")}
+      {apply("NEW.")}
+    END;"""
+
+MIGRATIONS = [
+    # 1: kullanıcıya göre listeler, admin şikayet listesi ve dashboard sayaçları için indeksler
+    """
+    CREATE INDEX IF NOT EXISTS idx_reservations_user_created ON reservations(user_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_reservations_service ON reservations(service_id);
+    CREATE INDEX IF NOT EXISTS idx_invoices_user_issued ON invoices(user_id, issued_at, total_amount);
+    CREATE INDEX IF NOT EXISTS idx_complaints_user_created ON complaints(user_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_complaints_created ON complaints(created_at);
+    CREATE INDEX IF NOT EXISTS idx_complaints_status ON complaints(status);
+    CREATE INDEX IF NOT EXISTS idx_users_name ON users(name, email);
+    CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+    """,
+    # 2: dashboard sayaçları; trigger'lar her yazma ile aynı transaction'da günceller
+    """
+    CREATE TABLE IF NOT EXISTS stats (
+      name TEXT PRIMARY KEY,
+      value NUMERIC NOT NULL DEFAULT 0
+    );
+    INSERT OR REPLACE INTO stats (name, value) VALUES
+      ('total_users', (SELECT COUNT(*) FROM users)),
+      ('total_reservations', (SELECT COUNT(*) FROM reservations)),
+      ('total_income', (SELECT COALESCE(SUM(total_amount), 0) FROM invoices)),
+      ('open_complaints', (SELECT COUNT(*) FROM complaints WHERE status='open'));
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_users_ins AFTER INSERT ON users BEGIN
+      UPDATE stats SET value = value + 1 WHERE name = 'total_users';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_users_del AFTER DELETE ON users BEGIN
+      UPDATE stats SET value = value - 1 WHERE name = 'total_users';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_reservations_ins AFTER INSERT ON reservations BEGIN
+      UPDATE stats SET value = value + 1 WHERE name = 'total_reservations';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_reservations_del AFTER DELETE ON reservations BEGIN
+      UPDATE stats SET value = value - 1 WHERE name = 'total_reservations';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_invoices_ins AFTER INSERT ON invoices BEGIN
+      UPDATE stats SET value = value + NEW.total_amount WHERE name = 'total_income';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_invoices_del AFTER DELETE ON invoices BEGIN
+      UPDATE stats SET value = value - OLD.total_amount WHERE name = 'total_income';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_invoices_upd AFTER UPDATE OF total_amount ON invoices BEGIN
+      UPDATE stats SET value = value - OLD.total_amount + NEW.total_amount WHERE name = 'total_income';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_complaints_ins AFTER INSERT ON complaints WHEN NEW.status = 'open' BEGIN
+      UPDATE stats SET value = value + 1 WHERE name = 'open_complaints';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_complaints_del AFTER DELETE ON complaints WHEN OLD.status = 'open' BEGIN
+      UPDATE stats SET value = value - 1 WHERE name = 'open_complaints';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_complaints_upd AFTER UPDATE OF status ON complaints BEGIN
+      UPDATE stats SET value = value + (NEW.status = 'open') - (OLD.status = 'open')
+      WHERE name = 'open_complaints';
+    END;
+    """,
+    # 3: servis kapasitesi / slot süresi ve çakışma kontrolü için interval (R*Tree) indeksi.
+    # reservation_slots iptal edilmemiş rezervasyonların [başlangıç, bitiş) aralığını
+    # epoch dakikası olarak tutar; bitiş yoksa 60 dk varsayılır (DEFAULT_RESERVATION_MINUTES).
+    """
+    ALTER TABLE services ADD COLUMN capacity INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE services ADD COLUMN slot_minutes INTEGER NOT NULL DEFAULT 0;
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS reservation_slots
+      USING rtree_i32(id, service_lo, service_hi, start_min, end_min);
+
+    INSERT INTO reservation_slots
+      SELECT id, service_id, service_id, start_min,
+             MAX(start_min, COALESCE(CAST(strftime('%s', end_time) AS INTEGER) / 60, start_min + 60))
+      FROM (SELECT id, service_id, end_time,
+                   CAST(strftime('%s', start_time) AS INTEGER) / 60 AS start_min
+            FROM reservations WHERE status != 'cancelled')
+      WHERE start_min IS NOT NULL;
+
+    CREATE TRIGGER IF NOT EXISTS trg_slots_ins AFTER INSERT ON reservations
+    WHEN NEW.status != 'cancelled' AND strftime('%s', NEW.start_time) IS NOT NULL BEGIN
+      INSERT INTO reservation_slots VALUES (
+        NEW.id, NEW.service_id, NEW.service_id,
+        CAST(strftime('%s', NEW.start_time) AS INTEGER) / 60,
+        MAX(CAST(strftime('%s', NEW.start_time) AS INTEGER) / 60,
+            COALESCE(CAST(strftime('%s', NEW.end_time) AS INTEGER) / 60,
+                     CAST(strftime('%s', NEW.start_time) AS INTEGER) / 60 + 60)));
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_slots_del AFTER DELETE ON reservations BEGIN
+      DELETE FROM reservation_slots WHERE id = OLD.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_slots_upd
+    AFTER UPDATE OF status, service_id, start_time, end_time ON reservations BEGIN
+      DELETE FROM reservation_slots WHERE id = OLD.id;
+      INSERT INTO reservation_slots
+        SELECT NEW.id, NEW.service_id, NEW.service_id,
+               CAST(strftime('%s', NEW.start_time) AS INTEGER) / 60,
+               MAX(CAST(strftime('%s', NEW.start_time) AS INTEGER) / 60,
+                   COALESCE(CAST(strftime('%s', NEW.end_time) AS INTEGER) / 60,
+                            CAST(strftime('%s', NEW.start_time) AS INTEGER) / 60 + 60))
+        WHERE NEW.status != 'cancelled' AND strftime('%s', NEW.start_time) IS NOT NULL;
+    END;
+    """,
+    # 4: tablo başına veri sürümü; admin sayfalarındaki HTML parçaları bu sürümlerle
+    # anahtarlanır (bkz. render_cache.FragmentCache). Her yazmada trigger ile artar.
+    """
+    CREATE TABLE IF NOT EXISTS data_versions (
+      name TEXT PRIMARY KEY,
+      version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+    INSERT OR IGNORE INTO data_versions (name) VALUES
+      ('users'), ('services'), ('reservations'), ('invoices'), ('complaints'), ('stats');
+    """ + "".join(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS trg_version_{table}_{op[:3].lower()} AFTER {op} ON {table} BEGIN
+      UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+    END;"""
+        for table in ("users", "services", "reservations", "invoices", "complaints", "stats")
+        for op in ("INSERT", "UPDATE", "DELETE")
+    ),
+    # 5: tutarlar REAL yerine tam sayı küçük birim (kuruş): invoices.amount_minor,
+    # services.price_minor. Gelir sayacı para birimi başına tutulur ('income:TRY', ...).
+    # Eski sütunlara bağlı index ve trigger'lar önce kaldırılır, sonra sütunlar silinir.
+    """
+    DROP TRIGGER IF EXISTS trg_stats_invoices_ins;
+    DROP TRIGGER IF EXISTS trg_stats_invoices_del;
+    DROP TRIGGER IF EXISTS trg_stats_invoices_upd;
+    DROP INDEX IF EXISTS idx_invoices_user_issued;
+
+    ALTER TABLE invoices ADD COLUMN amount_minor INTEGER NOT NULL DEFAULT 0;
+    UPDATE invoices SET amount_minor = CAST(ROUND(total_amount * 100) AS INTEGER);
+    ALTER TABLE invoices DROP COLUMN total_amount;
+    ALTER TABLE services ADD COLUMN price_minor INTEGER NOT NULL DEFAULT 0;
+    UPDATE services SET price_minor = CAST(ROUND(price * 100) AS INTEGER);
+    ALTER TABLE services DROP COLUMN price;
+
+    CREATE INDEX IF NOT EXISTS idx_invoices_user_issued ON invoices(user_id, issued_at, amount_minor, currency);
+    CREATE INDEX IF NOT EXISTS idx_invoices_day ON invoices(date(issued_at), user_id, currency, amount_minor, issued_at);
+
+    DELETE FROM stats WHERE name = 'total_income';
+    INSERT INTO stats (name, value)
+      SELECT 'income:' || currency, SUM(amount_minor) FROM invoices GROUP BY currency;
+
+    CREATE TRIGGER IF NOT EXISTS trg_stats_invoices_ins AFTER INSERT ON invoices BEGIN
+      INSERT INTO stats (name, value) VALUES ('income:' || NEW.currency, NEW.amount_minor)
+        ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_invoices_del AFTER DELETE ON invoices BEGIN
+      UPDATE stats SET value = value - OLD.amount_minor WHERE name = 'income:' || OLD.currency;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_invoices_upd AFTER UPDATE OF amount_minor, currency ON invoices BEGIN
+      UPDATE stats SET value = value - OLD.amount_minor WHERE name = 'income:' || OLD.currency;
+      INSERT INTO stats (name, value) VALUES ('income:' || NEW.currency, NEW.amount_minor)
+        ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;
+    END;
+    """,
+    # 6: rapor rollup tabloları (saatlik + günlük kovalar, bkz. REPORT_FACTS) ve
+    # bunları besleyen alanlar: faturanın servisi, şikayetin çözülme zamanı.
+    # report_state.done_id: rollup'lara işlenmiş son kaynak id'si; mevcut veri
+    # backfill_reports ile parça parça işlenir. Boş tablolar doğrudan canlıdır.
+    """
+    ALTER TABLE invoices ADD COLUMN service_id INTEGER;
+    ALTER TABLE complaints ADD COLUMN resolved_at TEXT;
+
+    CREATE TABLE IF NOT EXISTS report_revenue (
+      grain TEXT NOT NULL,
+      bucket TEXT NOT NULL,
+      service_id INTEGER NOT NULL,
+      currency TEXT NOT NULL,
+      invoices INTEGER NOT NULL DEFAULT 0,
+      amount_minor INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (grain, bucket, service_id, currency)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS report_reservations (
+      grain TEXT NOT NULL,
+      bucket TEXT NOT NULL,
+      service_id INTEGER NOT NULL,
+      status TEXT NOT NULL,
+      reservations INTEGER NOT NULL DEFAULT 0,
+      minutes INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (grain, bucket, service_id, status)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS report_complaints (
+      grain TEXT NOT NULL,
+      bucket TEXT NOT NULL,
+      opened INTEGER NOT NULL DEFAULT 0,
+      resolved INTEGER NOT NULL DEFAULT 0,
+      resolution_seconds INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (grain, bucket)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS report_state (
+      source TEXT PRIMARY KEY,
+      done_id INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+    INSERT OR IGNORE INTO report_state (source, done_id) VALUES
+      ('invoices', CASE WHEN EXISTS (SELECT 1 FROM invoices) THEN 0 ELSE 9223372036854775807 END),
+      ('reservations', CASE WHEN EXISTS (SELECT 1 FROM reservations) THEN 0 ELSE 9223372036854775807 END),
+      ('complaints', CASE WHEN EXISTS (SELECT 1 FROM complaints) THEN 0 ELSE 9223372036854775807 END);
+    """ + "".join(_report_triggers(source) for source in REPORT_SOURCES),
+    # 7: şikayet başlığı / metni için FTS5 indeksi (external content: metin sadece
+    # complaints'te durur, indeks rowid = complaints.id). Trigger'lar senkron tutar;
+    # mevcut satırlar 'rebuild' ile indekslenir, ardından 'optimize' ile tek segmente
+    # birleştirilir (aksi halde sonraki her yazma küçük segmentleri birleştirmekle
+    # uğraşır). Başlık eşleşmeleri 4 kat ağırlıklı.
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS complaints_fts USING fts5(
+      title, text,
+      content = 'complaints', content_rowid = 'id',
+      tokenize = 'unicode61 remove_diacritics 2',
+      prefix = '2 3'
+    );
+    INSERT INTO complaints_fts (complaints_fts, rank) VALUES ('rank', 'bm25(4.0, 1.0)');
+    INSERT INTO complaints_fts (complaints_fts) VALUES ('rebuild');
+    INSERT INTO complaints_fts (complaints_fts) VALUES ('optimize');
+
+    CREATE TRIGGER IF NOT EXISTS trg_complaints_fts_ins AFTER INSERT ON complaints BEGIN
+      INSERT INTO complaints_fts (rowid, title, text) VALUES (NEW.id, NEW.title, NEW.text);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_complaints_fts_del AFTER DELETE ON complaints BEGIN
+      INSERT INTO complaints_fts (complaints_fts, rowid, title, text) VALUES ('delete', OLD.id, OLD.title, OLD.text);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_complaints_fts_upd AFTER UPDATE OF title, text ON complaints BEGIN
+      INSERT INTO complaints_fts (complaints_fts, rowid, title, text) VALUES ('delete', OLD.id, OLD.title, OLD.text);
+      INSERT INTO complaints_fts (rowid, title, text) VALUES (NEW.id, NEW.title, NEW.text);
+    END;
+    """,
+    # 8: job'u çalıştıran process; çöken bir process'in 'running' bıraktığı job'lar
+    # JobQueue.start()'ta tanınıp yeniden sıraya alınır
+    """
+    ALTER TABLE jobs ADD COLUMN worker_pid INTEGER;
+    """,
+]
+
+def migrate(db=None):
+    db = db or get_db()
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    for v, script in enumerate(MIGRATIONS[version:], version + 1):
+        # Her migration ve sürüm numarası tek transaction'da uygulanır
+        db.executescript(f"BEGIN; {script} PRAGMA user_version = {v}; COMMIT;")
+    return len(MIGRATIONS)
+
+
+# --- MONEY ---
+# Tutarlar DB'de tam sayı küçük birim (1/100) olarak tutulur; toplamlar tam sayı
+# üzerinde yapılır. API ve şablonlar ana birimle (12.5) çalışır, çeviri bu
+# fonksiyonlarla ve SQL'de "/ 100.0" ile sadece kenarda yapılır. Ölçek tüm para
+# birimleri için aynı; farklı para birimlerindeki tutarlar birbirine eklenmez.
+MINOR_UNITS = 100
+DEFAULT_CURRENCY = "TRY"
+
+class InvalidAmount(ValueError):
+    pass
+
+def to_minor(amount):
+    """12.34, "12.34" -> 1234. Kuruş altı yarım yukarı yuvarlanır; geçersizse InvalidAmount."""
+    try:
+        value = Decimal(str(amount).strip())
+    except (InvalidOperation, ValueError):
+        raise InvalidAmount(f"invalid amount: {amount!r}") from None
+    if not value.is_finite():
+        raise InvalidAmount(f"invalid amount: {amount!r}")
+    try:
+        minor = int((value * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:  # "1e30": quantize sonucu context hassasiyetini aşıyor
+        raise InvalidAmount(f"invalid amount: {amount!r}") from None
+    # SQLite INTEGER'a sığmalı; yoksa insert OverflowError ile 500 verir
+    if not -2**63 <= minor < 2**63:
+        raise InvalidAmount(f"invalid amount: {amount!r}")
+    return minor
+
+def from_minor(minor):
+    return (minor or 0) / MINOR_UNITS
+
+def normalize_currency(currency):
+    return (currency or DEFAULT_CURRENCY).strip().upper()
 
 
 # --- SERVICES CRUD ---
-def create_service(name, description, price, is_active=1):
-    db = get_db()
-    cur = db.execute(
-        "INSERT INTO services (name, description, price, is_active) VALUES (?, ?, ?, ?)",
-        (name, description, price, is_active),
+# price_minor API'ye price (ana birim) olarak çıkar
+SERVICE_COLUMNS = "id, name, description, price_minor / 100.0 AS price, is_active, capacity, slot_minutes"
+
+def create_service(name, description, price, is_active=1, capacity=0, slot_minutes=0):
+    service_id = execute_write(
+        """INSERT INTO services (name, description, price_minor, is_active, capacity, slot_minutes)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (name, description, to_minor(price), is_active, capacity, slot_minutes),
     )
-    db.commit()
-    return cur.lastrowid
+    invalidate_service_catalog()
+    return service_id
 
 def get_all_services(active_only=True):
     db = get_db()
     if active_only:
-        rows = db.execute("SELECT * FROM services WHERE is_active=1").fetchall()
+        rows = db.execute(f"SELECT {SERVICE_COLUMNS} FROM services WHERE is_active=1").fetchall()
     else:
-        rows = db.execute("SELECT * FROM services").fetchall()
+        rows = db.execute(f"SELECT {SERVICE_COLUMNS} FROM services").fetchall()
     return [dict(r) for r in rows]
 
 def get_service_by_id(service_id):
-    db = get_db()
-    row = db.execute("SELECT * FROM services WHERE id=?", (service_id,)).fetchone()
+    db = get_read_db()
+    row = db.execute(f"SELECT {SERVICE_COLUMNS} FROM services WHERE id=?", (service_id,)).fetchone()
     return dict(row) if row else None
 
-def update_service(service_id, name=None, description=None, price=None, is_active=None):
-    db = get_db()
+def update_service(service_id, name=None, description=None, price=None, is_active=None,
+                   capacity=None, slot_minutes=None):
     fields, values = [], []
     if name is not None:
         fields.append("name=?")
@@ -113,52 +939,154 @@ def update_service(service_id, name=None, description=None, price=None, is_activ
         fields.append("description=?")
         values.append(description)
     if price is not None:
-        fields.append("price=?")
-        values.append(price)
+        fields.append("price_minor=?")
+        values.append(to_minor(price))
     if is_active is not None:
         fields.append("is_active=?")
         values.append(is_active)
+    if capacity is not None:
+        fields.append("capacity=?")
+        values.append(capacity)
+    if slot_minutes is not None:
+        fields.append("slot_minutes=?")
+        values.append(slot_minutes)
     if not fields:
         return False
     values.append(service_id)
-    db.execute(f"UPDATE services SET {', '.join(fields)} WHERE id=?", values)
-    db.commit()
+    execute_write(f"UPDATE services SET {', '.join(fields)} WHERE id=?", values, fetch=None)
+    invalidate_service_catalog()
     return True
 
 def delete_service(service_id):
-    db = get_db()
-    db.execute("DELETE FROM services WHERE id=?", (service_id,))
-    db.commit()
+    execute_write("DELETE FROM services WHERE id=?", (service_id,), fetch=None)
+    invalidate_service_catalog()
     return True
 
+# --- SERVICE CATALOG CACHE ---
+# Katalog nadiren değişir; JSON gövdesi ve ETag'i bellekte tutulur. Servis yazan
+# her fonksiyon "catalog" sürüm damgasını yeniler (bkz. bump_stamp).
+_catalog_cache = {}
+_catalog_lock = threading.Lock()
+
+def invalidate_service_catalog():
+    bump_stamp("catalog")
+    _catalog_cache.clear()
+
+def get_service_catalog(active_only=True):
+    """(servis listesi, JSON bytes, ETag) döndürür; DB'ye sadece sürüm değişince gider."""
+    version = read_stamp("catalog")
+    entry = _catalog_cache.get(active_only)
+    if entry and entry[0] == version:
+        return entry[1:]
+    with _catalog_lock:
+        entry = _catalog_cache.get(active_only)
+        if entry and entry[0] == version:
+            return entry[1:]
+        services = get_all_services(active_only)
+        body = json.dumps(services, sort_keys=True).encode()
+        etag = hashlib.sha1(body).hexdigest()
+        _catalog_cache[active_only] = (version, services, body, etag)
+        return services, body, etag
+
 # --- RESERVATIONS CRUD ---
+# Bitiş saati verilmeyen rezervasyonlar bu kadar süre yer tutar (migration 3'teki trigger'larla aynı)
+DEFAULT_RESERVATION_MINUTES = 60
+
+class InvalidBooking(ValueError):
+    pass
+
+class BookingConflict(Exception):
+    pass
+
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise InvalidBooking(f"invalid time: {value!r}") from None
+
+def _epoch_minutes(dt):
+    # SQLite strftime('%s', ...) ile aynı: saat dilimi yoksa UTC kabul edilir
+    ts = dt.timestamp() if dt.tzinfo else calendar.timegm(dt.timetuple())
+    return int(ts) // 60
+
+def _peak_overlap(intervals, start, end):
+    """[start, end) içinde aynı anda açık olan [başlangıç, bitiş) aralıklarının en fazla sayısı."""
+    # Aynı dakikada biten (-1) başlayandan (+1) önce sayılır: [10:00, 11:00) ile [11:00, 12:00) çakışmaz
+    events = sorted([(max(lo, start), 1) for lo, _ in intervals] + [(min(hi, end), -1) for _, hi in intervals])
+    peak = current = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
 def create_reservation(user_id, service_id, start_time, end_time=None, note=None):
+    """Kapasite kontrolü, rezervasyon ve faturası tek BEGIN IMMEDIATE transaction'ında.
+
+    Servisin capacity'si > 0 ise istenen aralığın herhangi bir anında aynı
+    anda süren (iptal edilmemiş) rezervasyon sayısı kapasiteye ulaşmışsa
+    BookingConflict fırlatılır; aralıkla çakışan ama birbiriyle çakışmayan
+    rezervasyonlar aynı yeri paylaşır.
+    slot_minutes > 0 ise başlangıç slot sınırına denk gelmeli; bitiş
+    verilmezse bir slot sürer. Zamanlar "2025-09-07T10:00" biçiminde saklanır:
+    fromisoformat'ın kabul ettiği "20250907T1000", "2025-W36-7T10:00" gibi
+    biçimleri SQLite strftime okuyamaz ve slot trigger'ı satırı atlardı.
+    """
+    start_dt = _parse_time(start_time)
+    start = _epoch_minutes(start_dt)
+
     db = get_db()
-    cur = db.execute(
-        """INSERT INTO reservations (user_id, service_id, start_time, end_time, note)
-           VALUES (?, ?, ?, ?, ?)""",
-        (user_id, service_id, start_time, end_time, note),
-    )
-    db.commit()
-    res_id = cur.lastrowid
+    with db:
+        # Yazma kilidini baştan al: kontrol ile insert arasında başka booking giremez
+        db.execute("BEGIN IMMEDIATE")
+        service = db.execute(
+            "SELECT price_minor, capacity, slot_minutes, is_active FROM services WHERE id=?",
+            (service_id,),
+        ).fetchone()
+        if not service or not service["is_active"]:
+            raise InvalidBooking("service not available")
+
+        slot = service["slot_minutes"]
+        if slot and start % slot:
+            raise InvalidBooking(f"start_time must be on a {slot}-minute slot boundary")
+        start_time = start_dt.isoformat(timespec="minutes")
+        if end_time:
+            end_dt = _parse_time(end_time)
+            end = _epoch_minutes(end_dt)
+            end_time = end_dt.isoformat(timespec="minutes")
+        else:
+            end = start + (slot or DEFAULT_RESERVATION_MINUTES)
+            if slot:
+                end_time = (start_dt + timedelta(minutes=slot)).isoformat(timespec="minutes")
+        if end <= start:
+            raise InvalidBooking("end_time must be after start_time")
 
-    # Rezervasyondan sonra otomatik fatura oluştur
-    service = db.execute("SELECT price FROM services WHERE id=?", (service_id,)).fetchone()
-    if service:
+        if service["capacity"]:
+            overlapping = db.execute(
+                """SELECT start_min, end_min FROM reservation_slots
+                   WHERE service_lo <= ? AND service_hi >= ? AND start_min < ? AND end_min > ?""",
+                (service_id, service_id, end, start),
+            ).fetchall()
+            if _peak_overlap(overlapping, start, end) >= service["capacity"]:
+                raise BookingConflict("no capacity left for this time slot")
+
+        cur = db.execute(
+            """INSERT INTO reservations (user_id, service_id, start_time, end_time, note)
+               VALUES (?, ?, ?, ?, ?)""",
+            (user_id, service_id, start_time, end_time, note),
+        )
+        # Rezervasyonla birlikte fatura; ikisi ya birlikte yazılır ya hiç
         db.execute(
-            """INSERT INTO invoices (user_id, total_amount, currency, issued_at, paid, source)
-               VALUES (?, ?, ?, datetime('now'), 0, 'reservation')""",
-            (user_id, service["price"], "TRY")
+            """INSERT INTO invoices (user_id, amount_minor, currency, issued_at, paid, source, service_id)
+               VALUES (?, ?, ?, datetime('now'), 0, 'reservation', ?)""",
+            (user_id, service["price_minor"], DEFAULT_CURRENCY, service_id),
         )
-        db.commit()
-
-    return res_id
+    return cur.lastrowid
 
 def get_reservations_by_user(user_id):
-    db = get_db()
+    db = get_read_db()
     rows = db.execute(
         """SELECT r.id, r.start_time, r.end_time, r.status, r.note,
-                  s.name as service_name, s.price
+                  s.name as service_name, s.price_minor / 100.0 AS price
            FROM reservations r
            JOIN services s ON r.service_id = s.id
            WHERE r.user_id = ?
@@ -168,34 +1096,29 @@ def get_reservations_by_user(user_id):
     return [dict(r) for r in rows]
 
 def get_reservation_by_id(res_id):
-    db = get_db()
+    db = get_read_db()
     row = db.execute("SELECT * FROM reservations WHERE id=?", (res_id,)).fetchone()
     return dict(row) if row else None
 
 def update_reservation_status(res_id, status):
-    db = get_db()
-    db.execute("UPDATE reservations SET status=? WHERE id=?", (status, res_id))
-    db.commit()
-    return True
+    """Rezervasyon sahibinin user_id'sini döndürür (kayıt yoksa None)."""
+    row = execute_write("UPDATE reservations SET status=? WHERE id=? RETURNING user_id",
+                        (status, res_id), fetch="one")
+    return row["user_id"] if row else None
 
 def delete_reservation(res_id):
-    db = get_db()
-    db.execute("DELETE FROM reservations WHERE id=?", (res_id,))
-    db.commit()
+    execute_write("DELETE FROM reservations WHERE id=?", (res_id,), fetch=None)
     return True
 
 # --- COMPLAINTS CRUD ---
 def create_complaint(user_id, title, text):
-    db = get_db()
-    cur = db.execute(
+    return execute_write(
         "INSERT INTO complaints (user_id, title, text) VALUES (?, ?, ?)",
         (user_id, title, text)
     )
-    db.commit()
-    return cur.lastrowid
 
 def get_complaints_by_user(user_id):
-    db = get_db()
+    db = get_read_db()
     rows = db.execute(
         """SELECT id, title, text, status, created_at
            FROM complaints
@@ -206,7 +1129,7 @@ def get_complaints_by_user(user_id):
     return [dict(r) for r in rows]
 
 def get_complaint_by_id(complaint_id):
-    db = get_db()
+    db = get_read_db()
     row = db.execute(
         "SELECT * FROM complaints WHERE id = ?",
         (complaint_id,)
@@ -214,29 +1137,30 @@ def get_complaint_by_id(complaint_id):
     return dict(row) if row else None
 
 def update_complaint_status(complaint_id, status):
-    db = get_db()
-    db.execute(
-        "UPDATE complaints SET status = ? WHERE id = ?",
-        (status, complaint_id)
+    """Şikayet sahibinin user_id'sini döndürür (kayıt yoksa None).
+
+    resolved_at ilk 'resolved' geçişinde yazılır, tekrar açılınca silinir (raporlar)."""
+    row = execute_write(
+        """UPDATE complaints SET status = ?1,
+                  resolved_at = CASE WHEN ?1 = 'resolved' THEN COALESCE(resolved_at, datetime('now')) END
+           WHERE id = ?2 RETURNING user_id""",
+        (status, complaint_id), fetch="one"
     )
-    db.commit()
-    return True
+    return row["user_id"] if row else None
 
 # --- INVOICES CRUD ---
-def create_invoice(user_id, total_amount, issued_at, currency="TRY", paid=0, source="system"):
-    db = get_db()
-    cur = db.execute(
-        """INSERT INTO invoices (user_id, total_amount, currency, issued_at, paid, source)
+def create_invoice(user_id, total_amount, issued_at, currency=DEFAULT_CURRENCY, paid=0, source="system"):
+    """total_amount ana birimde (12.5); küçük birime çevrilip saklanır."""
+    return execute_write(
+        """INSERT INTO invoices (user_id, amount_minor, currency, issued_at, paid, source)
            VALUES (?, ?, ?, ?, ?, ?)""",
-        (user_id, total_amount, currency, issued_at, paid, source),
+        (user_id, to_minor(total_amount), normalize_currency(currency), issued_at, paid, source),
     )
-    db.commit()
-    return cur.lastrowid
 
 def get_invoices_by_user(user_id):
-    db = get_db()
+    db = get_read_db()
     rows = db.execute(
-        """SELECT id, total_amount, currency, issued_at, paid, source
+        """SELECT id, amount_minor / 100.0 AS total_amount, currency, issued_at, paid, source
            FROM invoices
            WHERE user_id = ?
            ORDER BY issued_at DESC""",
@@ -245,55 +1169,688 @@ def get_invoices_by_user(user_id):
     return [dict(r) for r in rows]
 
 def update_invoice_status(invoice_id, paid):
-    db = get_db()
-    db.execute("UPDATE invoices SET paid = ? WHERE id = ?", (paid, invoice_id))
-    db.commit()
-    return True
+    """Fatura sahibinin user_id'sini döndürür (kayıt yoksa None)."""
+    row = execute_write("UPDATE invoices SET paid = ? WHERE id = ? RETURNING user_id",
+                        (paid, invoice_id), fetch="one")
+    return row["user_id"] if row else None
 
-def import_invoices_from_csv(file_path, user_id=None):
-    import csv
+# CSV import: dosya sabit boyutlu parçalarla okunur, satırlar batch halinde
+# executemany ile yazılır; her batch kendi kısa transaction'ında commit edilir.
+IMPORT_CHUNK_SIZE = 64 * 1024
+IMPORT_BATCH_SIZE = 5000
+
+def _parse_invoice_row(row, user_id):
+    """CSV satırını INSERT parametrelerine çevirir; geçersizse ValueError."""
+    issued_at = (row.get("issued_at") or "").strip()
+    if not issued_at:
+        raise ValueError("issued_at required")
+    return (
+        user_id,  # her zaman login olan user_id kullanılacak
+        to_minor(row.get("total_amount") or 0),
+        normalize_currency(row.get("currency")),
+        issued_at,
+        int(row.get("paid") or 0),
+        "csv",
+    )
+
+def import_invoices_from_lines(lines, user_id=None, start_row=0,
+                               batch_size=IMPORT_BATCH_SIZE, progress=None, job_id=None):
+    """Satır iterable'ından (dosya, stream) faturaları batch batch içeri alır.
+
+    start_row: önceki bir import'un döndürdüğü checkpoint; o satıra kadar
+    olanlar atlanır. progress: her commit'ten sonra stats dict ile çağrılır.
+    job_id: verilirse checkpoint batch'le aynı transaction'da job'un payload'ına
+    (start_row) yazılır; arada çöken bir retry aynı batch'i ikinci kez eklemez.
+    """
     db = get_db()
-    with open(file_path, newline="", encoding="utf-8") as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            db.execute(
-                """INSERT INTO invoices (user_id, total_amount, currency, issued_at, paid, source)
-                   VALUES (?, ?, ?, ?, ?, ?)""",
-                (
-                    user_id,  # her zaman login olan user_id kullanılacak
-                    float(row.get("total_amount", 0)),
-                    row.get("currency", "TRY"),
-                    row.get("issued_at"),
-                    int(row.get("paid", 0)),
-                    "csv"
-                ),
-            )
-    db.commit()
-    return True
+    stats = {"imported": 0, "rejected": 0, "checkpoint": start_row, "rows_per_sec": 0.0}
+    started = time.perf_counter()
+    batch = []
+    line_no = 0
+
+    def flush():
+        if batch or job_id is not None:
+            with db:
+                db.executemany(
+                    """INSERT INTO invoices (user_id, amount_minor, currency, issued_at, paid, source)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    batch,
+                )
+                if job_id is not None:
+                    db.execute("UPDATE jobs SET payload=json_set(payload, '$.start_row', ?) WHERE id=?",
+                               (line_no, job_id))
+            stats["imported"] += len(batch)
+            batch.clear()
+        stats["checkpoint"] = line_no
+        elapsed = time.perf_counter() - started
+        if elapsed > 0:
+            stats["rows_per_sec"] = round((stats["imported"] + stats["rejected"]) / elapsed, 1)
+        if progress:
+            progress(dict(stats))
+
+    for line_no, row in enumerate(csv.DictReader(lines), 1):
+        if line_no <= start_row:
+            continue
+        try:
+            batch.append(_parse_invoice_row(row, user_id))
+        except (TypeError, ValueError):
+            stats["rejected"] += 1
+        if line_no - stats["checkpoint"] >= batch_size:
+            flush()
+    flush()
+    return stats
+
+def import_invoices_from_csv(file_path, user_id=None, start_row=0,
+                             batch_size=IMPORT_BATCH_SIZE, progress=None, job_id=None):
+    with open(file_path, newline="", encoding="utf-8-sig", buffering=IMPORT_CHUNK_SIZE) as csvfile:
+        return import_invoices_from_lines(csvfile, user_id, start_row, batch_size, progress, job_id)
+
+def import_invoices_from_stream(stream, user_id=None, start_row=0,
+                                batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Binary stream'i (ör. upload'ın FileStorage.stream'i) diske yazmadan içeri alır."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        return import_invoices_from_lines(text, user_id, start_row, batch_size, progress)
+    finally:
+        text.detach()  # stream'i kapatma, sahibi FileStorage
 
 def get_user_total_spent(user_id):
-    db = get_db()
+    db = get_read_db()
     row = db.execute(
-        """SELECT SUM(s.price) as total
+        """SELECT SUM(s.price_minor) as total
            FROM reservations r
            JOIN services s ON r.service_id = s.id
            WHERE r.user_id = ?""",
         (user_id,)
     ).fetchone()
-    return row["total"] if row and row["total"] else 0
+    return from_minor(row["total"]) if row else 0
 
-def get_user_total_from_invoices(user_id):
-    db = get_db()
+def get_user_total_from_invoices(user_id, currency=DEFAULT_CURRENCY):
+    db = get_read_db()
     row = db.execute(
-        """SELECT SUM(total_amount) as total
+        """SELECT SUM(amount_minor) as total
            FROM invoices
-           WHERE user_id = ?""",
-        (user_id,)
+           WHERE user_id = ? AND currency = ?""",
+        (user_id, normalize_currency(currency))
     ).fetchone()
-    return row["total"] if row and row["total"] else 0
+    return from_minor(row["total"]) if row else 0
 
-def is_admin(user_id):
+def get_user_invoice_totals(user_id):
+    """{para birimi: toplam (ana birim)}; para birimleri birbirine eklenmez."""
+    rows = get_read_db().execute(
+        """SELECT currency, SUM(amount_minor) AS total
+           FROM invoices WHERE user_id = ? GROUP BY currency""",
+        (user_id,),
+    ).fetchall()
+    return {r["currency"]: from_minor(r["total"]) for r in rows}
+
+# --- PAGINATION ---
+# Keyset (cursor) sayfalama: OFFSET yerine son satırın sıralama anahtarından devam
+# edilir, böylece sayfa maliyeti tablo büyüdükçe artmaz. Sıralamanın son
+# anahtarı benzersiz olmalı (id).
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        raise InvalidCursor("invalid cursor") from None
+    # Sadece SQLite'a bağlanabilen skaler değerler; [["a"], 1] gibi bir cursor 500 vermesin
+    if not isinstance(values, list) or not all(
+            v is None or isinstance(v, (str, float)) or isinstance(v, int) and -2**63 <= v < 2**63
+            for v in values):
+        raise InvalidCursor("invalid cursor")
+    return values
+
+def fetch_page(select, where, params, order, cursor=None, limit=None, desc=True):
+    """order: [(sql ifadesi, satırdaki anahtar), ...]. (satırlar, next_cursor) döndürür."""
+    where, params = list(where), list(params)
+    values = decode_cursor(cursor)
+    if values is not None:
+        if len(values) != len(order):
+            raise InvalidCursor("invalid cursor")
+        cols = ", ".join(expr for expr, _ in order)
+        marks = ", ".join("?" for _ in order)
+        where.append(f"({cols}) {'<' if desc else '>'} ({marks})")
+        params += values
+    limit = max(1, min(int(limit or PAGE_SIZE), MAX_PAGE_SIZE))
+    direction = "DESC" if desc else "ASC"
+    sql = select
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY " + ", ".join(f"{expr} {direction}" for expr, _ in order) + " LIMIT ?"
+    rows = [dict(r) for r in get_read_db().execute(sql, params + [limit + 1]).fetchall()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][key] for _, key in order])
+    return rows, next_cursor
+
+def _range_filters(column, date_from, date_to, where, params):
+    if date_from:
+        where.append(f"{column} >= ?")
+        params.append(date_from)
+    if date_to:
+        # Sadece tarih verildiyse o günün tamamı dahil
+        where.append(f"{column} < date(?, '+1 day')" if len(date_to) == 10 else f"{column} <= ?")
+        params.append(date_to)
+
+def get_users_page(cursor=None, limit=None, role=None, order_by="name"):
+    where, params = [], []
+    if role:
+        where.append("role = ?")
+        params.append(role)
+    order = [("name", "name"), ("id", "id")] if order_by == "name" else [("id", "id")]
+    return fetch_page(
+        "SELECT id, name, email, room_no, phone, role FROM users",
+        where, params, order, cursor, limit, desc=False,
+    )
+
+def get_reservations_page(user_id, cursor=None, limit=None, status=None, date_from=None, date_to=None):
+    where, params = ["r.user_id = ?"], [user_id]
+    if status:
+        where.append("r.status = ?")
+        params.append(status)
+    _range_filters("r.start_time", date_from, date_to, where, params)
+    return fetch_page(
+        """SELECT r.id, r.start_time, r.end_time, r.status, r.note, r.created_at,
+                  s.name as service_name, s.price_minor / 100.0 AS price
+           FROM reservations r
+           JOIN services s ON r.service_id = s.id""",
+        where, params, [("r.created_at", "created_at"), ("r.id", "id")], cursor, limit,
+    )
+
+def get_invoices_page(user_id, cursor=None, limit=None, paid=None, date_from=None, date_to=None):
+    where, params = ["user_id = ?"], [user_id]
+    if paid is not None:
+        where.append("paid = ?")
+        params.append(paid)
+    _range_filters("issued_at", date_from, date_to, where, params)
+    return fetch_page(
+        "SELECT id, amount_minor / 100.0 AS total_amount, currency, issued_at, paid, source FROM invoices",
+        where, params, [("issued_at", "issued_at"), ("id", "id")], cursor, limit,
+    )
+
+def get_complaints_page(user_id=None, cursor=None, limit=None, status=None, date_from=None, date_to=None):
+    """user_id verilmezse admin listesi (kullanıcı adıyla birlikte)."""
+    where, params = [], []
+    if user_id is not None:
+        where.append("c.user_id = ?")
+        params.append(user_id)
+    if status:
+        where.append("c.status = ?")
+        params.append(status)
+    _range_filters("c.created_at", date_from, date_to, where, params)
+    return fetch_page(
+        """SELECT c.id, u.name as user_name, c.title, c.text, c.status, c.created_at
+           FROM complaints c
+           JOIN users u ON c.user_id = u.id""",
+        where, params, [("c.created_at", "created_at"), ("c.id", "id")], cursor, limit,
+    )
+
+# --- COMPLAINT SEARCH ---
+# complaints_fts (migration 7) üzerinde sıralı arama. Kullanıcı girdisi FTS5
+# sorgu sözdizimine doğrudan verilmez: kelimeler ayrı ayrı tırnaklanır ve hepsi
+# eşleşmeli (AND); sonunda * olan kelime önek olarak aranır ("wif*").
+# Sonuçlar bm25 skoruna (rank, küçük = daha iyi) ve id'ye göre keyset sayfalanır.
+SEARCH_MAX_TERMS = 8
+SNIPPET_TOKENS = 16
+_MARK_OPEN, _MARK_CLOSE = "\x02", "\x03"
+
+class InvalidSearch(ValueError):
+    pass
+
+def fts_query(text):
+    terms = re.findall(r"(\w+)(\*?)", text or "")
+    if not terms:
+        raise InvalidSearch("search query must contain at least one word")
+    if len(terms) > SEARCH_MAX_TERMS:
+        raise InvalidSearch(f"search query is limited to {SEARCH_MAX_TERMS} words")
+    return " ".join(f'"{word}"{star}' for word, star in terms)
+
+def _marked_html(text):
+    # highlight()/snippet() işaretleri dışında her şey escape edilir
+    return (html.escape(text or "", quote=False)
+            .replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>"))
+
+def search_complaints(query, cursor=None, limit=None, status=None, date_from=None, date_to=None):
+    """Admin şikayet araması. title_html / snippet_html eşleşmeleri <mark> ile işaretli, güvenli HTML."""
+    where, params = ["complaints_fts MATCH ?"], [fts_query(query)]
+    if status:
+        where.append("c.status = ?")
+        params.append(status)
+    _range_filters("c.created_at", date_from, date_to, where, params)
+    rows, next_cursor = fetch_page(
+        f"""SELECT c.id, u.name as user_name, c.title, c.status, c.created_at, complaints_fts.rank AS rank,
+                  highlight(complaints_fts, 0, '{_MARK_OPEN}', '{_MARK_CLOSE}') AS title_html,
+                  snippet(complaints_fts, 1, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet_html
+           FROM complaints_fts
+           JOIN complaints c ON c.id = complaints_fts.rowid
+           JOIN users u ON c.user_id = u.id""",
+        where, params, [("complaints_fts.rank", "rank"), ("c.id", "id")], cursor, limit, desc=False,
+    )
+    for row in rows:
+        row["title_html"] = _marked_html(row["title_html"])
+        row["snippet_html"] = _marked_html(row["snippet_html"])
+    return rows, next_cursor
+
+# --- GUEST BOOTSTRAP ---
+# Misafir sayfalarının ilk yüklemede ihtiyaç duyduğu listelerin ilk sayfası (ve
+# fatura toplamı) tek SQL ifadesiyle. Satırlar /reservations, /invoices ve
+# /complaints ile aynı biçimde; devam sayfaları için next_cursor o endpoint'lerin
+# cursor'ıyla uyumlu. Bölümler ?1 (user_id) ve ?2 (limit) parametrelerini paylaşır.
+# Fatura toplamları sayfadaki satırlardan değil, kullanıcının tüm faturaları
+# üzerinde para birimine göre GROUP BY yapan ayrı bir alt sorgudan gelir (aynı
+# ifade içinde, kullanıcının index aralığında ikinci bir geçiş).
+BOOTSTRAP_SECTIONS = {
+    "reservations": (
+        """SELECT json_object('rows', json_group_array(json_object(
+                    'id', id, 'start_time', start_time, 'end_time', end_time, 'status', status,
+                    'note', note, 'created_at', created_at, 'service_name', service_name,
+                    'price', price_minor / 100.0)))
+           FROM (SELECT r.id, r.start_time, r.end_time, r.status, r.note, r.created_at,
+                        s.name AS service_name, s.price_minor
+                 FROM reservations r JOIN services s ON r.service_id = s.id
+                 WHERE r.user_id = ?1 ORDER BY r.created_at DESC, r.id DESC LIMIT ?2)""",
+        ("created_at", "id"),
+    ),
+    "invoices": (
+        """SELECT json_object('rows', json_group_array(json_object(
+                    'id', id, 'total_amount', amount_minor / 100.0, 'currency', currency,
+                    'issued_at', issued_at, 'paid', paid, 'source', source)),
+                  'totals', (SELECT json_group_object(currency, total / 100.0)
+                             FROM (SELECT currency, SUM(amount_minor) AS total FROM invoices
+                                   WHERE user_id = ?1 GROUP BY currency)))
+           FROM (SELECT id, amount_minor, currency, issued_at, paid, source
+                 FROM invoices
+                 WHERE user_id = ?1 ORDER BY issued_at DESC, id DESC LIMIT ?2)""",
+        ("issued_at", "id"),
+    ),
+    "complaints": (
+        """SELECT json_object('rows', json_group_array(json_object(
+                    'id', id, 'user_name', user_name, 'title', title, 'text', text,
+                    'status', status, 'created_at', created_at)))
+           FROM (SELECT c.id, u.name AS user_name, c.title, c.text, c.status, c.created_at
+                 FROM complaints c JOIN users u ON c.user_id = u.id
+                 WHERE c.user_id = ?1 ORDER BY c.created_at DESC, c.id DESC LIMIT ?2)""",
+        ("created_at", "id"),
+    ),
+}
+
+def get_guest_bootstrap(user_id, sections=BOOTSTRAP_SECTIONS, limit=None):
+    """{bölüm: {"items": [...], "next_cursor": ...}} döndürür; invoices bölümünde
+    ayrıca totals (para birimi başına tüm faturaların toplamı) ve total_spent
+    (DEFAULT_CURRENCY toplamı) bulunur."""
+    sections = [name for name in BOOTSTRAP_SECTIONS if name in sections]
+    if not sections:
+        return {}
+    limit = max(1, min(int(limit or PAGE_SIZE), MAX_PAGE_SIZE))
+    sql = "SELECT " + ", ".join(f"({BOOTSTRAP_SECTIONS[name][0]}) AS {name}" for name in sections)
+    row = get_read_db().execute(sql, (user_id, limit + 1)).fetchone()
+    result = {}
+    for name in sections:
+        data = json.loads(row[name])
+        rows, next_cursor = data["rows"], None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][key] for key in BOOTSTRAP_SECTIONS[name][1]])
+        result[name] = {"items": rows, "next_cursor": next_cursor}
+        if "totals" in data:
+            result[name]["totals"] = data["totals"]
+            result[name]["total_spent"] = data["totals"].get(DEFAULT_CURRENCY, 0)
+    return result
+
+# --- EXPORTS ---
+# Admin export'ları: satırlar sonuç kümesi belleğe alınmadan, cursor'dan
+# fetchmany ile parça parça okunur. Sütun adı "ifade AS ad" biçiminde verilebilir.
+EXPORTS = {
+    "invoices": ("invoices", "id, user_id, amount_minor / 100.0 AS total_amount, currency, issued_at, paid, source",
+                 "issued_at"),
+    "reservations": ("reservations", "id, user_id, service_id, start_time, end_time, status, note, created_at", "created_at"),
+    "complaints": ("complaints", "id, user_id, title, text, status, created_at", "created_at"),
+}
+EXPORT_BATCH_SIZE = 2000
+
+def export_columns(kind):
+    return [c.strip().split(" AS ")[-1] for c in EXPORTS[kind][1].split(",")]
+
+def iter_export_rows(kind, date_from=None, date_to=None, batch_size=EXPORT_BATCH_SIZE):
+    """Tuple batch'leri üreten generator; kendi bağlantısını havuzdan alır.
+
+    Response gövdesi view döndükten sonra üretildiği için request'in g.db
+    bağlantısı yerine ayrı bağlantı kullanılır ve iş bitince havuza döner.
+    """
+    table, columns, date_column = EXPORTS[kind]
+    where, params = [], []
+    _range_filters(date_column, date_from, date_to, where, params)
+    sql = f"SELECT {columns} FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id"
+    return _iter_batches(sql, params, batch_size)
+
+def _iter_batches(sql, params, batch_size):
+    pool = _read_pool()
+    conn = pool.acquire()
+    try:
+        cur = conn.execute(sql, params)
+        cur.row_factory = None  # sqlite3.Row yerine düz tuple, daha ucuz
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        pool.release(conn)
+
+# --- REVENUE ROLLUPS ---
+# (kullanıcı, para birimi, gün) başına fatura adedi ve küçük birim toplamı tek
+# GROUP BY geçişinde. idx_invoices_day (date(issued_at), user_id, currency, ...)
+# hem pencereyi hem grup sırasını karşılar (covering); sıralama yapılmaz,
+# gruplar index sırasıyla akar. Pencere gün bazındadır; tarihi
+# çözülemeyen faturalar (date() NULL) rollup'a girmez.
+REVENUE_GROUPS_SQL = """SELECT user_id, currency, date(issued_at) AS day, COUNT(*), SUM(amount_minor)
+                        FROM invoices
+                        WHERE date(issued_at) BETWEEN date(?) AND date(?)
+                        GROUP BY date(issued_at), user_id, currency"""
+
+def iter_revenue_groups(date_from=None, date_to=None, batch_size=EXPORT_BATCH_SIZE):
+    """(user_id, currency, day, adet, amount_minor) tuple batch'leri üreten generator."""
+    return _iter_batches(REVENUE_GROUPS_SQL, (date_from or "0001-01-01", date_to or "9999-12-31"),
+                         batch_size)
+
+# --- REPORTS ---
+# Rollup tabloları migration 6'daki trigger'larla her yazmada güncellenir;
+# raporlar ham tabloları değil bu tabloları okur (PK aralığı taraması). Hafta ve
+# ay raporları günlük kovalardan türetilir.
+REPORT_LIVE = 2 ** 63 - 1  # report_state.done_id: backfill bitti, trigger'lar her satırı işler
+REPORT_BACKFILL_BATCH = int(os.environ.get("REPORT_BACKFILL_BATCH", 50000))
+REPORT_PERIODS = {"week": "%Y-W%W", "month": "%Y-%m"}
+REPORT_MAX_ROWS = 10000
+REPORTS = {
+    # rapor: (rollup tablosu, anahtarlar, değerler)
+    "revenue": ("report_revenue", ("service_id", "currency"), ("invoices", "amount_minor")),
+    "reservations": ("report_reservations", ("service_id", "status"), ("reservations", "minutes")),
+    "complaints": ("report_complaints", (), ("opened", "resolved", "resolution_seconds")),
+}
+_backfill_sql = {
+    source: [_report_upsert(f, grain) for f in REPORT_FACTS if f[1] == source for grain in REPORT_GRAINS]
+    for source in REPORT_SOURCES
+}
+
+def reset_reports():
+    """Rollup'ları boşaltır; backfill_reports baştan doldurur (ör. tanım değişince)."""
     db = get_db()
-    row = db.execute("SELECT role FROM users WHERE id=?", (user_id,)).fetchone()
-    return row and row["role"] == "admin"
+    with db:
+        db.execute("BEGIN IMMEDIATE")
+        for table in sorted({f[0] for f in REPORT_FACTS}):
+            db.execute(f"DELETE FROM {table}")
+        db.execute("UPDATE report_state SET done_id = 0")
+
+def backfill_reports(batch_size=REPORT_BACKFILL_BATCH, progress=None):
+    """Mevcut satırları id aralıkları halinde rollup'lara işler, kaldığı yerden devam eder.
+
+    Her aralık kendi kısa BEGIN IMMEDIATE transaction'ında işlenir ve done_id
+    ilerletilir. Trigger'lar sadece id <= done_id satırlarını işlediğinden
+    backfill sürerken gelen yazmalar çift sayılmaz ya da kaybolmaz. Tablonun
+    sonuna gelindiğinde done_id REPORT_LIVE olur. progress: her batch'ten sonra
+    {kaynak: done_id} ile çağrılır.
+    """
+    db = get_db()
+    state = {}
+    for source in REPORT_SOURCES:
+        while True:
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                start = db.execute("SELECT done_id FROM report_state WHERE source = ?", (source,)).fetchone()[0]
+                if start < REPORT_LIVE:
+                    end = start + batch_size
+                    for sql in _backfill_sql[source]:
+                        db.execute(sql, (start, end))
+                    last = db.execute(f"SELECT MAX(id) FROM {source}").fetchone()[0] or 0
+                    start = REPORT_LIVE if end >= last else end
+                    db.execute("UPDATE report_state SET done_id = ? WHERE source = ?", (start, source))
+            state[source] = start
+            if progress:
+                progress(dict(state))
+            if start == REPORT_LIVE:
+                break
+    return get_report_status()
+
+def get_report_status():
+    """{kaynak: {"live": bool, "done_id": ...}}; live değilse raporlar eksiktir."""
+    rows = get_db().execute("SELECT source, done_id FROM report_state").fetchall()
+    return {r["source"]: {"live": r["done_id"] == REPORT_LIVE,
+                          "done_id": None if r["done_id"] == REPORT_LIVE else r["done_id"]} for r in rows}
+
+def get_report(kind, grain="day", date_from=None, date_to=None, service_id=None):
+    """Rapor satırları ve kesilip kesilmediği. grain: hour, day, week, month;
+    date_from / date_to kova başlangıcına göre (sadece tarih verilirse gün dahil)."""
+    table, keys, values = REPORTS[kind]
+    bucket = "bucket" if grain in REPORT_GRAINS else f"strftime('{REPORT_PERIODS[grain]}', bucket)"
+    where, params = ["grain = ?"], ["hour" if grain == "hour" else "day"]
+    _range_filters("bucket", date_from, date_to, where, params)
+    if service_id is not None and "service_id" in keys:
+        where.append("service_id = ?")
+        params.append(service_id)
+    groups = ", ".join(("1", *keys))
+    sql = (f"SELECT {bucket} AS bucket, {''.join(k + ', ' for k in keys)}"
+           f"{', '.join(f'SUM({v}) AS {v}' for v in values)} FROM {table} "
+           f"WHERE {' AND '.join(where)} GROUP BY {groups} ORDER BY {groups} LIMIT ?")
+    rows = [dict(r) for r in get_read_db().execute(sql, params + [REPORT_MAX_ROWS + 1]).fetchall()]
+    truncated = len(rows) > REPORT_MAX_ROWS
+    return _shape_report(kind, grain, rows[:REPORT_MAX_ROWS]), truncated
+
+def _bucket_minutes(grain, bucket):
+    if grain == "month":
+        year, month = map(int, bucket.split("-"))
+        return calendar.monthrange(year, month)[1] * 1440
+    return {"hour": 60, "day": 1440, "week": 7 * 1440}[grain]
+
+def _shape_report(kind, grain, rows):
+    # Küçük birim -> ana birim, servis adı (katalog cache'inden), ortalama çözülme
+    # süresi, kapasiteli servislerde doluluk oranı
+    if kind == "complaints":
+        for r in rows:
+            seconds = r.pop("resolution_seconds")
+            r["avg_resolution_hours"] = round(seconds / r["resolved"] / 3600, 2) if r["resolved"] else None
+        return rows
+    services = {s["id"]: s for s in get_service_catalog(active_only=False)[0]}
+    for r in rows:
+        service = services.get(r["service_id"], {})
+        r["service_name"] = service.get("name")
+        if kind == "revenue":
+            r["amount"] = from_minor(r.pop("amount_minor"))
+        elif service.get("capacity") and r["status"] != "cancelled":
+            r["occupancy"] = round(r["minutes"] / (service["capacity"] * _bucket_minutes(grain, r["bucket"])), 4)
+        else:
+            r["occupancy"] = None
+    return rows
+
+# --- DASHBOARD STATS ---
+STATS_QUERIES = {
+    "total_users": "SELECT COUNT(*) FROM users",
+    "total_reservations": "SELECT COUNT(*) FROM reservations",
+    "open_complaints": "SELECT COUNT(*) FROM complaints WHERE status='open'",
+}
+# Para birimi başına gelir sayaçları ('income:TRY' -> küçük birim toplam, migration 5)
+INCOME_STATS_QUERY = "SELECT 'income:' || currency, SUM(amount_minor) FROM invoices GROUP BY currency"
+
+def get_dashboard_stats():
+    """Sayaçlar; gelir "income" altında {para birimi: ana birim tutar} olarak döner."""
+    db = get_read_db()
+    rows = db.execute("SELECT name, value FROM stats").fetchall()
+    stats = {"income": {}}
+    for r in rows:
+        if r["name"].startswith("income:"):
+            if r["value"]:
+                stats["income"][r["name"][len("income:"):]] = from_minor(r["value"])
+        else:
+            stats[r["name"]] = r["value"]
+    return stats
+
+def get_data_versions():
+    """{tablo adı: sürüm}; fragment cache anahtarları için (migration 4)."""
+    rows = get_read_db().execute("SELECT name, version FROM data_versions").fetchall()
+    return {r["name"]: r["version"] for r in rows}
+
+def reconcile_stats():
+    """Sayaçları gerçek aggregate'lerle karşılaştırır, sapma varsa düzeltir ve raporlar."""
+    db = get_db()
+    drift = {}
+    with db:
+        db.execute("BEGIN IMMEDIATE")  # sayım sırasında yazma araya girmesin
+        stored = {r["name"]: r["value"] for r in db.execute("SELECT name, value FROM stats")}
+        actuals = {name: db.execute(sql).fetchone()[0] for name, sql in STATS_QUERIES.items()}
+        # Faturası kalmamış para birimlerinin sayacı 0 olmalı
+        actuals.update((name, 0) for name in stored if name.startswith("income:"))
+        actuals.update(tuple(r) for r in db.execute(INCOME_STATS_QUERY))
+        for name, actual in actuals.items():
+            if (stored.get(name) or 0) != actual:
+                drift[name] = {"stored": stored.get(name), "actual": actual}
+                db.execute("INSERT OR REPLACE INTO stats (name, value) VALUES (?, ?)", (name, actual))
+    return drift
+
+# --- JOBS ---
+def create_job(name, payload, user_id=None):
+    return execute_write(
+        "INSERT INTO jobs (name, user_id, payload) VALUES (?, ?, ?)",
+        (name, user_id, json.dumps(payload)),
+    )
+
+def get_job(job_id):
+    db = get_db()
+    row = db.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+    if not row:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+def claim_job(job_id):
+    # Aynı job'u iki worker'ın birden çalıştırmaması için koşullu UPDATE
+    updated = execute_write(
+        """UPDATE jobs SET status='running', attempts=attempts+1, started_at=datetime('now'), worker_pid=?
+           WHERE id=? AND status IN ('queued', 'retrying')""",
+        (os.getpid(), job_id), fetch="rowcount",
+    )
+    return updated == 1
+
+def update_job_payload(job_id, payload):
+    execute_write("UPDATE jobs SET payload=? WHERE id=?", (json.dumps(payload), job_id), fetch=None)
+
+def finish_job(job_id, status, result=None, error=None):
+    execute_write(
+        """UPDATE jobs SET status=?, result=?, error=?,
+                  finished_at=CASE WHEN ? IN ('done', 'failed') THEN datetime('now') END
+           WHERE id=?""",
+        (status, json.dumps(result) if result is not None else None, error, status, job_id),
+        fetch=None,
+    )
+
+def get_queued_job_ids():
+    db = get_db()
+    rows = db.execute(
+        "SELECT id FROM jobs WHERE status IN ('queued', 'retrying') ORDER BY id"
+    ).fetchall()
+    return [r["id"] for r in rows]
+
+def get_running_jobs():
+    return get_db().execute("SELECT id, worker_pid, attempts FROM jobs WHERE status='running'").fetchall()
+
+def release_job(job_id, worker_pid, status, error):
+    # Sadece hâlâ aynı process'in elindeyse; bu arada başka worker yeniden aldıysa dokunulmaz
+    return execute_write(
+        """UPDATE jobs SET status=?, error=?, finished_at=CASE WHEN ?='failed' THEN datetime('now') END
+           WHERE id=? AND status='running' AND worker_pid IS ?""",
+        (status, error, status, job_id, worker_pid), fetch="rowcount",
+    ) == 1
+
+def prune_jobs(days):
+    """Bitmiş (done/failed) ve `days` günden eski job satırlarını siler; silinen sayısı."""
+    return execute_write(
+        "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < datetime('now', ?)",
+        (f"-{days} days",), fetch="rowcount",
+    )
+
+# --- IDENTITY CACHE ---
+# Oturumdaki kullanıcının id/ad/email/rolü process içinde tutulur; her admin
+# endpoint'inde tekrar SELECT role yapılmaz. Rol değişiklikleri set_user_role
+# üzerinden yapılmalı ki "identity" damgası yenilensin; DB'ye elle yapılan
+# değişiklikler en geç IDENTITY_TTL saniye sonra görülür.
+_identity_cache = {}
+IDENTITY_CACHE_SIZE = 10000
+IDENTITY_TTL = 60
+
+def prime_identity(user, stamp=None):
+    if len(_identity_cache) >= IDENTITY_CACHE_SIZE:
+        _identity_cache.clear()
+    ident = {"id": user["id"], "name": user["name"], "email": user["email"], "role": user["role"]}
+    _identity_cache[ident["id"]] = (stamp or read_stamp("identity"), time.monotonic(), ident)
+    return ident
+
+def get_identity(user_id):
+    stamp = read_stamp("identity")
+    hit = _identity_cache.get(user_id)
+    if hit and hit[0] == stamp and time.monotonic() - hit[1] < IDENTITY_TTL:
+        return hit[2]
+    db = get_db()
+    row = db.execute("SELECT id, name, email, role FROM users WHERE id=?", (user_id,)).fetchone()
+    return prime_identity(row, stamp) if row else None
+
+def update_password_hash(user_id, pw_hash):
+    execute_write("UPDATE users SET password_hash=? WHERE id=?", (pw_hash, user_id), fetch=None)
+    return True
+
+def set_user_role(user_id, role):
+    execute_write("UPDATE users SET role=? WHERE id=?", (role, user_id), fetch=None)
+    bump_stamp("identity")
+    _identity_cache.clear()
+    return True
+
+def is_admin(user_id):
+    ident = get_identity(user_id)
+    return ident is not None and ident["role"] == "admin"
+
+def get_user_detail(user_id):
+    """Admin kullanıcı detay sayfası için kullanıcı + rezervasyon/fatura/şikayetler tek sorguda."""
+    db = get_read_db()
+    row = db.execute(
+        """SELECT u.id, u.name, u.email,
+             (SELECT json_group_array(json_object(
+                       'id', id, 'service_name', service_name, 'start_time', start_time,
+                       'end_time', end_time, 'status', status))
+              FROM (SELECT r.id, s.name AS service_name, r.start_time, r.end_time, r.status
+                    FROM reservations r JOIN services s ON r.service_id = s.id
+                    WHERE r.user_id = u.id ORDER BY r.created_at DESC)) AS reservations,
+             (SELECT json_group_array(json_object(
+                       'id', id, 'total_amount', amount_minor / 100.0, 'currency', currency,
+                       'issued_at', issued_at, 'paid', paid, 'source', source))
+              FROM (SELECT id, amount_minor, currency, issued_at, paid, source
+                    FROM invoices WHERE user_id = u.id ORDER BY issued_at DESC)) AS invoices,
+             (SELECT json_group_array(json_object(
+                       'id', id, 'title', title, 'text', text, 'status', status,
+                       'created_at', created_at))
+              FROM (SELECT id, title, text, status, created_at
+                    FROM complaints WHERE user_id = u.id ORDER BY created_at DESC)) AS complaints
+           FROM users u WHERE u.id = ?""",
+        (user_id,),
+    ).fetchone()
+    if not row:
+        return None
+    detail = {"user": {"id": row["id"], "name": row["name"], "email": row["email"]}}
+    for key in ("reservations", "invoices", "complaints"):
+        detail[key] = json.loads(row[key])
+    return detail
 
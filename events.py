@@ -0,0 +1,226 @@
+import asyncio, itertools, json, os, socket, threading
+from collections import deque
+
+# Kullanıcıya özel durum değişikliği bildirimleri (şikayet / rezervasyon / fatura).
+# Admin route'ları publish eder, /events (SSE) açık bağlantılara iletir.
+#
+# Pub/sub process içidir: her abonenin sabit boyutlu bir tamponu var; dolarsa en
+# eski olay atılır ve istemciye "resync" gönderilir (listeyi yeniden yüklesin).
+# Toplam ve kullanıcı başına bağlantı sayısı sınırlıdır; boştaki bir abone
+# periyodik heartbeat dışında iş yapmaz. WSGI'da (stream) akış boyunca bir
+# request thread'i Condition'da bekler; asgi.py'de (astream) abone sadece event
+# loop'ta bekleyen bir coroutine'dir, binlerce boştaki bağlantı thread tutmaz.
+#
+# Birden çok worker process'inde (gunicorn.conf.py) admin'in isteği ile
+# kullanıcının SSE bağlantısı farklı process'lere düşebilir. start_relay(dizin)
+# ile her process dizinde <pid>.sock adlı bir unix datagram soketi açar;
+# publish olayı diğer soketlere de gönderir, alıcı thread yerel abonelere
+# iletir. Alıcının tamponu doluysa olay atılır (relay_dropped).
+
+HEARTBEAT_SECONDS = 15.0
+RETRY_MS = 5000
+RELAY_MAX_BYTES = 64 * 1024
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, bus, user_id, buffer_size):
+        self.bus = bus
+        self.user_id = user_id
+        self.events = deque(maxlen=buffer_size)
+        self.dropped = False
+        self.closed = False
+        self.cond = threading.Condition()
+        self.notify = None  # astream: olay gelince event loop'u uyandırır (herhangi bir thread'den)
+
+    def push(self, event):
+        with self.cond:
+            if len(self.events) == self.events.maxlen:
+                self.dropped = True
+            self.events.append(event)
+            self.cond.notify()
+        self._wake()
+
+    def _wake(self):
+        if self.notify is not None:
+            try:
+                self.notify()
+            except RuntimeError:
+                pass  # event loop kapanmış (shutdown)
+
+    def wait(self, timeout):
+        """Bekleyen olayları (ve tampon taştıysa dropped=True) döndürür; timeout'ta boş liste."""
+        with self.cond:
+            if not self.events and not self.closed:
+                self.cond.wait(timeout)
+            events, dropped = list(self.events), self.dropped
+            self.events.clear()
+            self.dropped = False
+            return events, dropped
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self._wake()
+        self.bus.unsubscribe(self)
+
+
+def sse_chunk(events, dropped):
+    """Subscription.wait sonucunu SSE metnine çevirir; olay yoksa heartbeat yorumu."""
+    parts = ["event: resync\ndata: {}\n\n"] if dropped else []
+    parts += [f"id: {event_id}\nevent: {kind}\ndata: {data}\n\n" for event_id, kind, data in events]
+    return "".join(parts) or ": ping\n\n"
+
+
+class EventBus:
+    def __init__(self, max_subscribers=1000, max_per_user=5, buffer_size=32):
+        self.max_subscribers = max_subscribers
+        self.max_per_user = max_per_user
+        self.buffer_size = buffer_size
+        self._subs = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._counts = {"published": 0, "delivered": 0, "rejected": 0, "relayed": 0, "relay_dropped": 0}
+        self._relay = None
+
+    def init_app(self, app):
+        app.extensions["events"] = self
+
+    def subscribe(self, user_id):
+        with self._lock:
+            # Giriş sadece abonelik kabul edilince açılır; reddedilenler boş kayıt bırakmasın
+            if self._count >= self.max_subscribers or len(self._subs.get(user_id, ())) >= self.max_per_user:
+                self._counts["rejected"] += 1
+                raise TooManySubscribers()
+            sub = Subscription(self, user_id, self.buffer_size)
+            self._subs.setdefault(user_id, set()).add(sub)
+            self._count += 1
+            return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subs.get(sub.user_id)
+            if subs and sub in subs:
+                subs.discard(sub)
+                self._count -= 1
+                if not subs:
+                    del self._subs[sub.user_id]
+
+    def publish(self, user_id, kind, **data):
+        data = json.dumps(data)
+        with self._lock:
+            self._counts["published"] += 1
+        if self._relay is not None:
+            self._forward(user_id, kind, data)
+        return self._deliver(user_id, kind, data)
+
+    def _deliver(self, user_id, kind, data):
+        with self._lock:
+            subs = list(self._subs.get(user_id, ()))
+            self._counts["delivered"] += len(subs)
+        if not subs:
+            return 0
+        event = (next(self._ids), kind, data)
+        for sub in subs:
+            sub.push(event)
+        return len(subs)
+
+    # --- Process'ler arası relay ---
+    def start_relay(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.sock")
+        if os.path.exists(path):
+            os.unlink(path)  # aynı pid'li eski bir process'ten kalmış
+        inbox = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        inbox.bind(path)
+        outbox = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        outbox.setblocking(False)  # yavaş bir worker publish eden request'i bekletmesin
+        self._relay = (directory, path, outbox)
+        threading.Thread(target=self._receive, args=(inbox,), name="events-relay", daemon=True).start()
+
+    def _forward(self, user_id, kind, data):
+        directory, own, outbox = self._relay
+        message = json.dumps([user_id, kind, data]).encode()
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if path == own or not name.endswith(".sock"):
+                continue
+            try:
+                outbox.sendto(message, path)
+                relayed = "relayed"
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker kapanmış (SIGKILL vb.); soket dosyası temizlenir
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            except OSError:
+                relayed = "relay_dropped"  # alıcı tamponu dolu ya da mesaj fazla büyük
+            with self._lock:
+                self._counts[relayed] += 1
+
+    def _receive(self, inbox):
+        while True:
+            try:
+                message = inbox.recv(RELAY_MAX_BYTES)
+            except OSError:
+                return
+            try:
+                user_id, kind, data = json.loads(message)
+            except ValueError:
+                continue
+            self._deliver(user_id, kind, data)
+
+    def close_all(self):
+        """Graceful shutdown: açık akışlar biter, istemci retry ile başka bir worker'a bağlanır."""
+        with self._lock:
+            subs = [sub for user_subs in self._subs.values() for sub in user_subs]
+        for sub in subs:
+            sub.close()
+        if self._relay is not None:
+            try:
+                os.unlink(self._relay[1])
+            except FileNotFoundError:
+                pass
+            self._relay = None
+        return len(subs)
+
+    def stream(self, sub, heartbeat=HEARTBEAT_SECONDS):
+        """SSE gövdesi; istemci koptuğunda (GeneratorExit) abonelik kapanır."""
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while not sub.closed:
+                yield sse_chunk(*sub.wait(heartbeat))
+        finally:
+            sub.close()
+
+    async def astream(self, sub, heartbeat=HEARTBEAT_SECONDS):
+        """stream()'in asyncio sürümü (asgi.py); bekleme thread değil event loop'ta."""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        sub.notify = lambda: loop.call_soon_threadsafe(ready.set)
+        ready.set()  # notify bağlanmadan önce gelmiş olaylar
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while not sub.closed:
+                try:
+                    await asyncio.wait_for(ready.wait(), heartbeat)
+                    timed_out = False
+                except asyncio.TimeoutError:
+                    timed_out = True
+                ready.clear()
+                events, dropped = sub.wait(0)
+                if events or dropped or timed_out:  # boşuna uyanma (close vb.) ping göndermez
+                    yield sse_chunk(events, dropped)
+        finally:
+            sub.close()
+
+    def metrics(self):
+        with self._lock:
+            return {"subscribers": self._count, "users": len(self._subs), **self._counts}
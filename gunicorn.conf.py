@@ -0,0 +1,100 @@
+"""Production sunucu ayarları (gunicorn, pre-fork, gthread worker'ları).
+
+    pip install -r requirements.txt
+    gunicorn -c gunicorn.conf.py app:app
+
+Master app'i bir kez import eder (preload_app), şablonları derler ve servis
+kataloğunu ısıtır (app.warm_up), sonra worker'ları fork'lar; kod ve cache'ler
+copy-on-write ile paylaşılır. Her worker ilk request'ten önce kendi DB
+havuzunu doldurur, job kuyruğunu ve SSE relay'ini başlatır.
+
+Sinyaller (master'a):
+  TERM     graceful kapanış: worker'lar yeni bağlantı almaz, açık request'ler
+           WEB_GRACEFUL_TIMEOUT'a kadar tamamlanır; SSE akışları hemen kapatılır
+  HUP      worker'ları yeniden başlatır (graceful). preload_app nedeniyle kod
+           yeniden yüklenmez; kod güncellemesi için USR2 (yeni master başlar),
+           yeni worker'lar hazır olunca eski master'a TERM
+  TTIN/TTOU  worker sayısını bir artırır / azaltır
+
+Ortam değişkenleri: WEB_BIND, WEB_WORKERS (varsayılan CPU sayısı), WEB_THREADS,
+WEB_TIMEOUT, WEB_GRACEFUL_TIMEOUT, WEB_KEEPALIVE, WEB_MAX_REQUESTS. Her SSE
+bağlantısı bir thread'i meşgul eder; EVENTS_MAX_SUBSCRIBERS verilmezse worker
+başına WEB_THREADS / 2 ile sınırlanır, fazlası 503 + Retry-After alır. Çok
+sayıda boştaki akış için /events, asgi.py (uvicorn) sürecine yönlendirilir ve iki
+tarafa aynı EVENTS_RELAY_DIR verilir; orada abone thread tutmaz.
+Hız sınırları (RATE_LIMIT_*) worker'lar arasında /dev/shm'deki bir SQLite
+dosyasıyla paylaşılır; proxy arkasında TRUSTED_PROXIES verilmelidir.
+"""
+import os, shutil, signal, tempfile
+
+# Uygulama import edilmeden önce: job kuyruğu master'da başlamasın, periyodik
+# job'ları tek bir worker eklesin
+os.environ.setdefault("JOB_AUTOSTART", "0")
+os.environ.setdefault("JOB_LEADER_LOCK", "1")
+# Hız sınırları worker'lar arasında ortak: paylaşılan bellekte bir SQLite dosyası
+RATE_LIMIT_STORE = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+                                f"ratelimit-{os.getpid()}.db")
+os.environ.setdefault("RATE_LIMIT_STORE", RATE_LIMIT_STORE)
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1))
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", 8))
+# SSE aboneliği thread'i bağlantı süresince tutar (kopan istemci ancak heartbeat'te
+# fark edilir); thread'lerin en az yarısı normal request'lere kalsın
+os.environ.setdefault("EVENTS_MAX_SUBSCRIBERS", str(max(1, threads // 2)))
+# Eşzamanlı request'ler worker'ın thread sayısıyla sınırlı: thread'lerin yarısı
+# doluyken düşük öncelikli işler (export, rapor, CSV) reddedilir (ratelimit.py)
+os.environ.setdefault("ADMISSION_MAX_INFLIGHT", str(threads))
+timeout = int(os.environ.get("WEB_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("WEB_KEEPALIVE", 5))
+# Bellek sızıntısına karşı worker'ı belli sayıda request'ten sonra yenile (0 = kapalı)
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+preload_app = True
+accesslog = os.environ.get("WEB_ACCESS_LOG")  # "-" = stdout
+
+
+def relay_dir(master_pid):
+    return os.environ.get("EVENTS_RELAY_DIR") or os.path.join(tempfile.gettempdir(), f"events-{master_pid}")
+
+
+def when_ready(server):
+    import app
+    app.warm_up()
+    server.log.info("warm-up done: templates compiled, service catalog cached")
+
+
+def post_worker_init(worker):
+    import app
+    from database import warm_pools
+    opened = warm_pools(worker.cfg.threads)
+    app.events.start_relay(relay_dir(worker.ppid))
+    app.jobs.start()
+
+    # gunicorn'un TERM handler'ı sadece yeni bağlantı almayı bırakır; SSE akışları
+    # kendiliğinden bitmeyeceği için graceful_timeout'u beklemeden kapatılır
+    graceful = signal.getsignal(signal.SIGTERM)
+
+    def on_term(signum, frame):
+        app.events.close_all()
+        graceful(signum, frame)
+
+    signal.signal(signal.SIGTERM, on_term)
+    worker.log.info("worker %s ready (%d db connections)", worker.pid, opened)
+
+
+def worker_exit(server, worker):
+    import app
+    app.events.close_all()
+    app.hasher.shutdown()
+    app.jobs.shutdown(wait=False)
+
+
+def on_exit(server):
+    if not os.environ.get("EVENTS_RELAY_DIR"):  # verilmişse asgi.py ile paylaşılıyor olabilir
+        shutil.rmtree(relay_dir(server.pid), ignore_errors=True)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(RATE_LIMIT_STORE + suffix):
+            os.remove(RATE_LIMIT_STORE + suffix)
@@ -0,0 +1,283 @@
+import fcntl, os, sqlite3, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from database import (
+    create_job, get_job, claim_job, update_job_payload, finish_job,
+    get_queued_job_ids, get_running_jobs, release_job, prune_jobs,
+    import_invoices_from_csv, reconcile_stats, backfill_reports,
+)
+
+# Uzun süren işler (CSV import, raporlar) request thread'ini bloklamasın diye
+# arka planda, sınırlı sayıda worker thread'inde çalıştırılır. Job durumu
+# SQLite'taki jobs tablosunda tutulur; süreç yeniden başlarsa kuyrukta kalanlar
+# ve çöken bir process'in yarım bıraktıkları tekrar sıraya alınır. Bitmiş job
+# satırları JOB_RETENTION_DAYS gün sonra reconcile_stats job'unda silinir.
+#
+# Pre-fork sunucuda (gunicorn.conf.py) kuyruk master'da başlatılmaz
+# (autostart=False); her worker fork'tan sonra start() çağırır. leader_lock
+# verilirse periyodik job'ları sadece bu dosyanın flock'unu tutan worker
+# kuyruğa ekler; o worker ölürse kilidi bir sonraki turda başkası alır.
+
+JOB_HANDLERS = {}
+JOB_FAILED_HOOKS = {}  # job kesin failed olunca payload ile çağrılır (ör. dosya temizliği)
+JOB_RETENTION_DAYS = int(os.environ.get("JOB_RETENTION_DAYS", 7))
+
+
+def job_handler(name, on_failed=None):
+    def register(fn):
+        JOB_HANDLERS[name] = fn
+        if on_failed is not None:
+            JOB_FAILED_HOOKS[name] = on_failed
+        return fn
+    return register
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # başka kullanıcının process'i
+    return True
+
+
+class JobContext:
+    """Handler'a verilen nesne; ilerlemeyi payload'a yazar (retry oradan devam eder)."""
+
+    def __init__(self, job_id, payload):
+        self.id = job_id
+        self.payload = payload
+
+    def checkpoint(self, **updates):
+        self.payload.update(updates)
+        update_job_payload(self.id, self.payload)
+
+
+class JobQueue:
+    def __init__(self, app=None, max_workers=2, max_queue=100, max_retries=2, retry_delay=1.0,
+                 autostart=True, leader_lock=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._counts = {"done": 0, "failed": 0, "retried": 0}
+        self._wait_ms = deque(maxlen=500)
+        self._run_ms = deque(maxlen=500)
+        self._schedules = []
+        self._started = False
+        self.autostart = autostart
+        self.leader_lock = leader_lock
+        self._leader_fd = None
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions["jobs"] = self
+        if self.autostart:
+            self.start()
+
+    def start(self):
+        """Kuyrukta kalan job'ları yeniden sıraya alır ve periyodik zamanlayıcıları kurar."""
+        if self._started:
+            return
+        self._started = True
+        with self.app.app_context():
+            try:
+                self._release_orphans()
+                # Birden çok worker aynı job'u sıraya alabilir; claim_job sadece birine çalıştırır
+                for job_id in get_queued_job_ids():
+                    self._enqueue(job_id)
+            except sqlite3.OperationalError:
+                pass  # init_db henüz çalıştırılmadı
+        for schedule in self._schedules:
+            self._schedule(*schedule)
+
+    def _release_orphans(self):
+        # 'running' kalmış job'un process'i yaşamıyorsa job'u çalıştıran kimse yok:
+        # deneme hakkı varsa retry'a, yoksa failed'a çevrilir. Pid'ler aynı makinede
+        # (SQLite yerel dosya); yaşayan bir kardeş worker'ın job'una dokunulmaz.
+        for job_id, pid, attempts in get_running_jobs():
+            if pid is not None and pid != os.getpid() and _process_alive(pid):
+                continue
+            status = "retrying" if attempts <= self.max_retries else "failed"
+            if release_job(job_id, pid, status, "worker process exited while running") and status == "failed":
+                job = get_job(job_id)
+                self._on_failed(job["name"], job["payload"])
+
+    def is_leader(self):
+        if not self.leader_lock:
+            return True
+        if self._leader_fd is None:
+            fd = os.open(self.leader_lock, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            self._leader_fd = fd  # process kapanınca kilit kendiliğinden bırakılır
+        return True
+
+    def submit(self, name, payload, user_id=None):
+        if name not in JOB_HANDLERS:
+            raise KeyError(name)
+        # Satır kuyrukta yer ayrıldıktan sonra eklenir: QueueFull'da 'queued' kalan
+        # ve kimsenin çalıştırmayacağı bir satır oluşmasın
+        self._reserve(name)
+        try:
+            job_id = create_job(name, payload, user_id)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        self._dispatch(job_id)
+        return job_id
+
+    def _reserve(self, job, force=False):
+        with self._lock:
+            if not force and self._pending >= self.max_queue:
+                raise QueueFull(job)
+            self._pending += 1
+
+    def _enqueue(self, job_id, delay=0.0):
+        # Yeniden sıraya alma (başlangıç, retry) kuyruk sınırına takılmaz
+        self._reserve(job_id, force=True)
+        self._dispatch(job_id, delay)
+
+    def _dispatch(self, job_id, delay=0.0):
+        if delay:
+            # Retry beklemesi worker thread'ini meşgul etmesin
+            timer = threading.Timer(delay, self._executor.submit,
+                                    (self._run, job_id, time.monotonic() + delay))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._executor.submit(self._run, job_id, time.monotonic())
+
+    def _run(self, job_id, queued_at):
+        with self._lock:
+            self._pending -= 1
+            self._running += 1
+            self._wait_ms.append((time.monotonic() - queued_at) * 1000)
+        started = time.monotonic()
+        try:
+            with self.app.app_context():
+                self._execute(job_id)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._run_ms.append((time.monotonic() - started) * 1000)
+
+    def _execute(self, job_id):
+        if not claim_job(job_id):
+            return
+        job = get_job(job_id)
+        ctx = JobContext(job_id, job["payload"])
+        try:
+            result = JOB_HANDLERS[job["name"]](ctx, **ctx.payload)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job["attempts"] <= self.max_retries:
+                finish_job(job_id, "retrying", error=error)
+                with self._lock:
+                    self._counts["retried"] += 1
+                self._enqueue(job_id, delay=self.retry_delay * job["attempts"])
+            else:
+                finish_job(job_id, "failed", error=error)
+                with self._lock:
+                    self._counts["failed"] += 1
+                self._on_failed(job["name"], ctx.payload)
+            return
+        finish_job(job_id, "done", result=result)
+        with self._lock:
+            self._counts["done"] += 1
+
+    def _on_failed(self, name, payload):
+        hook = JOB_FAILED_HOOKS.get(name)
+        if hook is not None:
+            hook(**payload)
+
+    def every(self, seconds, name, payload=None):
+        """name job'unu her `seconds` saniyede bir kuyruğa ekler (ör. reconcile)."""
+        self._schedules.append((seconds, name, payload))
+        if self._started:
+            self._schedule(seconds, name, payload)
+
+    def _schedule(self, seconds, name, payload):
+        def tick():
+            try:
+                if self.is_leader():
+                    with self.app.app_context():
+                        self.submit(name, payload or {})
+            except (QueueFull, sqlite3.Error):
+                pass  # bir sonraki turda tekrar denenir
+            schedule()
+
+        def schedule():
+            timer = threading.Timer(seconds, tick)
+            timer.daemon = True
+            timer.start()
+
+        schedule()
+
+    def metrics(self):
+        with self._lock:
+            wait, run = sorted(self._wait_ms), sorted(self._run_ms)
+            return {
+                "workers": self.max_workers,
+                "pid": os.getpid(),
+                "leader": not self.leader_lock or self._leader_fd is not None,
+                "queue_depth": self._pending,
+                "running": self._running,
+                **self._counts,
+                "wait_ms_p50": round(wait[len(wait) // 2], 1) if wait else 0,
+                "wait_ms_max": round(wait[-1], 1) if wait else 0,
+                "run_ms_p50": round(run[len(run) // 2], 1) if run else 0,
+                "run_ms_max": round(run[-1], 1) if run else 0,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+# --- Handlers ---
+def remove_upload(file_path, **payload):
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
+@job_handler("import_invoices", on_failed=remove_upload)
+def import_invoices_job(job, file_path, user_id, start_row=0):
+    # Checkpoint her batch'le aynı transaction'da payload'a yazılır; retry kaldığı
+    # yerden devam eder. Dosya başarıda ya da son deneme de başarısız olunca silinir.
+    stats = import_invoices_from_csv(
+        file_path, user_id=user_id, start_row=start_row, job_id=job.id,
+        progress=lambda st: job.payload.update(start_row=st["checkpoint"]),
+    )
+    remove_upload(file_path)
+    return stats
+
+
+@job_handler("reconcile_stats")
+def reconcile_stats_job(job):
+    # Periyodik job'lar her turda satır ekler; eski bitmiş satırlar burada temizlenir
+    return {"drift": reconcile_stats(), "pruned_jobs": prune_jobs(JOB_RETENTION_DAYS)}
+
+
+@job_handler("backfill_reports")
+def backfill_reports_job(job):
+    # İlerleme report_state'te tutulur; retry ya da sonraki tur kaldığı yerden devam eder
+    return backfill_reports()
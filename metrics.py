@@ -0,0 +1,192 @@
+import cProfile, io, os, pstats, random, threading, time
+from collections import defaultdict, deque
+
+from flask import current_app, g, has_request_context, request, jsonify, Response
+from flask.signals import before_render_template, template_rendered
+
+import database
+
+# İsteğe bağlı ölçüm katmanı (METRICS_ENABLED=1): endpoint başına gecikme
+# histogramı, SQL ifade sayısı/süresi, template render süresi ve yavaş
+# request'ler için cProfile örnekleri. /metrics Prometheus text formatında döner.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOCAL_ADDRS = {"127.0.0.1", "::1"}
+
+
+def _gauge(value):
+    # Prometheus sayı bekler; bool (ör. jobs "leader") True/False yazılırsa tüm çıktı reddedilir
+    return int(value) if isinstance(value, bool) else value
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self, app=None, slow_seconds=0.5, profile_rate=0.0, keep_profiles=20):
+        self.slow_seconds = slow_seconds
+        self.profile_rate = profile_rate
+        self._lock = threading.Lock()
+        self._latency = defaultdict(Histogram)
+        self._responses = defaultdict(int)
+        self._sql = defaultdict(lambda: [0, 0.0])
+        self._templates = defaultdict(lambda: [0, 0.0])
+        self.profiles = deque(maxlen=keep_profiles)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["metrics"] = self
+        app.before_request(self._before)
+        app.after_request(self._after)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._rendered, app)
+        database.SQL_HOOK = self._on_sql
+        app.add_url_rule("/metrics", "metrics", self.metrics_view)
+        app.add_url_rule("/metrics/profiles", "metrics_profiles", self.profiles_view)
+
+    # --- hook'lar ---
+    def _before(self):
+        g._metrics_start = time.perf_counter()
+        g._metrics_sql = [0, 0.0]
+        g._metrics_render = []
+        if self.profile_rate and random.random() < self.profile_rate:
+            g._metrics_profile = cProfile.Profile()
+            g._metrics_profile.enable()
+
+    def _after(self, response):
+        start = g.pop("_metrics_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or "unknown"
+        sql_count, sql_time = g.pop("_metrics_sql", (0, 0.0))
+        with self._lock:
+            self._latency[endpoint].observe(elapsed)
+            self._responses[(endpoint, response.status_code)] += 1
+            self._sql[endpoint][0] += sql_count
+            self._sql[endpoint][1] += sql_time
+
+        profile = g.pop("_metrics_profile", None)
+        if profile is not None:
+            profile.disable()
+            if elapsed >= self.slow_seconds:
+                out = io.StringIO()
+                pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(30)
+                self.profiles.append({
+                    "endpoint": endpoint,
+                    "path": request.path,
+                    "seconds": round(elapsed, 4),
+                    "sql_statements": sql_count,
+                    "profile": out.getvalue(),
+                })
+        response.headers["Server-Timing"] = f"app;dur={elapsed * 1000:.1f}, db;dur={sql_time * 1000:.1f}"
+        return response
+
+    def _on_sql(self, sql, seconds):
+        if has_request_context() and "_metrics_sql" in g:
+            g._metrics_sql[0] += 1
+            g._metrics_sql[1] += seconds
+
+    def _before_render(self, app, template, context, **extra):
+        if has_request_context() and "_metrics_render" in g:
+            g._metrics_render.append(time.perf_counter())
+
+    def _rendered(self, app, template, context, **extra):
+        if has_request_context() and g.get("_metrics_render"):
+            elapsed = time.perf_counter() - g._metrics_render.pop()
+            with self._lock:
+                stat = self._templates[template.name]
+                stat[0] += 1
+                stat[1] += elapsed
+
+    # --- çıktı ---
+    def render(self):
+        lines = []
+        add = lines.append
+        with self._lock:
+            add("# TYPE http_request_duration_seconds histogram")
+            for endpoint, h in sorted(self._latency.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ("+Inf",), h.counts):
+                    cumulative += n
+                    add(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+                add(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {h.sum:.6f}')
+                add(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {h.count}')
+            add("# TYPE http_responses_total counter")
+            for (endpoint, status), n in sorted(self._responses.items()):
+                add(f'http_responses_total{{endpoint="{endpoint}",status="{status}"}} {n}')
+            add("# TYPE sql_statements_total counter")
+            for endpoint, (n, _) in sorted(self._sql.items()):
+                add(f'sql_statements_total{{endpoint="{endpoint}"}} {n}')
+            add("# TYPE sql_duration_seconds_total counter")
+            for endpoint, (_, t) in sorted(self._sql.items()):
+                add(f'sql_duration_seconds_total{{endpoint="{endpoint}"}} {t:.6f}')
+            add("# TYPE template_renders_total counter")
+            for name, (n, _) in sorted(self._templates.items()):
+                add(f'template_renders_total{{template="{name}"}} {n}')
+            add("# TYPE template_render_seconds_total counter")
+            for name, (_, t) in sorted(self._templates.items()):
+                add(f'template_render_seconds_total{{template="{name}"}} {t:.6f}')
+
+        add("# TYPE db_pool gauge")
+        for key, value in database.POOL.stats().items():
+            add(f'db_pool{{stat="{key}"}} {_gauge(value)}')
+        for i, pool in enumerate(database.READ_POOLS):
+            for key, value in pool.stats().items():
+                add(f'db_pool{{replica="{i}",stat="{key}"}} {_gauge(value)}')
+        if database.WRITER is not None:
+            add("# TYPE group_commit gauge")
+            for key, value in database.WRITER.metrics().items():
+                add(f'group_commit{{stat="{key}"}} {_gauge(value)}')
+        jobs = current_app.extensions.get("jobs")
+        if jobs is not None:
+            add("# TYPE jobs gauge")
+            for key, value in jobs.metrics().items():
+                add(f'jobs{{stat="{key}"}} {_gauge(value)}')
+        events = current_app.extensions.get("events")
+        if events is not None:
+            add("# TYPE events gauge")
+            for key, value in events.metrics().items():
+                add(f'events{{stat="{key}"}} {_gauge(value)}')
+        for name in ("ratelimit", "admission"):
+            ext = current_app.extensions.get(name)
+            if ext is not None:
+                add(f"# TYPE {name} gauge")
+                for key, value in ext.metrics().items():
+                    add(f'{name}{{stat="{key}"}} {_gauge(value)}')
+        return "\n".join(lines) + "\n"
+
+    def metrics_view(self):
+        if request.remote_addr not in LOCAL_ADDRS:
+            return jsonify({"error": "not authorized"}), 403
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+    def profiles_view(self):
+        if request.remote_addr not in LOCAL_ADDRS:
+            return jsonify({"error": "not authorized"}), 403
+        return jsonify(list(self.profiles))
+
+
+def metrics_from_env(app):
+    if os.environ.get("METRICS_ENABLED") != "1":
+        return None
+    return Metrics(
+        app,
+        slow_seconds=float(os.environ.get("METRICS_SLOW_SECONDS", 0.5)),
+        profile_rate=float(os.environ.get("METRICS_PROFILE_RATE", 0.0)),
+    )
@@ -0,0 +1,62 @@
+import os, threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Parola hash'leme bilerek CPU-pahalı; request thread'lerini (ve GIL'i) meşgul
+# etmesin diye sınırlı bir process havuzunda yapılır. Havuz + kuyruk doluysa
+# HashingBusy fırlatılır, app bunu 429'a çevirir.
+#
+# Werkzeug hash'i parametreleriyle birlikte saklar ("scrypt:32768:8:1$salt$hash"),
+# bu yüzden PASSWORD_HASH_METHOD değiştirildiğinde eski hash'ler login sırasında
+# tanınıp yeniden hash'lenebilir.
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+
+
+class HashingBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, workers=2, max_pending=32, method=PASSWORD_HASH_METHOD, timeout=30.0):
+        self.workers = workers
+        self.method = method
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_pending) if workers else None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._prefix = None
+        self.rejected = 0
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)  # workers=0: eski davranış, aynı thread'de
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingBusy()
+        try:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor.submit(fn, *args).result(timeout=self.timeout)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        if self._prefix is None:
+            # "scrypt", "pbkdf2:sha256" gibi kısa adlar hash'te varsayılan parametreleriyle
+            # açılır ("scrypt:32768:8:1"); karşılaştırılacak önek bir kez hash'lenip alınır
+            self._prefix = generate_password_hash("", self.method).split("$", 1)[0]
+        return pwhash.split("$", 1)[0] != self._prefix
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
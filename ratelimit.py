@@ -0,0 +1,335 @@
+import json, math, os, sqlite3, threading, time
+
+from flask import request, session, jsonify
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import ClosingIterator
+
+# İstek hızı sınırları ve aşırı yükte önceliğe göre istek reddi.
+#
+# Token bucket'lar GCRA ile tutulur: her anahtar için tek bir sayı, bir sonraki
+# token'ın "teorik varış zamanı" (tat). İzin: tat - burst*aralık <= şimdi; izin
+# verilince tat bir aralık ileri alınır. Dolu (uzun süredir kullanılmayan)
+# bucket, anahtarın hiç olmamasıyla aynıdır, bu yüzden eski anahtarlar atılabilir.
+#
+# Varsayılan depo process içi bir dict'tir. Birden çok worker process'i
+# (gunicorn.conf.py) aynı sınırları paylaşsın diye RATE_LIMIT_STORE ile bir
+# SQLite dosyası verilebilir (tercihen /dev/shm altında, yani paylaşılan
+# bellekte); her kontrol tek bir UPSERT ... RETURNING'dir. Depo hata verirse
+# istek geçirilir (fail-open), hız sınırı servisi durdurmamalı.
+
+
+def parse_limit(text):
+    """'10/60' -> (saniyede 10/60 token, burst 10); boş ya da '0' -> None."""
+    if not text or text == "0":
+        return None
+    count, _, seconds = text.partition("/")
+    count, seconds = int(count), float(seconds or 1)
+    return count / seconds, count
+
+
+def parse_route_limits(text):
+    """'login=10/60,init_database=1/60' -> {endpoint: limit}; '=0' o route'un sınırını kaldırır."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        endpoint, _, limit = item.partition("=")
+        limits[endpoint.strip()] = parse_limit(limit.strip())
+    return limits
+
+
+class MemoryBucketStore:
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._tat = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        """(izin, retry_after saniye) döndürür."""
+        interval = 1.0 / rate
+        now = time.monotonic()
+        with self._lock:
+            tat = max(self._tat.get(key, now), now) + interval * cost
+            wait = tat - burst * interval - now
+            if wait > 0:
+                return False, wait
+            self._tat[key] = tat
+            if len(self._tat) > self.max_keys:
+                self._evict(now)
+        return True, 0.0
+
+    def _evict(self, now):
+        self._tat = {k: tat for k, tat in self._tat.items() if tat > now}
+        if len(self._tat) > self.max_keys:
+            # Çok sayıda farklı anahtar (ör. taranan IP'ler): en eski eklenen yarı atılır
+            self._tat = dict(list(self._tat.items())[len(self._tat) // 2:])
+
+    def __len__(self):
+        return len(self._tat)
+
+
+class SQLiteBucketStore:
+    """Worker process'leri arasında paylaşılan bucket'lar (ayrı, geçici bir SQLite dosyası)."""
+
+    PURGE_EVERY = 10_000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        # Tablo geçici bir bağlantıyla oluşturulur; master'da açık bağlantı fork'la worker'lara geçmesin
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tat REAL NOT NULL) "
+                         "WITHOUT ROWID")
+        conn.close()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Kalıcılık gerekmez: synchronous=OFF; autocommit, her UPSERT kendi işlemi
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst, cost=1):
+        interval = 1.0 / rate
+        now = time.time()  # process'ler arası ortak saat
+        conn = self._conn()
+        row = conn.execute("""
+            INSERT INTO rate_buckets (key, tat) VALUES (:key, :now + :step)
+            ON CONFLICT (key) DO UPDATE SET tat = max(tat, :now) + :step
+              WHERE max(tat, :now) + :step - :window <= :now
+            RETURNING tat
+        """, {"key": key, "now": now, "step": interval * cost, "window": burst * interval}).fetchone()
+        self._calls += 1
+        if self._calls % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM rate_buckets WHERE tat < ?", (now,))
+        if row is not None:
+            return True, 0.0
+        tat = conn.execute("SELECT tat FROM rate_buckets WHERE key = ?", (key,)).fetchone()[0]
+        return False, max(tat, now) + interval * cost - burst * interval - now
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class RateLimiter:
+    """Her request için sırayla: route sınırı (IP başına), yazma sınırı ve genel
+    sınır (giriş yapmışsa kullanıcı, yapmamışsa IP başına). Aşılırsa 429 + Retry-After."""
+
+    def __init__(self, app=None, store=None, ip=None, user=None, writes=None, routes=None,
+                 exempt=("health", "static", "metrics")):
+        self.store = store if store is not None else MemoryBucketStore()
+        self.ip = ip
+        self.user = user
+        self.writes = writes
+        self.routes = routes or {}
+        self.exempt = set(exempt)
+        self._lock = threading.Lock()
+        self._counts = {"allowed": 0, "limited": 0, "store_errors": 0}
+        self._limited = {"route": 0, "write": 0, "user": 0, "ip": 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["ratelimit"] = self
+        app.before_request(self._before)
+
+    def check(self, ip, user_id, method, endpoint):
+        """Sınır aşıldıysa retry_after (saniye), aşılmadıysa None."""
+        if endpoint in self.exempt:
+            return None
+        client = f"u:{user_id}" if user_id else f"ip:{ip}"
+        buckets = []
+        route_limit = self.routes.get(endpoint)
+        if route_limit:
+            buckets.append(("route", f"r:{endpoint}:{ip}", route_limit))
+        if self.writes and method not in SAFE_METHODS:
+            buckets.append(("write", f"w:{client}", self.writes))
+        limit = self.user if user_id else self.ip
+        if limit:
+            buckets.append(("user" if user_id else "ip", client, limit))
+
+        # En dar sınır önce: reddedilen request genel bucket'tan token harcamasın
+        for kind, key, (rate, burst) in buckets:
+            try:
+                allowed, retry_after = self.store.take(key, rate, burst)
+            except sqlite3.Error:
+                with self._lock:
+                    self._counts["store_errors"] += 1
+                continue
+            if not allowed:
+                with self._lock:
+                    self._counts["limited"] += 1
+                    self._limited[kind] += 1
+                return retry_after
+        with self._lock:
+            self._counts["allowed"] += 1
+        return None
+
+    def _before(self):
+        retry_after = self.check(request.remote_addr, session.get("user_id"), request.method, request.endpoint)
+        if retry_after is not None:
+            return jsonify({"error": "too many requests"}), 429, {"Retry-After": str(math.ceil(retry_after))}
+
+    def metrics(self):
+        with self._lock:
+            return {**self._counts, **{f"limited_{k}": v for k, v in self._limited.items()}}
+
+
+# --- Aşırı yükte istek reddi (load shedding) ---
+# Öncelik path'e göre: /health her zaman; misafir sayfaları ve misafirin okuma
+# API'leri yüksek; yazmalar ve admin ekranları normal; toplu / pahalı işler
+# (export, rapor, CSV upload, /init-db, /add-user) düşük.
+CRITICAL, HIGH, NORMAL, LOW = 0, 1, 2, 3
+PRIORITY_NAMES = ("critical", "high", "normal", "low")
+CRITICAL_PATHS = ("/health",)
+HIGH_PATHS = ("/", "/home", "/login", "/logout", "/me", "/services", "/reservations", "/complaints",
+              "/invoices", "/my-total", "/api/bootstrap", "/services-page", "/reservations-page",
+              "/complaints-page", "/invoices-page")
+LOW_PREFIXES = ("/admin/export", "/admin/reports", "/upload_invoices", "/init-db", "/add-user",
+                "/list-users")
+# Uzun ömürlü akışlar (SSE) sayılmaz; bağlantı sayısını EventBus sınırlar
+STREAMING_PATHS = ("/events",)
+# Aşırı yük seviyesi bu değerlere ulaşınca ilgili öncelik reddedilir
+SHED_AT = {HIGH: math.inf, NORMAL: 1.0, LOW: 0.5}
+
+
+def request_priority(method, path):
+    if path in CRITICAL_PATHS:
+        return CRITICAL
+    if path.startswith(LOW_PREFIXES):
+        return LOW
+    if (method in SAFE_METHODS or path == "/login") and (path in HIGH_PATHS or path.startswith("/static/")):
+        return HIGH
+    return NORMAL
+
+
+class AdmissionControl:
+    """WSGI katmanı: aşırı yük seviyesi = max(eşzamanlı request / max_inflight,
+    yüksek öncelikli GET'lerin gecikme ortalaması / target_ms). Misafir
+    sayfaları hızlı ve benzer olduğundan gecikmelerinin artması kuyruklanma
+    demektir (/login parola hash'i yüzünden bilerek yavaş, ölçüme katılmaz).
+    Seviye yükseldikçe önce düşük, sonra normal öncelikli istekler 503 alır;
+    /health ve misafir sayfaları reddedilmez."""
+
+    def __init__(self, app=None, max_inflight=64, target_ms=250.0, half_life=2.0, retry_after=2):
+        self.max_inflight = max_inflight
+        self.target = target_ms / 1000 if target_ms else 0.0
+        self.half_life = half_life
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._latency = 0.0
+        self._latency_at = time.monotonic()
+        self._admitted = [0] * len(PRIORITY_NAMES)
+        self._shed = [0] * len(PRIORITY_NAMES)
+        self.wsgi_app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["admission"] = self
+        self.wsgi_app = app.wsgi_app
+        app.wsgi_app = self
+
+    def level(self):
+        with self._lock:
+            return self._level(time.monotonic())
+
+    def _level(self, now):
+        # Gecikme ortalaması zamanla söner: trafik kesilse de seviye takılı kalmaz
+        latency = self._latency * 0.5 ** ((now - self._latency_at) / self.half_life)
+        by_inflight = self._inflight / self.max_inflight if self.max_inflight else 0.0
+        by_latency = latency / self.target if self.target else 0.0
+        return max(by_inflight, by_latency)
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path in STREAMING_PATHS:
+            return self.wsgi_app(environ, start_response)
+        method = environ["REQUEST_METHOD"]
+        priority = request_priority(method, path)
+        sampled = priority == HIGH and method in SAFE_METHODS
+        with self._lock:
+            if priority != CRITICAL and self._level(time.monotonic()) >= SHED_AT[priority]:
+                self._shed[priority] += 1
+                shed = True
+            else:
+                self._admitted[priority] += 1
+                self._inflight += 1
+                shed = False
+        if shed:
+            return Response(json.dumps({"error": "server overloaded, try again"}), 503,
+                            {"Retry-After": str(self.retry_after)},
+                            mimetype="application/json")(environ, start_response)
+
+        started = time.monotonic()
+
+        def finished():
+            now = time.monotonic()
+            with self._lock:
+                self._inflight -= 1
+                if sampled:
+                    decayed = self._latency * 0.5 ** ((now - self._latency_at) / self.half_life)
+                    self._latency = decayed + 0.1 * (now - started - decayed)
+                    self._latency_at = now
+
+        sized = []
+
+        def sizing_start_response(status, headers, exc_info=None):
+            sized.append(method == "HEAD" or status[:3] in ("204", "304")
+                         or any(name.lower() == "content-length" for name, _ in headers))
+            return start_response(status, headers, exc_info)
+
+        try:
+            app_iter = self.wsgi_app(environ, sizing_start_response)
+        except BaseException:
+            finished()
+            raise
+        # Gövdesi hazır cevaplarda slot hemen bırakılır (close() çağırmayan bir
+        # istemci slotu sonsuza kadar tutmasın); akışlarda close() gelince
+        if sized and sized[0]:
+            finished()
+            return app_iter
+        return ClosingIterator(app_iter, finished)
+
+    def metrics(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "inflight": self._inflight,
+                "level": round(self._level(now), 3),
+                "latency_ms": round(self._latency * 0.5 ** ((now - self._latency_at) / self.half_life) * 1000, 1),
+                **{f"admitted_{name}": n for name, n in zip(PRIORITY_NAMES, self._admitted)},
+                **{f"shed_{name}": n for name, n in zip(PRIORITY_NAMES, self._shed)},
+            }
+
+
+# Varsayılanlar: /login kaba kuvvete, /add-user ve /init-db kimliksiz yazmaya karşı
+DEFAULT_ROUTE_LIMITS = "login=10/60,register=10/60,add_user=5/60,init_database=1/60,upload_invoices=10/60"
+
+
+def limits_from_env(app):
+    limiter = admission = None
+    if os.environ.get("RATE_LIMIT_ENABLED", "1") == "1":
+        path = os.environ.get("RATE_LIMIT_STORE")
+        limiter = RateLimiter(
+            app,
+            store=SQLiteBucketStore(path) if path else MemoryBucketStore(),
+            ip=parse_limit(os.environ.get("RATE_LIMIT_IP", "60/1")),
+            user=parse_limit(os.environ.get("RATE_LIMIT_USER", "30/1")),
+            writes=parse_limit(os.environ.get("RATE_LIMIT_WRITES", "20/1")),
+            routes={**parse_route_limits(DEFAULT_ROUTE_LIMITS),
+                    **parse_route_limits(os.environ.get("RATE_LIMIT_ROUTES"))},
+        )
+    if os.environ.get("ADMISSION_ENABLED", "1") == "1":
+        admission = AdmissionControl(
+            app,
+            max_inflight=int(os.environ.get("ADMISSION_MAX_INFLIGHT", 64)),
+            target_ms=float(os.environ.get("ADMISSION_TARGET_MS", 250)),
+        )
+    return limiter, admission
@@ -0,0 +1,104 @@
+import gzip, hashlib, threading
+from collections import OrderedDict
+
+from flask import current_app, request, render_template, Response
+from markupsafe import Markup
+
+try:
+    import brotli
+except ImportError:  # opsiyonel; yoksa sadece gzip sunulur
+    brotli = None
+
+# Request'e bağlı olmayan sayfalar (home, *-page, logout) bir kez render edilip
+# ham + gzip (+ brotli) byte olarak saklanır; strong ETag ile 304 dönülür.
+# Admin sayfalarındaki veri blokları ise data_versions tablosundaki sürümlerle
+# anahtarlanmış HTML parçaları olarak tutulur (FragmentCache).
+#
+# RENDER_CACHE_ENABLED=False veya template auto-reload açıkken (debug) her
+# şey eskisi gibi her request'te render edilir.
+
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+
+def cache_enabled():
+    app = current_app
+    return app.config.get("RENDER_CACHE_ENABLED", True) and not app.jinja_env.auto_reload
+
+
+class StaticPages:
+    def __init__(self):
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def _build(self, template):
+        body = render_template(template).encode()
+        digest = hashlib.sha1(body).hexdigest()
+        variants = {None: (body, digest)}
+        variants["gzip"] = (gzip.compress(body, 9, mtime=0), f"{digest}-gz")
+        if brotli:
+            variants["br"] = (brotli.compress(body, quality=11), f"{digest}-br")
+        page = {}
+        for encoding, (data, etag) in variants.items():
+            headers = [("Vary", "Accept-Encoding"), ("Cache-Control", "no-cache"), ("ETag", f'"{etag}"')]
+            if encoding:
+                headers.append(("Content-Encoding", encoding))
+            page[encoding] = (data, etag, headers)
+        return page
+
+    def get(self, template):
+        page = self._pages.get(template)
+        if page is None:
+            with self._lock:
+                page = self._pages.get(template)
+                if page is None:
+                    page = self._pages[template] = self._build(template)
+        return page
+
+    def warm(self, templates):
+        for template in templates:
+            self.get(template)
+
+    def response(self, template):
+        if not cache_enabled():
+            return render_template(template)
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+        body, etag, headers = self.get(template)[encoding]
+        if etag in request.if_none_match:
+            return Response(status=304, headers=headers)
+        return Response(body, mimetype="text/html", headers=headers)
+
+
+class FragmentCache:
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def render(self, template, key, load):
+        """key aynı kaldıkça template'in önceki çıktısını döndürür; değişince load()
+        ile veriyi çekip yeniden render eder. load() template context'i ya da kayıt
+        yoksa None döndürür (bu durumda render edilmez, None döner)."""
+        if not cache_enabled():
+            context = load()
+            return Markup(render_template(template, **context)) if context is not None else None
+        key = (template,) + tuple(key)
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+        context = load()
+        if context is None:
+            return None  # kayıt yok; cache'lenmez
+        html = Markup(render_template(template, **context))
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = html
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}